@@ -4,7 +4,8 @@
 APIAgent: Handles card activation/deactivation logic and communicates with simulated API.
 """
 import re
-from api.card_management import activate_card_backend, deactivate_card_backend
+from collections import Counter
+from api.card_management import activate_card_backend, deactivate_card_backend, bulk_card_operation_backend
 
 class APIAgent:
     """
@@ -16,29 +17,61 @@ class APIAgent:
     def activate_card(self, user_input: str) -> str:
         """
         Extract card number from user input and attempt to activate the card.
+        A message listing several card numbers activates all of them.
         Returns a response message.
         """
-        card_number = self._extract_card_number(user_input)
-        if not card_number:
+        card_numbers = self._extract_card_numbers(user_input)
+        if not card_numbers:
             return "Error: No valid 9-digit card number found in the input."
-        result = activate_card_backend(card_number)
+        if len(card_numbers) > 1:
+            return "".join(self.stream_bulk_operation(card_numbers, activate=True))
+        result = activate_card_backend(card_numbers[0])
         return result
 
     def deactivate_card(self, user_input: str) -> str:
         """
         Extract card number from user input and attempt to deactivate the card.
+        A message listing several card numbers deactivates all of them.
         Returns a response message.
         """
-        card_number = self._extract_card_number(user_input)
-        if not card_number:
+        card_numbers = self._extract_card_numbers(user_input)
+        if not card_numbers:
             return "Error: No valid 9-digit card number found in the input."
-        result = deactivate_card_backend(card_number)
+        if len(card_numbers) > 1:
+            return "".join(self.stream_bulk_operation(card_numbers, activate=False))
+        result = deactivate_card_backend(card_numbers[0])
         return result
 
+    def stream_bulk_operation(self, card_numbers, activate: bool = True, batch_size: int = 500):
+        """
+        Activate or deactivate many cards (e.g. read lazily from a CSV file), yielding the
+        per-card results as a markdown list one batch at a time, followed by a summary line.
+        """
+        counts = Counter()
+        lines = []
+        for card_number, status, message in bulk_card_operation_backend(card_numbers, activate, batch_size):
+            counts[status] += 1
+            lines.append(f"- {message}\n")
+            if len(lines) >= batch_size:
+                yield "".join(lines)
+                lines = []
+        if lines:
+            yield "".join(lines)
+        done = "activated" if activate else "deactivated"
+        skipped = "already active" if activate else "not active"
+        yield (f"\n**{sum(counts.values())} cards processed: {counts['changed']} {done}, "
+               f"{counts['unchanged']} {skipped}, {counts['invalid']} invalid.**\n")
+
     def _extract_card_number(self, text: str) -> str:
         """
         Helper method to extract a 9-digit card number from text using regex.
         """
         match = re.search(r"\b\d{9}\b", text)
         return match.group(0) if match else None
+
+    def _extract_card_numbers(self, text: str) -> list:
+        """
+        Helper method to extract every 9-digit card number from text, without duplicates, in order.
+        """
+        return list(dict.fromkeys(re.findall(r"\b\d{9}\b", text)))
     
\ No newline at end of file
@@ -1,10 +1,49 @@
 import os
+import json
+import re
+import logging
 from dotenv import load_dotenv
+from utils.intent_classifier import LocalIntentClassifier, may_request_card_operation
 from utils.llm_wrapper import LLMWrapper 
+from utils.tracing import tracer
 
 # Load environment variables (including GROQ_API_KEY)
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+def parse_combined_response(text: str) -> dict:
+    """
+    Parse the reply to the combined intent+answer prompt.
+    Accepts a bare JSON object, one wrapped in code fences or surrounded by prose, and
+    falls back to treating the whole reply as an answer when no usable JSON is found.
+
+    :param text: Raw LLM reply.
+    :return: {"action": "answer", "answer": str} or {"action": "activate"/"deactivate", "card_number": str|None}
+    """
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"\{", text):
+        try:
+            payload, _end = decoder.raw_decode(text, match.start())
+        except ValueError:
+            continue
+        if not isinstance(payload, dict):
+            continue
+        action = str(payload.get("action", "")).strip().lower()
+        if action in ("activate", "deactivate"):
+            card_number = payload.get("card_number")
+            return {"action": action, "card_number": str(card_number) if card_number else None}
+        if action == "answer" and isinstance(payload.get("answer"), str):
+            return {"action": "answer", "answer": payload["answer"].strip()}
+
+    # No valid JSON: look for a bare action marker before giving up
+    marker = re.search(r'"?action"?\s*[:=]\s*"?(activate|deactivate)\b', text, re.IGNORECASE)
+    if marker:
+        card = re.search(r"\b\d{9}\b", text)
+        return {"action": marker.group(1).lower(), "card_number": card.group(0) if card else None}
+    return {"action": "answer", "answer": text.strip()}
+
 
 class IntentAgent:
     """
@@ -12,16 +51,24 @@ class IntentAgent:
     and autonomously decides which tool to call based on the detected intent.
     """
 
-    def __init__(self, groq_key, api_agent, knowledge_agent, temperature: float = 0.0):
+    def __init__(self, groq_key, api_agent, knowledge_agent, temperature: float = 0.0,
+                 intent_classifier: LocalIntentClassifier = None, confidence_threshold: float = 0.8,
+                 combined_mode: bool = False, llm_wrapper: LLMWrapper = None):
         """
         Initialize the IntentAgent with the LLMWrapper for intent classification.
 
         :param api_agent: APIAgent instance for card operations.
         :param knowledge_agent: KnowledgeAgent instance for knowledge retrieval.
         :param temperature: Sampling temperature for the model.
+        :param intent_classifier: Optional local classifier tried before the LLM.
+        :param confidence_threshold: Minimum local confidence needed to skip the LLM.
+        :param combined_mode: Classify and answer with a single LLM call when the local
+                              classifier is not confident (see combined_execute).
+        :param llm_wrapper: LLMWrapper to share with the other agents; one is created from
+                            groq_key when omitted.
         """
         # Initialize LLMWrapper
-        self.llm = LLMWrapper(api_key=groq_key)
+        self.llm = llm_wrapper or LLMWrapper(api_key=groq_key)
 
         # Define available tools
         self.tools = {
@@ -30,7 +77,48 @@ class IntentAgent:
             "knowledge": knowledge_agent.answer_question,
         }
 
+        self.api_agent = api_agent
+        self.knowledge_agent = knowledge_agent
+        self.combined_mode = combined_mode
+        self.intent_classifier = intent_classifier
+        self.confidence_threshold = confidence_threshold
+        self.local_decisions = 0
+        self.llm_fallbacks = 0
+
     def get_intent(self, user_input: str) -> str:
+        """
+        Determine the intent of the user input. The local classifier decides when it is
+        confident enough; otherwise the LLM is queried using a ReAct-style prompt.
+
+        :param user_input: The user's raw input string.
+        :return: One of "activate", "deactivate", or "knowledge".
+        """
+        with tracer.span("intent") as span:
+            intent = self._classify_locally(user_input)
+            span["attributes"]["source"] = "local" if intent is not None else "llm"
+            if intent is None:
+                intent = self.get_intent_from_llm(user_input)
+            span["attributes"]["intent"] = intent
+        return intent
+
+    def _classify_locally(self, user_input: str):
+        """
+        Ask the local classifier for the intent.
+
+        :return: The intent if the classifier is confident enough, otherwise None.
+        """
+        if self.intent_classifier is None:
+            return None
+        intent, confidence = self.intent_classifier.classify(user_input)
+        if confidence >= self.confidence_threshold and intent in self.tools:
+            self.local_decisions += 1
+            return intent
+        self.llm_fallbacks += 1
+        logger.debug("Local intent '%s' below threshold (%.2f < %.2f), asking the LLM",
+                    intent, confidence, self.confidence_threshold)
+        return None
+
+    def get_intent_from_llm(self, user_input: str) -> str:
         """
         Determine the intent of the user input by querying the LLM using a ReAct-style prompt.
 
@@ -65,21 +153,137 @@ class IntentAgent:
 
         return intent
 
-    def decide_and_execute(self, user_input: str) -> str:
+    def intent_stats(self) -> dict:
+        """
+        Counts of local intent decisions and LLM fallbacks.
+        """
+        total = self.local_decisions + self.llm_fallbacks
+        return {
+            "local_decisions": self.local_decisions,
+            "llm_fallbacks": self.llm_fallbacks,
+            "fallback_rate": self.llm_fallbacks / total if total else 0.0,
+        }
+
+    @staticmethod
+    def build_combined_prompt(user_input: str, context: str, history: str = "") -> str:
+        """
+        Builds the structured-output prompt used by combined mode.
+
+        :param user_input: The user's raw input string.
+        :param context: Knowledge base context retrieved for the input.
+        :param history: Compacted conversation so far, if any.
+        """
+        conversation = f"Conversation so far (use it only to understand the input):\n{history}\n\n" if history else ""
+        return (
+            "You are a card services assistant. Decide whether the user wants to activate a card, "
+            "deactivate a card, or get information, and respond with a single JSON object only.\n"
+            "To activate or deactivate a card respond with: "
+            "{\"action\": \"activate\" or \"deactivate\", \"card_number\": \"<9-digit number or null>\"}\n"
+            "Otherwise answer the question using the information from the card user guide below and respond with: "
+            "{\"action\": \"answer\", \"answer\": \"<your answer>\"}\n\n"
+            f"Card user guide information:\n{context or 'No relevant information found.'}\n\n"
+            f"{conversation}"
+            f"User Input: \"{user_input}\"\n"
+        )
+
+    def combined_execute(self, user_input: str, history: str = "") -> str:
+        """
+        Handle the user input with at most one LLM round trip: the knowledge context is
+        retrieved up front and a single structured-output call either answers the question
+        or requests a card operation.
+
+        :param user_input: The user's raw input string.
+        :param history: Compacted conversation so far (ConversationStore.context()), if any.
+        :return: The answer or the result of the card operation.
+        """
+        with tracer.span("intent", source="local") as span:
+            intent = self._classify_locally(user_input)
+            span["attributes"]["intent"] = intent
+        if intent is not None:
+            return self._run_tool(intent, user_input, history)
+
+        # The intent is not known yet: a cached how-to must not preempt "activate my card 123456789"
+        if not may_request_card_operation(user_input, self.api_agent._extract_card_number):
+            cached = self.knowledge_agent.lookup_answer(user_input, history)
+            if cached is not None:
+                return cached
+        # Identical questions asked concurrently share one combined LLM call
+        result = self.knowledge_agent.coalesce(user_input, lambda: self._combined_call(user_input, history),
+                                              kind="combined", history=history)
+        logger.debug("Combined mode action: %s", result["action"])
+
+        if result["action"] == "answer":
+            return result["answer"]
+        # The tool extracts the card number from the user's own words; a number that only
+        # appears in the model's reply could be hallucinated, so it is not used
+        return self._run_tool(result["action"], user_input)
+
+    def _combined_call(self, user_input: str, history: str = "") -> dict:
+        """
+        Retrieve the context, make the combined LLM call and cache the answer if it is one.
+
+        :return: The parsed reply (see parse_combined_response).
+        """
+        kb_version = self.knowledge_agent.kb_version()
+        context = self.knowledge_agent.build_context(user_input)
+        with tracer.span("prompt_build"):
+            prompt = self.build_combined_prompt(user_input, context, history)
+        result = parse_combined_response(self.llm.generate_answer(prompt))
+        if result["action"] == "answer" and not may_request_card_operation(user_input,
+                                                                           self.api_agent._extract_card_number):
+            self.knowledge_agent.cache_answer(user_input, result["answer"], kb_version, history)
+        return result
+
+    def _run_tool(self, intent: str, user_input: str, history: str = "") -> str:
+        """
+        Execute the tool for the intent. Card operations are timed as tool_execution;
+        knowledge answers record their own retrieval/prompt/LLM spans.
+        """
+        if intent == "knowledge":
+            return self.tools[intent](user_input, history)
+        with tracer.span("tool_execution", tool=intent):
+            return self.tools[intent](user_input)
+
+    def decide_and_execute(self, user_input: str, history: str = "") -> str:
         """
         Decide which tool to call based on the user input and execute it.
 
         :param user_input: The user's raw input string.
+        :param history: Compacted conversation so far (ConversationStore.context()), if any.
         :return: The result of the tool execution.
         """
+        if self.combined_mode:
+            return self.combined_execute(user_input, history)
+
         # Determine the intent
         intent = self.get_intent(user_input)
-        print(f"Detected intent: {intent}")
+        logger.debug("Detected intent: %s", intent)
 
         # Execute the corresponding tool
-        tool = self.tools.get(intent)
-        print(f"Tool to execute: {tool}")
-        if not tool:
+        if intent not in self.tools:
             return "I'm sorry, I couldn't determine the appropriate action for your request."
 
-        return tool(user_input)
\ No newline at end of file
+        return self._run_tool(intent, user_input, history)
+
+    def stream_decide_and_execute(self, user_input: str, history: str = ""):
+        """
+        Streaming variant of decide_and_execute: yields the response in fragments.
+        Knowledge answers are streamed token by token; tool results and combined-mode
+        replies (which must be parsed as a whole) are yielded in one piece.
+
+        :param user_input: The user's raw input string.
+        :param history: Compacted conversation so far, if any.
+        """
+        if self.combined_mode:
+            yield self.combined_execute(user_input, history)
+            return
+
+        intent = self.get_intent(user_input)
+        if intent == "knowledge":
+            yield from self.knowledge_agent.stream_answer(user_input, history)
+            return
+
+        if intent not in self.tools:
+            yield "I'm sorry, I couldn't determine the appropriate action for your request."
+            return
+        yield self._run_tool(intent, user_input)
@@ -5,8 +5,14 @@ KnowledgeAgent: Retrieves relevant information from the knowledge base and
 uses an LLM to generate answers.
 """
 import logging
+from utils.answer_cache import SemanticAnswerCache, normalize_question
+from utils.chunking import estimate_tokens
+from utils.context_builder import ContextAssembler
 from utils.faiss_indexer import FAISSIndexer
+from utils.faq_index import FAQIndex
 from utils.llm_wrapper import LLMWrapper
+from utils.single_flight import SingleFlight
+from utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -16,24 +22,195 @@ class KnowledgeAgent:
     The KnowledgeAgent class coordinates information retrieval from the knowledge base
     and answer generation using a language model.
     """
-    def __init__(self, search_simulator: FAISSIndexer, llm_wrapper: LLMWrapper):
+    def __init__(self, search_simulator: FAISSIndexer, llm_wrapper: LLMWrapper,
+                 top_k: int = 6, context_token_budget: int = 600,
+                 answer_cache: SemanticAnswerCache = None, single_flight: SingleFlight = None,
+                 faq_index: FAQIndex = None):
         """
         Initialize with a search simulator (for knowledge base retrieval) and an LLM wrapper for answer generation.
+
+        :param top_k: Number of candidate chunks retrieved per question.
+        :param context_token_budget: Maximum (estimated) tokens of retrieved text placed in the prompt.
+        :param answer_cache: Optional SemanticAnswerCache consulted before retrieval and generation.
+        :param single_flight: Optional SingleFlight; concurrent identical questions then share one
+                              retrieval and LLM call.
+        :param faq_index: Optional FAQIndex; questions matching a canonical FAQ question get its
+                          precomputed answer without retrieval or an LLM call.
         """
         self.search_simulator = search_simulator
         self.llm_wrapper = llm_wrapper
+        self.top_k = top_k
+        self.context_assembler = ContextAssembler(token_budget=context_token_budget)
+        self.answer_cache = answer_cache
+        self.single_flight = single_flight
+        self.faq_index = faq_index
+
+    def build_context(self, question: str) -> str:
+        """
+        Retrieves the best chunks for the question and packs them into the context token budget.
+        """
+        with tracer.span("retrieval", top_k=self.top_k) as span:
+            hits = self.search_simulator.search_chunks(question, top_k=self.top_k)
+            context = self.context_assembler.assemble(hits)
+            span["attributes"]["context_tokens"] = estimate_tokens(context)
+        return context
+
+    @staticmethod
+    def build_prompt(question: str, context: str, history: str = "") -> str:
+        """
+        Builds the answer-generation prompt from the question and its retrieved context.
+
+        :param history: Compacted conversation so far (ConversationStore.context()), if any.
+        """
+        with tracer.span("prompt_build"):
+            prompt = f"Use the following information from the card user guide to answer the question:\n\n{context}\n\n"
+            if history:
+                prompt += f"Conversation so far (use it only to understand the question):\n{history}\n\n"
+            prompt += f"Question: {question}\nAnswer:"
+        logger.debug("Knowledge prompt: ~%d tokens", estimate_tokens(prompt))
+        return prompt
 
-    def answer_question(self, question: str) -> str:
+    def answer_question(self, question: str, history: str = "") -> str:
         """
         Retrieves relevant context for the question and uses the LLM to generate an answer.
+        Questions matching a canonical FAQ question get its precomputed answer, near-duplicates
+        of already answered questions are served from the answer cache, and
+        identical questions asked concurrently share one generation (with single_flight).
+
+        :param history: Compacted conversation so far, passed to the LLM so follow-up questions
+                        can be understood. An answer generated with a history belongs to that
+                        conversation: it is neither cached nor shared with concurrent callers.
         """
+        cached = self.lookup_answer(question, history)
+        if cached is not None:
+            return cached
+        return self.coalesce(question, lambda: self._generate_answer(question, history), history=history)
+
+    def lookup_answer(self, question: str, history: str = ""):
+        """
+        Answer the question without retrieval or generation, from the FAQ index or the answer cache.
+        With a conversation history only the FAQ is used: cached answers were generated for
+        questions asked on their own.
+        :return: The answer, or None on a miss
+        """
+        return self._faq_answer(question) or (None if history else self._cached_answer(question))
+
+    def coalesce(self, question: str, fn, kind: str = "answer", history: str = ""):
+        """
+        Run fn() once for identical questions asked concurrently (when single_flight is set);
+        every caller gets its result. Calls with a conversation history always run on their own.
+        :param kind: Separates callers whose fn returns different things for the same question
+        """
+        if self.single_flight is None or history:
+            return fn()
+        return self.single_flight.do((kind,) + self._flight_key(question), fn)
+
+    def _generate_answer(self, question: str, history: str = "") -> str:
+        kb_version = self.kb_version()
         # Retrieve top relevant passages from the knowledge base
-        combined_result = self.search_simulator.search(question)
+        combined_result = self.build_context(question)
  
         if not combined_result:
             return "I'm sorry, I couldn't find information related to your question."
 
-        prompt = f"Use the following information from the card user guide to answer the question:\n\n{combined_result}\n\nQuestion: {question}\nAnswer:"
+        prompt = self.build_prompt(question, combined_result, history)
         # Generate answer using the language model
         answer = self.llm_wrapper.generate_answer(prompt)
+        self.cache_answer(question, answer, kb_version, history)
         return answer
+
+    def stream_answer(self, question: str, history: str = ""):
+        """
+        Same as answer_question, but yields the answer in fragments as the LLM produces them.
+        The complete answer is cached once the stream finishes. A caller coalesced onto another
+        user's in-flight answer receives it in one piece when it is complete.
+        """
+        cached = self.lookup_answer(question, history)
+        if cached is not None:
+            yield cached
+            return
+        if self.single_flight is None or history:
+            yield from self._stream_generated_answer(question, history)
+            return
+
+        key = ("answer",) + self._flight_key(question)
+        future, leader = self.single_flight.begin(key)
+        if not leader:
+            # The same question is already being answered for another user: wait for that answer
+            with tracer.span("coalesced_wait"):
+                answer = self.single_flight.wait(future)
+            yield answer
+            return
+        fragments = []
+        try:
+            for fragment in self._stream_generated_answer(question, history):
+                fragments.append(fragment)
+                yield fragment
+        except BaseException as e:
+            self.single_flight.finish(key, future, error=e)
+            raise
+        self.single_flight.finish(key, future, result="".join(fragments).strip())
+
+    def _stream_generated_answer(self, question: str, history: str = ""):
+        kb_version = self.kb_version()
+        combined_result = self.build_context(question)
+        if not combined_result:
+            yield "I'm sorry, I couldn't find information related to your question."
+            return
+
+        prompt = self.build_prompt(question, combined_result, history)
+        fragments = []
+        for fragment in self.llm_wrapper.stream_answer(prompt):
+            fragments.append(fragment)
+            yield fragment
+        self.cache_answer(question, "".join(fragments).strip(), kb_version, history)
+
+    def kb_version(self):
+        """
+        Version of the knowledge base searched (None if the backend does not track one).
+        """
+        return getattr(self.search_simulator, "version", None)
+
+    def _flight_key(self, question: str) -> tuple:
+        # Answers are only shared between identical questions against the same knowledge base
+        return normalize_question(question), self.kb_version()
+
+    def _faq_answer(self, question: str):
+        """
+        Look the question up in the FAQ index.
+        :return: The precomputed answer of the matching FAQ entry, or None
+        """
+        if self.faq_index is None:
+            return None
+        with tracer.span("faq_lookup") as span:
+            match = self.faq_index.match(question)
+            span["attributes"]["hit"] = match is not None
+        return match[0]["answer"] if match else None
+
+    def _cached_answer(self, question: str):
+        """
+        Look the question up in the answer cache.
+        :return: The cached answer, or None
+        """
+        if self.answer_cache is None:
+            return None
+        with tracer.span("cache_lookup") as span:
+            cached = self.answer_cache.lookup(question, self.kb_version())
+            span["attributes"]["hit"] = cached is not None
+        return cached
+
+    def cache_answer(self, question: str, answer: str, kb_version, history: str = ""):
+        """
+        Record an answer generated for the question (here or by a caller) in the answer cache.
+
+        :param kb_version: kb_version() taken before retrieval. If the knowledge base changed
+                           while the answer was generated, the answer is stale and not cached.
+        :param history: Conversation the answer was generated with; such answers are not cached,
+                        they may depend on (and quote) that conversation.
+        """
+        if self.answer_cache is None or history:
+            return
+        if kb_version != self.kb_version():
+            logger.info("Knowledge base changed while answering, not caching the answer")
+            return
+        self.answer_cache.store(question, answer, kb_version)
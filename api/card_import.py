@@ -0,0 +1,47 @@
+# api/card_import.py
+
+"""
+Streaming reader for card-number files used by bulk activation/deactivation.
+"""
+import csv
+import io
+
+# Header names recognised as the card-number column (compared lower-case, without spaces/underscores)
+CARD_COLUMN_NAMES = ("cardnumber", "card", "cardno", "cardid", "pan")
+
+
+def _header_key(cell: str) -> str:
+    return cell.strip().lower().replace(" ", "").replace("_", "")
+
+
+def iter_card_numbers_csv(file, column=None):
+    """
+    Yield the card numbers of a CSV file one row at a time (the file is never loaded whole).
+    Values are yielded as found (stripped), including invalid ones, so they can be reported.
+
+    :param file: Text or binary file object (e.g. an uploaded file)
+    :param column: Column name or 0-based index. By default a header cell named like
+                   "card_number" is used, otherwise the first column.
+    """
+    if not isinstance(file, io.TextIOBase):
+        file = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    reader = csv.reader(file)
+    first = next(reader, None)
+    if first is None:
+        return
+
+    index = column if isinstance(column, int) else None
+    header = [_header_key(cell) for cell in first]
+    if isinstance(column, str):
+        if _header_key(column) not in header:
+            raise ValueError(f"Column '{column}' not found in the CSV header {first}")
+        index = header.index(_header_key(column))
+    elif index is None:
+        index = next((i for i, key in enumerate(header) if key in CARD_COLUMN_NAMES), 0)
+
+    # The first row is data unless it is a header (no digits in the card column)
+    if index < len(first) and any(ch.isdigit() for ch in first[index]):
+        yield first[index].strip()
+    for row in reader:
+        if index < len(row) and row[index].strip():
+            yield row[index].strip()
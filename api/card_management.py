@@ -3,10 +3,39 @@
 """
 Simulated backend API functions for card management.
 """
+import os
+import threading
+from itertools import islice
+
+from api.card_store import CardStore, create_card_store
 from utils.validators import Validators
 
-# Simulated in-memory "database" of active cards
-_active_cards = set()
+# Card state lives in a pluggable store: CARD_STORE=sqlite (default, durable and shared
+# between worker processes, file CARD_STORE_PATH) or CARD_STORE=memory
+_card_store = None
+_card_store_lock = threading.Lock()
+
+
+def get_card_store() -> CardStore:
+    """
+    The process-wide card store, created from the environment on first use.
+    """
+    global _card_store
+    if _card_store is None:
+        with _card_store_lock:
+            if _card_store is None:
+                _card_store = create_card_store(os.getenv("CARD_STORE", "sqlite"),
+                                                os.getenv("CARD_STORE_PATH", "card_state.db"))
+    return _card_store
+
+
+def set_card_store(store: CardStore):
+    """
+    Replace the card store (e.g. with an InMemoryCardStore in tests).
+    """
+    global _card_store
+    _card_store = store
+
 
 def activate_card_backend(card_number: str) -> str:
     """
@@ -14,9 +43,8 @@ def activate_card_backend(card_number: str) -> str:
     """
     if not Validators.is_valid_card_number(card_number):
         return "Invalid card number. Activation failed."
-    if card_number in _active_cards:
+    if not get_card_store().activate(card_number):
         return f"Card {card_number} is already activated."
-    _active_cards.add(card_number)
     return f"Card {card_number} has been successfully activated."
 
 def deactivate_card_backend(card_number: str) -> str:
@@ -25,7 +53,36 @@ def deactivate_card_backend(card_number: str) -> str:
     """
     if not Validators.is_valid_card_number(card_number):
         return "Invalid card number. Deactivation failed."
-    if card_number not in _active_cards:
+    if not get_card_store().deactivate(card_number):
         return f"Card {card_number} is not currently active."
-    _active_cards.remove(card_number)
     return f"Card {card_number} has been successfully deactivated."
+
+
+def bulk_card_operation_backend(card_numbers, activate: bool = True, batch_size: int = 500):
+    """
+    Activates or deactivates many cards. Card numbers are consumed from the iterable in
+    batches, each validated together and applied in one store transaction, so memory stays
+    bounded for arbitrarily long inputs.
+    Yields (card_number, status, message) per card, in input order, where status is
+    "changed", "unchanged" or "invalid" and message is the single-card backend message.
+    """
+    store = get_card_store()
+    apply_batch = store.activate_many if activate else store.deactivate_many
+    iterator = iter(card_numbers)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        validity = Validators.validate_card_numbers(batch)
+        changed = iter(apply_batch([card for card, valid in zip(batch, validity) if valid]))
+        for card_number, valid in zip(batch, validity):
+            if not valid:
+                action = "Activation" if activate else "Deactivation"
+                yield card_number, "invalid", f"Invalid card number {card_number}. {action} failed."
+            elif next(changed):
+                state = "activated" if activate else "deactivated"
+                yield card_number, "changed", f"Card {card_number} has been successfully {state}."
+            elif activate:
+                yield card_number, "unchanged", f"Card {card_number} is already activated."
+            else:
+                yield card_number, "unchanged", f"Card {card_number} is not currently active."
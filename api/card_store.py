@@ -0,0 +1,200 @@
+# api/card_store.py
+
+"""
+Card-state storage engines used by the card management backend.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+
+class CardStore:
+    """
+    Interface of a card-state store. Transitions are compare-and-set: they only happen
+    if the card is in the opposite state, and report whether they did.
+    """
+
+    def activate(self, card_number: str) -> bool:
+        """
+        Mark the card active.
+        :return: True if the card was inactive (or unknown) and is now active, False if it already was
+        """
+        raise NotImplementedError
+
+    def deactivate(self, card_number: str) -> bool:
+        """
+        Mark the card inactive.
+        :return: True if the card was active and is now inactive, False if it was not active
+        """
+        raise NotImplementedError
+
+    def is_active(self, card_number: str) -> bool:
+        raise NotImplementedError
+
+    def activate_many(self, card_numbers) -> list:
+        """
+        Activate several cards in one transaction where the engine supports it.
+        :return: One activate() result per card number, in order
+        """
+        return [self.activate(card_number) for card_number in card_numbers]
+
+    def deactivate_many(self, card_numbers) -> list:
+        """
+        Deactivate several cards in one transaction where the engine supports it.
+        :return: One deactivate() result per card number, in order
+        """
+        return [self.deactivate(card_number) for card_number in card_numbers]
+
+    def close(self):
+        pass
+
+
+class InMemoryCardStore(CardStore):
+    """
+    Process-local store (state is lost on restart and not shared between workers). For tests.
+    """
+
+    def __init__(self):
+        self._active_cards = set()
+        self._lock = threading.Lock()
+
+    def activate(self, card_number: str) -> bool:
+        with self._lock:
+            if card_number in self._active_cards:
+                return False
+            self._active_cards.add(card_number)
+            return True
+
+    def deactivate(self, card_number: str) -> bool:
+        with self._lock:
+            if card_number not in self._active_cards:
+                return False
+            self._active_cards.remove(card_number)
+            return True
+
+    def is_active(self, card_number: str) -> bool:
+        with self._lock:
+            return card_number in self._active_cards
+
+    def activate_many(self, card_numbers) -> list:
+        with self._lock:
+            results = []
+            for card_number in card_numbers:
+                results.append(card_number not in self._active_cards)
+                self._active_cards.add(card_number)
+            return results
+
+    def deactivate_many(self, card_numbers) -> list:
+        with self._lock:
+            results = []
+            for card_number in card_numbers:
+                results.append(card_number in self._active_cards)
+                self._active_cards.discard(card_number)
+            return results
+
+
+class SQLiteCardStore(CardStore):
+    """
+    Durable store in an SQLite database in WAL mode, safe to share between threads and processes.
+    Each transition is a single conditional write, so concurrent writers cannot lose updates:
+    of two racing activations exactly one reports the change.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cards (
+            card_number TEXT PRIMARY KEY,
+            active INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """
+    # Fixed statement texts, so sqlite3's per-connection statement cache reuses the prepared statements
+    _ACTIVATE = """
+        INSERT INTO cards (card_number, active, updated_at) VALUES (?, 1, ?)
+        ON CONFLICT (card_number) DO UPDATE SET active = 1, updated_at = excluded.updated_at
+        WHERE cards.active = 0
+    """
+    _DEACTIVATE = "UPDATE cards SET active = 0, updated_at = ? WHERE card_number = ? AND active = 1"
+    _IS_ACTIVE = "SELECT active FROM cards WHERE card_number = ?"
+
+    def __init__(self, path: str = "card_state.db", busy_timeout: float = 30.0):
+        """
+        :param path: Database file; created if missing
+        :param busy_timeout: Seconds a writer waits for another process's write lock
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(self._SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads: one per thread
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            # isolation_level=None: autocommit, each conditional write is its own atomic transaction
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                         check_same_thread=False, cached_statements=64)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def activate(self, card_number: str) -> bool:
+        return self._connection().execute(self._ACTIVATE, (card_number, time.time())).rowcount == 1
+
+    def deactivate(self, card_number: str) -> bool:
+        return self._connection().execute(self._DEACTIVATE, (time.time(), card_number)).rowcount == 1
+
+    def is_active(self, card_number: str) -> bool:
+        row = self._connection().execute(self._IS_ACTIVE, (card_number,)).fetchone()
+        return bool(row and row[0])
+
+    def activate_many(self, card_numbers) -> list:
+        now = time.time()
+        return self._in_transaction(self._ACTIVATE, [(card_number, now) for card_number in card_numbers])
+
+    def deactivate_many(self, card_numbers) -> list:
+        now = time.time()
+        return self._in_transaction(self._DEACTIVATE, [(now, card_number) for card_number in card_numbers])
+
+    def _in_transaction(self, statement: str, rows) -> list:
+        """
+        Run the conditional write once per row inside a single write transaction
+        (one lock acquisition and one WAL sync for the whole batch).
+        :return: Whether each row changed a card
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            results = [connection.execute(statement, row).rowcount == 1 for row in rows]
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return results
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def create_card_store(kind: str = "sqlite", path: str = "card_state.db") -> CardStore:
+    """
+    :param kind: "sqlite" (durable, shared between workers) or "memory"
+    """
+    if kind == "memory":
+        return InMemoryCardStore()
+    if kind == "sqlite":
+        return SQLiteCardStore(path)
+    raise ValueError(f"Unknown card store '{kind}'")
@@ -1,4 +1,5 @@
 import os
+import uuid
 import streamlit as st
 import logging
 from dotenv import load_dotenv
@@ -6,11 +7,20 @@ from dotenv import load_dotenv
 from agents.api_agent import APIAgent
 from agents.knowledge_agent import KnowledgeAgent
 from agents.intent_agent_1 import IntentAgent
-from utils.faiss_indexer import FAISSIndexer
+from api.card_import import iter_card_numbers_csv
+from utils.faiss_indexer import FAISSIndexer, create_indexer, embedding_model_key
 from utils.llm_wrapper import LLMWrapper
+from utils.answer_cache import SemanticAnswerCache
+from utils.conversation_store import ConversationStore, SQLiteConversationLog
+from utils.single_flight import SingleFlight
+from utils.faq_index import FAQIndex, load_or_build_faq
+from utils.embedding_service import EmbeddingService, configure_torch_threads
+from utils.intent_classifier import LocalIntentClassifier, card_operation_cue
 from utils.logging_config import setup_logging
-from utils.clean_pdf import clean_pdf
-from utils.extract_sections import extract_sections_by_toc
+from utils.kb_cache import KnowledgeBaseCache, load_or_build_knowledge_base
+from utils.shared_index import SharedIndexSearcher, current_version, publish_knowledge_base, publish_lock
+from utils.tracing import tracer, start_metrics_server
+from utils.warmup import BackgroundLoader, FAILED
 
 # Setup environment and logging
 load_dotenv()
@@ -18,19 +28,194 @@ setup_logging()
 logger = logging.getLogger(__name__)
 groq_key = os.getenv("GROQ_API_KEY")
 PDF_PATH = 'global_card_access_user_guide.pdf'
+# Additional guides can be indexed by listing them in KB_PDF_PATHS (os.pathsep-separated)
+PDF_PATHS = tuple(p for p in os.getenv("KB_PDF_PATHS", PDF_PATH).split(os.pathsep) if p)
+KB_CACHE_DIR = os.getenv("KB_CACHE_DIR", ".kb_cache")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+# Set METRICS_PORT to expose /metrics (Prometheus) and /metrics.json
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# "background" renders the UI immediately and loads the knowledge base on a thread;
+# "blocking" waits for it before rendering (the previous behaviour)
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
+# "langchain" (default) or "native" (direct faiss, see utils/native_index.py) with FAISS_INDEX_TYPE
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "langchain")
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+# Embedding backend: "torch", "int8", "onnx" or "onnx-int8"; the ONNX backends need
+# EMBEDDING_MODEL pointing at a directory written by `python -m utils.fast_embeddings`
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# 0 keeps torch's default (one thread per host core, often more than the pod's CPU quota)
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+# Precomputed FAQ answers (generated with the LLM once per guide version, see utils/faq_index.py)
+FAQ_ENABLED = os.getenv("FAQ_INDEX", "1") == "1"
+FAQ_THRESHOLD = float(os.getenv("FAQ_THRESHOLD", "0.88"))
+# Chat history: turns kept in session memory, turns rendered per page, and the transcript database
+CHAT_WINDOW = int(os.getenv("CHAT_WINDOW", "40"))
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))
+# Recent turns sent to the agents with the rolling summary of older ones (0 = no conversation context)
+CHAT_CONTEXT_TURNS = int(os.getenv("CHAT_CONTEXT_TURNS", "6"))
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", "conversations.db")
+# Transcript turns older than this are deleted when a new session starts (0 = keep everything)
+CHAT_RETENTION_DAYS = float(os.getenv("CHAT_RETENTION_DAYS", "30"))
+# Directory of a memory-mapped index shared by all worker processes on the host (see
+# utils/shared_index.py); unset keeps a private in-process index per worker
+KB_SHARED_DIR = os.getenv("KB_SHARED_DIR", "")
+KB_SHARED_CHECK_INTERVAL = float(os.getenv("KB_SHARED_CHECK_INTERVAL", "5"))
 
-# Build knowledge base
-logger.info("Cleaning and indexing PDF...")
-cleaned_pdf_path = clean_pdf(PDF_PATH)
-sections = extract_sections_by_toc(cleaned_pdf_path)
-indexer = FAISSIndexer()
-indexer.build_faiss_index(sections)
-llm_wrapper = LLMWrapper(groq_key)
 
-# Initialize agents
-api_agent = APIAgent()
-knowledge_agent = KnowledgeAgent(indexer, llm_wrapper)
-intent_agent = IntentAgent(groq_key, api_agent, knowledge_agent, temperature=0.2)
+@st.cache_resource
+def load_api_agent() -> APIAgent:
+    """
+    The API agent needs no embeddings, so it is available before the warm-up finishes.
+    """
+    return APIAgent()
+
+
+def load_knowledge_base(pdf_paths: tuple) -> FAISSIndexer:
+    """
+    Build (or load from the on-disk cache) the FAISS index for the PDFs, or map the shared
+    index when KB_SHARED_DIR is set.
+    """
+    configure_torch_threads(TORCH_NUM_THREADS or None)
+    if KB_SHARED_DIR:
+        indexer = load_shared_index(pdf_paths)
+    else:
+        options = {"index_type": FAISS_INDEX_TYPE} if RETRIEVAL_BACKEND == "native" else {}
+        indexer = create_indexer(RETRIEVAL_BACKEND, EMBEDDING_MODEL, embedding_backend=EMBEDDING_BACKEND, **options)
+    # Search, intent classification and the answer cache all embed the same user message:
+    # the service encodes it once, and batches encodes from concurrent sessions
+    indexer.embeddings = EmbeddingService(
+        indexer.embeddings,
+        cache_size=int(os.getenv("EMBED_CACHE_SIZE", "2048")),
+        max_batch_size=int(os.getenv("EMBED_MAX_BATCH", "32")),
+        max_wait_ms=float(os.getenv("EMBED_BATCH_WAIT_MS", "2")),
+    )
+    if KB_SHARED_DIR:
+        # Read-only: new guide versions are published with `python -m utils.shared_index`
+        return indexer
+    cache = KnowledgeBaseCache(KB_CACHE_DIR)
+    for pdf_path in pdf_paths:
+        logger.info("Loading knowledge base for %s...", pdf_path)
+        load_or_build_knowledge_base(pdf_path, indexer, cache, workers=INGEST_WORKERS)
+    return indexer
+
+
+def load_shared_index(pdf_paths: tuple) -> SharedIndexSearcher:
+    """
+    Map the index shared through KB_SHARED_DIR. If none was published yet, the first worker
+    builds and publishes it while the others wait on the lock, then map the same files.
+    """
+    if current_version(KB_SHARED_DIR) is None:
+        with publish_lock(KB_SHARED_DIR):
+            if current_version(KB_SHARED_DIR) is None:
+                logger.info("No shared index in %s, publishing one...", KB_SHARED_DIR)
+                indexer = create_indexer("native", EMBEDDING_MODEL, embedding_backend=EMBEDDING_BACKEND)
+                publish_knowledge_base(KB_SHARED_DIR, pdf_paths, indexer, KnowledgeBaseCache(KB_CACHE_DIR),
+                                       workers=INGEST_WORKERS)
+                # Keep the loaded model for queries; the private index is dropped
+                return SharedIndexSearcher(KB_SHARED_DIR, indexer.embedding_model_name, embeddings=indexer.embeddings,
+                                           check_interval=KB_SHARED_CHECK_INTERVAL)
+    return SharedIndexSearcher(KB_SHARED_DIR, embedding_model_key(EMBEDDING_MODEL, EMBEDDING_BACKEND),
+                               check_interval=KB_SHARED_CHECK_INTERVAL)
+
+
+def load_faq_index(indexer: FAISSIndexer, llm_wrapper: LLMWrapper, pdf_paths: tuple) -> FAQIndex:
+    """
+    Fill the FAQ index from the cache on a background thread, generating the entries with the
+    LLM on a miss (once across the workers sharing KB_CACHE_DIR, see load_or_build_faq).
+    Until it is filled the index matches nothing, so the agents need not wait.
+    """
+    faq_index = FAQIndex(indexer.embeddings, threshold=FAQ_THRESHOLD)
+    cache = KnowledgeBaseCache(KB_CACHE_DIR)
+
+    def build():
+        for pdf_path in pdf_paths:
+            load_or_build_faq(pdf_path, faq_index, llm_wrapper, cache,
+                              embedding_model_name=indexer.embedding_model_name)
+        return faq_index
+
+    BackgroundLoader(build, name="FAQ index build").start()
+    return faq_index
+
+
+def load_agents(indexer: FAISSIndexer, api_agent: APIAgent, pdf_paths: tuple = ()) -> IntentAgent:
+    """
+    Build the agents on top of the loaded knowledge base.
+    """
+    llm_wrapper = LLMWrapper(groq_key)
+    faq_index = load_faq_index(indexer, llm_wrapper, pdf_paths) if FAQ_ENABLED else None
+    answer_cache = SemanticAnswerCache(
+        indexer.embeddings.embed_query,
+        similarity_threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+        max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+    )
+    # Users asking the same question at the same time (e.g. after a campaign email) share one LLM call
+    single_flight = SingleFlight(timeout=float(os.getenv("COALESCE_TIMEOUT", "60")))
+    knowledge_agent = KnowledgeAgent(indexer, llm_wrapper, answer_cache=answer_cache, single_flight=single_flight,
+                                     faq_index=faq_index)
+    # The local classifier reuses the embedding model already loaded for the index
+    intent_classifier = LocalIntentClassifier(
+        indexer.embeddings.embed_documents,
+        indexer.embeddings.embed_query,
+        card_number_fn=api_agent._extract_card_number,
+    )
+    return IntentAgent(groq_key, api_agent, knowledge_agent, temperature=0.2,
+                       intent_classifier=intent_classifier,
+                       confidence_threshold=float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.8")),
+                       combined_mode=os.getenv("INTENT_COMBINED_MODE", "0") == "1",
+                       llm_wrapper=llm_wrapper)
+
+
+@st.cache_resource
+def get_conversation_log(path: str) -> SQLiteConversationLog:
+    """
+    Transcript log shared by all sessions of the process.
+    """
+    return SQLiteConversationLog(path)
+
+
+@st.cache_resource
+def start_metrics(port: int):
+    """
+    Start the metrics endpoint once per process.
+    """
+    return start_metrics_server(port) if port else None
+
+
+@st.cache_resource
+def start_warmup(pdf_paths: tuple) -> BackgroundLoader:
+    """
+    Load the knowledge base and build the agents on a background thread, once per process,
+    so their caches and counters are shared by all sessions and survive reruns.
+    """
+    api_agent = load_api_agent()
+    return BackgroundLoader(lambda: load_agents(load_knowledge_base(pdf_paths), api_agent, pdf_paths),
+                            name="knowledge base warm-up").start()
+
+
+def respond_while_loading(user_input: str) -> str:
+    """
+    Answer before the knowledge base is ready: unambiguous card operations go straight to
+    the API agent, anything else is asked to retry shortly.
+    """
+    api_agent = load_api_agent()
+    intent = card_operation_cue(user_input, api_agent._extract_card_number)
+    if intent == "activate":
+        return api_agent.activate_card(user_input)
+    if intent == "deactivate":
+        return api_agent.deactivate_card(user_input)
+    if warmup.state == FAILED:
+        return "Sorry, the knowledge base could not be loaded. Card activation and deactivation still work."
+    return ("I'm still loading the card user guide. Card activation and deactivation already work; "
+            "please ask your question again in a few seconds.")
+
+
+# Load the knowledge base and agents (in the background unless STARTUP_MODE=blocking)
+start_metrics(METRICS_PORT)
+warmup = start_warmup(PDF_PATHS)
+if STARTUP_MODE == "blocking":
+    warmup.wait()
 
 # Streamlit UI
 st.set_page_config(page_title="CardAssist Chatbot", layout="wide")
@@ -47,34 +232,89 @@ with st.sidebar:
     """)
     st.markdown("---")
     st.info("💡 Tip: Ask things like:\n- *How do I activate my card?*\n- *What’s the PIN reset process?*")
+    if warmup.ready:
+        st.success(f"Knowledge base ready (loaded in {warmup.elapsed():.1f}s)")
+    elif warmup.state == FAILED:
+        st.error(f"Knowledge base failed to load: {warmup.error}")
+    else:
+        st.warning(f"Loading knowledge base… {warmup.elapsed():.0f}s (card activation/deactivation available)")
+
+    st.markdown("---")
+    st.subheader("📂 Bulk card operations")
+    bulk_file = st.file_uploader("CSV of card numbers", type=["csv", "txt"])
+    bulk_action = st.radio("Action", ["Activate", "Deactivate"], horizontal=True)
+    run_bulk = st.button("Run bulk operation", disabled=bulk_file is None)
 
 st.markdown("### 💬 Ask me anything about your card services")
 
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+if "conversation" not in st.session_state:
+    conversation_log = get_conversation_log(CONVERSATION_DB)
+    if CHAT_RETENTION_DAYS > 0:
+        pruned = conversation_log.prune(CHAT_RETENTION_DAYS * 86400)
+        if pruned:
+            logger.info("Pruned %d transcript turns older than %g days", pruned, CHAT_RETENTION_DAYS)
+    st.session_state.conversation = ConversationStore(uuid.uuid4().hex, log=conversation_log, window=CHAT_WINDOW)
+    st.session_state.history_pages = 1
+conversation = st.session_state.conversation
 
-# Display chat history
-for i, (role, message) in enumerate(st.session_state.chat_history):
+# Display the last pages of the chat history; older turns are only read when asked for,
+# so a rerun costs the same however long the session has been running
+shown = CHAT_PAGE_SIZE * st.session_state.history_pages
+if len(conversation) > shown:
+    # Fixed label: a label that changes between reruns would make it a new widget and lose the click
+    st.caption(f"{len(conversation) - shown} earlier messages")
+    if st.button("Show earlier messages"):
+        st.session_state.history_pages += 1
+        shown += CHAT_PAGE_SIZE
+for role, message in conversation.earlier(0, shown):
     with st.chat_message(role):
         st.markdown(message)
 
 user_input = st.chat_input("Type your message here...")
 
 if user_input:
-    st.session_state.chat_history.append(("user", user_input))
+    # The agents see a compacted history (summary + last turns), never the whole transcript
+    history = conversation.context(CHAT_CONTEXT_TURNS) if CHAT_CONTEXT_TURNS else ""
+    conversation.append("user", user_input)
     with st.chat_message("user"):
         st.markdown(user_input)
 
-    with st.spinner("Processing your request..."):
-        try:
-            response = intent_agent.decide_and_execute(user_input)
-        except Exception as e:
-            response = f"An error occurred: {e}"
-            logger.error(e)
+    # Render the answer incrementally as tokens arrive; write_stream returns the full text
+    with st.chat_message("assistant"):
+        with st.spinner("Processing your request..."):
+            # One trace per chat turn: stage timings end up in the metrics histograms
+            with tracer.request() as trace:
+                try:
+                    if warmup.ready:
+                        response = st.write_stream(warmup.result.stream_decide_and_execute(user_input, history))
+                    else:
+                        response = respond_while_loading(user_input)
+                        st.markdown(response)
+                except Exception as e:
+                    response = f"An error occurred: {e}"
+                    logger.error("Request %s failed: %s", trace["request_id"], e)
+                    st.markdown(response)
+
+    conversation.append("assistant", response)
 
-    st.session_state.chat_history.append(("assistant", response))
+if run_bulk and bulk_file is not None:
+    request = f"{bulk_action} all cards in {bulk_file.name}"
+    conversation.append("user", request)
+    with st.chat_message("user"):
+        st.markdown(request)
+    # The file is read and applied in batches; results stream in as each batch commits
     with st.chat_message("assistant"):
-        st.markdown(response)
+        with tracer.request(), tracer.span("tool_execution", tool=f"bulk_{bulk_action.lower()}"):
+            try:
+                response = st.write_stream(load_api_agent().stream_bulk_operation(
+                    iter_card_numbers_csv(bulk_file), activate=bulk_action == "Activate"))
+                # Keep only the summary line in the history; the per-card list can be very long
+                response = response.strip().splitlines()[-1]
+            except Exception as e:
+                response = f"An error occurred: {e}"
+                logger.error("Bulk operation failed: %s", e)
+                st.markdown(response)
+    conversation.append("assistant", response)
 
 # Agent Responsibility Table
 with st.expander("🧠 Agent Responsibilities", expanded=False):
@@ -0,0 +1,217 @@
+# batch_qa.py
+
+"""
+Batch question answering: runs a JSONL file of questions through the
+IntentAgent / KnowledgeAgent pipeline without the chat UI.
+
+Queries are embedded in one batched call per block, retrieved with a single
+FAISS matrix query, and answered with concurrent LLM calls up to a limit.
+Results are appended to the output JSONL as they finish; re-running the same
+command skips questions that already have an answer.
+
+Usage:
+    python batch_qa.py questions.jsonl answers.jsonl --concurrency 16
+Each input line is {"id": ..., "question": ...} ("id" defaults to the line number).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+from agents.api_agent import APIAgent
+from agents.intent_agent_1 import IntentAgent, parse_combined_response
+from agents.knowledge_agent import KnowledgeAgent
+from utils.async_llm_client import get_async_llm_client
+from utils.context_builder import ContextAssembler
+from utils.faiss_indexer import FAISSIndexer
+from utils.intent_classifier import LocalIntentClassifier
+from utils.kb_cache import KnowledgeBaseCache, load_or_build_knowledge_base
+
+logger = logging.getLogger(__name__)
+
+
+def read_questions(path: str):
+    """
+    Yield {"id", "question"} records from a JSONL file.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            yield {"id": str(record.get("id", line_no)), "question": record["question"]}
+
+
+def completed_ids(path: str) -> set:
+    """
+    IDs already answered without error in an existing output file (for resuming).
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash; the question is simply run again
+                continue
+            if not record.get("error"):
+                done.add(str(record["id"]))
+    return done
+
+
+class BatchRunner:
+    """
+    Answers questions in blocks: batched embedding, matrix retrieval and concurrent generation.
+    """
+
+    def __init__(self, indexer: FAISSIndexer, llm_client, api_agent: APIAgent = None,
+                 intent_classifier: LocalIntentClassifier = None, confidence_threshold: float = 0.8,
+                 top_k: int = 6, context_token_budget: int = 600, concurrency: int = 8, batch_size: int = 256):
+        """
+        :param indexer: Populated FAISSIndexer
+        :param llm_client: AsyncLLMClient (or any object with an async generate_answer(prompt))
+        :param api_agent: APIAgent executing card operations
+        :param intent_classifier: Local intent classifier; questions it is not confident about
+                                  use the combined intent+answer prompt
+        :param concurrency: Maximum concurrent LLM generations
+        :param batch_size: Questions embedded and searched together
+        """
+        self.indexer = indexer
+        self.llm_client = llm_client
+        self.api_agent = api_agent or APIAgent()
+        self.intent_classifier = intent_classifier
+        self.confidence_threshold = confidence_threshold
+        self.top_k = top_k
+        self.context_assembler = ContextAssembler(token_budget=context_token_budget)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.tools = {
+            "activate": self.api_agent.activate_card,
+            "deactivate": self.api_agent.deactivate_card,
+        }
+
+    async def _answer(self, record: dict, intent, context: str, semaphore: asyncio.Semaphore) -> dict:
+        start = time.perf_counter()
+        result = dict(record, intent=intent)
+        try:
+            if intent in self.tools:
+                result["answer"] = self.tools[intent](record["question"])
+            else:
+                async with semaphore:
+                    if intent == "knowledge":
+                        if context:
+                            prompt = KnowledgeAgent.build_prompt(record["question"], context)
+                            result["answer"] = await self.llm_client.generate_answer(prompt)
+                        else:
+                            result["answer"] = "I'm sorry, I couldn't find information related to your question."
+                    else:
+                        prompt = IntentAgent.build_combined_prompt(record["question"], context)
+                        parsed = parse_combined_response(await self.llm_client.generate_answer(prompt))
+                        result["intent"] = "knowledge" if parsed["action"] == "answer" else parsed["action"]
+                        result["answer"] = (parsed["answer"] if parsed["action"] == "answer"
+                                            else self.tools[parsed["action"]](record["question"]))
+        except Exception as e:
+            logger.error("Question %s failed: %s", record["id"], e)
+            result["error"] = str(e)
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    async def _run_block(self, block, out_file, semaphore):
+        questions = [record["question"] for record in block]
+        vectors = self.indexer.embeddings.embed_documents(questions)
+        hit_lists = self.indexer.search_chunks_by_vectors(vectors, top_k=self.top_k)
+
+        tasks = []
+        for record, vector, hits in zip(block, vectors, hit_lists):
+            # None means "not sure": the combined intent+answer prompt decides
+            intent = "knowledge"
+            if self.intent_classifier is not None:
+                label, confidence = self.intent_classifier.classify_vector(record["question"], vector)
+                intent = label if confidence >= self.confidence_threshold else None
+            context = self.context_assembler.assemble(hits) if intent not in self.tools else ""
+            tasks.append(asyncio.ensure_future(self._answer(record, intent, context, semaphore)))
+
+        for finished in asyncio.as_completed(tasks):
+            result = await finished
+            out_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out_file.flush()
+            yield result
+
+    async def run(self, input_path: str, output_path: str):
+        """
+        Answer every question of input_path not already answered in output_path.
+        :return: Counters {"answered", "failed", "skipped"}
+        """
+        done = completed_ids(output_path)
+        counts = {"answered": 0, "failed": 0, "skipped": 0}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        with open(output_path, "a", encoding="utf-8") as out_file:
+            block = []
+            for record in read_questions(input_path):
+                if record["id"] in done:
+                    counts["skipped"] += 1
+                    continue
+                block.append(record)
+                if len(block) >= self.batch_size:
+                    await self._drain(block, out_file, semaphore, counts)
+                    block = []
+            if block:
+                await self._drain(block, out_file, semaphore, counts)
+        return counts
+
+    async def _drain(self, block, out_file, semaphore, counts):
+        async for result in self._run_block(block, out_file, semaphore):
+            counts["failed" if result.get("error") else "answered"] += 1
+        logger.info("Batch progress: %s", counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions in batch")
+    parser.add_argument("input", help="Input JSONL with {\"id\", \"question\"} records")
+    parser.add_argument("output", help="Output JSONL; existing answers are kept and skipped")
+    parser.add_argument("--pdf", action="append", help="Knowledge base PDF (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum concurrent LLM calls")
+    parser.add_argument("--batch-size", type=int, default=256, help="Questions embedded and searched together")
+    parser.add_argument("--top-k", type=int, default=6)
+    parser.add_argument("--no-intent", action="store_true", help="Treat every question as a knowledge question")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    indexer = FAISSIndexer()
+    cache = KnowledgeBaseCache(os.getenv("KB_CACHE_DIR", ".kb_cache"))
+    for pdf_path in args.pdf or ["global_card_access_user_guide.pdf"]:
+        load_or_build_knowledge_base(pdf_path, indexer, cache)
+
+    api_agent = APIAgent()
+    classifier = None
+    if not args.no_intent:
+        classifier = LocalIntentClassifier(indexer.embeddings.embed_documents, indexer.embeddings.embed_query,
+                                           card_number_fn=api_agent._extract_card_number)
+
+    async def run():
+        client = get_async_llm_client(max_concurrency=args.concurrency)
+        runner = BatchRunner(indexer, client, api_agent, classifier, top_k=args.top_k,
+                             concurrency=args.concurrency, batch_size=args.batch_size)
+        start = time.perf_counter()
+        try:
+            counts = await runner.run(args.input, args.output)
+        finally:
+            await client.aclose()
+        elapsed = time.perf_counter() - start
+        processed = counts["answered"] + counts["failed"]
+        print(f"{counts} in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.2f} questions/s)")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/embedding_backends.py
+
+"""
+Parity check and benchmark of the optimized embedding backends against the PyTorch model.
+
+For each candidate backend the guide's chunks and the benchmark queries are embedded, then:
+- parity: per-text cosine similarity to the reference vectors, and agreement of the top-k
+  retrieved chunks (top-1 match rate and mean top-k overlap);
+- speed: bulk indexing throughput and single-query latency.
+Exits with status 1 if a backend falls below the tolerances.
+
+Usage:
+    python -m benchmarks.embedding_backends --backend int8
+    python -m benchmarks.embedding_backends --backend onnx --backend onnx-int8 --model-dir models/minilm-onnx
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.run_benchmarks import QUERIES, measure
+from utils.chunking import chunk_sections
+from utils.fast_embeddings import create_embeddings
+from utils.native_index import SentenceTransformerEmbeddings
+from utils.pdf_ingest import ingest_pdf
+
+
+def top_k(query_vectors: np.ndarray, chunk_vectors: np.ndarray, k: int) -> np.ndarray:
+    # Vectors are normalized, so the dot product is the cosine similarity
+    return np.argsort(-(query_vectors @ chunk_vectors.T), axis=1)[:, :k]
+
+
+def evaluate(name, embeddings, texts, reference, args):
+    """
+    Embed with one backend and compare with the reference vectors.
+    :return: Result dict (parity and timing figures)
+    """
+    embeddings.embed_documents(texts[:4])  # warm-up
+    start = time.perf_counter()
+    chunk_vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    bulk_seconds = time.perf_counter() - start
+    query_vectors = np.asarray([embeddings.embed_query(q) for q in QUERIES], dtype=np.float32)
+
+    state = {"i": 0}
+
+    def single_query():
+        embeddings.embed_query(QUERIES[state["i"] % len(QUERIES)])
+        state["i"] += 1
+
+    single = measure(single_query, args.query_iterations)
+
+    result = {
+        "backend": name,
+        "bulk_chunks_per_s": round(len(texts) / bulk_seconds, 1),
+        "query_p50_ms": single["p50_ms"],
+        "query_p95_ms": single["p95_ms"],
+    }
+    if reference is not None:
+        ref_chunks, ref_queries = reference
+        cosine = np.concatenate([(chunk_vectors * ref_chunks).sum(axis=1), (query_vectors * ref_queries).sum(axis=1)])
+        expected = top_k(ref_queries, ref_chunks, args.top_k)
+        got = top_k(query_vectors, chunk_vectors, args.top_k)
+        overlap = [len(set(e) & set(g)) / args.top_k for e, g in zip(expected, got)]
+        result.update({
+            "min_cosine": round(float(cosine.min()), 5),
+            "mean_cosine": round(float(cosine.mean()), 5),
+            "top1_match": round(float(np.mean(expected[:, 0] == got[:, 0])), 3),
+            "topk_overlap": round(float(np.mean(overlap)), 3),
+        })
+    return result, (chunk_vectors, query_vectors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend parity check and benchmark")
+    parser.add_argument("--pdf", default="global_card_access_user_guide.pdf")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Reference PyTorch model name or path")
+    parser.add_argument("--backend", action="append", choices=["int8", "onnx", "onnx-int8"],
+                        help="Candidate backend (repeatable; default int8)")
+    parser.add_argument("--model-dir", help="Exported ONNX model directory (for the onnx backends)")
+    parser.add_argument("--top-k", type=int, default=6)
+    parser.add_argument("--query-iterations", type=int, default=100)
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="Minimum per-text cosine to the reference")
+    parser.add_argument("--min-overlap", type=float, default=0.9, help="Minimum mean top-k overlap")
+    args = parser.parse_args()
+
+    texts = [chunk["text"] for chunk in chunk_sections(ingest_pdf(args.pdf))]
+    print(f"{len(texts)} chunks, {len(QUERIES)} queries")
+
+    results = []
+    reference_result, reference = evaluate("torch", SentenceTransformerEmbeddings(args.model), texts, None, args)
+    results.append(reference_result)
+    for backend in args.backend or ["int8"]:
+        model = args.model_dir if backend.startswith("onnx") else args.model
+        if model is None:
+            parser.error(f"--model-dir is required for the {backend} backend")
+        result, _vectors = evaluate(backend, create_embeddings(backend, model), texts, reference, args)
+        results.append(result)
+
+    failed = False
+    base = results[0]
+    for result in results:
+        line = (f"{result['backend']:<10} bulk {result['bulk_chunks_per_s']:>8.1f} chunks/s "
+                f"({result['bulk_chunks_per_s'] / base['bulk_chunks_per_s']:4.2f}x)  "
+                f"query p50 {result['query_p50_ms']:>7.2f} ms ({base['query_p50_ms'] / result['query_p50_ms']:4.2f}x)")
+        if "min_cosine" in result:
+            ok = result["min_cosine"] >= args.min_cosine and result["topk_overlap"] >= args.min_overlap
+            failed = failed or not ok
+            line += (f"  cosine min {result['min_cosine']:.4f} mean {result['mean_cosine']:.4f}  "
+                     f"top1 {result['top1_match']:.2f}  top{args.top_k} overlap {result['topk_overlap']:.2f}"
+                     f"  {'OK' if ok else 'PARITY FAILED'}")
+        print(line)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/fake_llm.py
+
+"""
+FakeLLM: Deterministic, offline stand-in for LLMWrapper with configurable simulated latency.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+
+class FakeLLM:
+    """
+    Drop-in replacement for LLMWrapper (generate_answer / stream_answer) that never touches the network.
+    Replies depend only on the prompt, so runs are reproducible.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, tokens_per_second: float = 0.0, seed: int = 0):
+        """
+        :param latency: Simulated time to first token, in seconds
+        :param jitter: Uniform +/- jitter added to the latency, in seconds
+        :param tokens_per_second: Simulated generation speed for the answer body (0 = instant)
+        :param seed: Seed for the jitter, so timings are reproducible too
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self._random = random.Random(seed)
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def reply(self, prompt: str) -> str:
+        """
+        The reply to the prompt, without simulated latency and without counting a call.
+        """
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        user_input = re.search(r'User Input: "(.*)"', prompt)
+        text = (user_input.group(1) if user_input else prompt).lower()
+        if "CLASSIFY_INTENT" in prompt:
+            intent = "knowledge"
+            if re.search(r"\b\d{9}\b", text):
+                intent = "deactivate" if "deactivat" in text else "activate"
+            return f"Thought: stub reasoning\nAction: CLASSIFY_INTENT[{intent}]\nAnswer: {intent}"
+        answer = f"Stub answer {digest}: follow the steps described in the card user guide."
+        if "single JSON object" in prompt:
+            return json.dumps({"action": "answer", "answer": answer})
+        return answer
+
+    def _count_call(self):
+        # Agents may call one instance from many threads (concurrency benchmarks)
+        with self._calls_lock:
+            self.calls += 1
+
+    def _wait_first_token(self):
+        delay = self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def generate_answer(self, prompt: str) -> str:
+        self._count_call()
+        self._wait_first_token()
+        reply = self.reply(prompt)
+        if self.tokens_per_second:
+            time.sleep(len(reply.split()) / self.tokens_per_second)
+        return reply
+
+    def stream_answer(self, prompt: str):
+        self._count_call()
+        self._wait_first_token()
+        for word in self.reply(prompt).split(" "):
+            if self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            yield word + " "
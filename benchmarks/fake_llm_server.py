@@ -0,0 +1,270 @@
+# benchmarks/fake_llm_server.py
+
+"""
+Local stand-in for the Groq / OpenAI-compatible chat completions API, for load tests that
+must not spend real quota. Replies come from FakeLLM (deterministic, prompt-dependent), with:
+
+- latency drawn from a fixed, uniform or lognormal distribution (time to first token),
+- a generation speed for the answer body, streamed as server-sent events when requested,
+- a random error rate (HTTP 500) and 429 throttling above a request rate or concurrency limit.
+
+Any POST path ending in /chat/completions is served, so both the Groq SDK
+(base_url http://host:port) and OpenAI-style clients (http://host:port/v1) work.
+GET /stats returns the request counters.
+
+Usage:
+    python -m benchmarks.fake_llm_server --port 8089 --latency 0.8 --distribution lognormal --error-rate 0.01
+    LLM_BASE_URL=http://127.0.0.1:8089 GROQ_API_KEY=fake streamlit run app.py
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fake_llm import FakeLLM
+from utils.chunking import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+
+class FakeLLMServer:
+    """
+    Behaviour and counters of the fake API; serve() exposes it over HTTP on a daemon thread.
+    """
+
+    def __init__(self, latency: float = 0.5, distribution: str = "lognormal", spread: float = 0.5,
+                 tokens_per_second: float = 0.0, error_rate: float = 0.0, rate_limit: float = 0.0,
+                 max_concurrency: int = 0, retry_after: float = 1.0, seed: int = 0):
+        """
+        :param latency: Time to first token in seconds (the median for "lognormal", the mean for "uniform")
+        :param distribution: "fixed", "uniform" (latency +/- spread * latency) or "lognormal" (sigma = spread)
+        :param tokens_per_second: Generation speed of the answer body (0 = instant)
+        :param error_rate: Fraction of requests answered with HTTP 500
+        :param rate_limit: Requests per second accepted before answering 429 (0 = unlimited)
+        :param max_concurrency: In-flight requests accepted before answering 429 (0 = unlimited)
+        :param retry_after: Retry-After seconds sent with 429 responses
+        """
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{distribution}', expected one of {DISTRIBUTIONS}")
+        self.latency = latency
+        self.distribution = distribution
+        self.spread = spread
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self.replies = FakeLLM()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = rate_limit
+        self._refilled_at = time.monotonic()
+        self.in_flight = 0
+        self.requests = 0
+        self.completed = 0
+        self.throttled = 0
+        self.errors = 0
+        self.streamed = 0
+
+    def sample_latency(self) -> float:
+        with self._lock:
+            if self.distribution == "uniform":
+                return max(0.0, self._random.uniform(self.latency * (1 - self.spread), self.latency * (1 + self.spread)))
+            if self.distribution == "lognormal" and self.latency > 0:
+                return self._random.lognormvariate(math.log(self.latency), self.spread)
+            return self.latency
+
+    def admit(self) -> str:
+        """
+        Decide the fate of a new request.
+        :return: "ok", "throttled" or "error"; "ok" requests must call release() when done
+        """
+        with self._lock:
+            self.requests += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled_at) * self.rate_limit)
+                self._refilled_at = now
+                if self._tokens < 1:
+                    self.throttled += 1
+                    return "throttled"
+                self._tokens -= 1
+            if self.max_concurrency and self.in_flight >= self.max_concurrency:
+                self.throttled += 1
+                return "throttled"
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return "error"
+            self.in_flight += 1
+            return "ok"
+
+    def release(self, streamed: bool = False):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            self.streamed += streamed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "completed": self.completed,
+                "throttled": self.throttled,
+                "errors": self.errors,
+                "streamed": self.streamed,
+                "in_flight": self.in_flight,
+            }
+
+    def serve(self, port: int = 0, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Start the HTTP server on a daemon thread (port 0 picks a free port, see server.server_port).
+        """
+        server = _Server((host, port), _make_handler(self))
+        threading.Thread(target=server.serve_forever, daemon=True, name="fake-llm-server").start()
+        logger.info("Fake LLM server on http://%s:%d", host, server.server_port)
+        return server
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up (timeouts, retries) are expected under load; keep them out of stderr
+        logger.debug("fake LLM server: connection error from %s", client_address, exc_info=True)
+
+
+def _make_handler(fake: FakeLLMServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, payload: dict, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                self._send_json(200, fake.stats())
+            else:
+                self._send_json(404, {"error": {"message": "Not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length)
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found"}})
+                return
+            try:
+                request = json.loads(raw)
+                prompt = request["messages"][-1]["content"]
+            except (ValueError, KeyError, IndexError, TypeError):
+                self._send_json(400, {"error": {"message": "Malformed chat completion request"}})
+                return
+
+            outcome = fake.admit()
+            if outcome == "throttled":
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                                headers={"Retry-After": f"{fake.retry_after:g}"})
+                return
+            if outcome == "error":
+                self._send_json(500, {"error": {"message": "Injected server error"}})
+                return
+            stream = bool(request.get("stream"))
+            try:
+                time.sleep(fake.sample_latency())
+                reply = fake.replies.reply(prompt)
+                usage = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(reply)}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                if stream:
+                    self._stream(request, reply, usage)
+                else:
+                    if fake.tokens_per_second:
+                        time.sleep(len(reply.split()) / fake.tokens_per_second)
+                    self._send_json(200, {
+                        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": request.get("model"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": reply}}],
+                        "usage": usage,
+                    })
+            finally:
+                fake.release(streamed=stream)
+
+        def _stream(self, request, reply, usage):
+            # Server-sent events in the OpenAI chunk format; usage on the last chunk under x_groq like Groq
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+                    "created": int(time.time()), "model": request.get("model")}
+            words = reply.split(" ")
+            for i, word in enumerate(words):
+                if fake.tokens_per_second:
+                    time.sleep(1 / fake.tokens_per_second)
+                delta = {"content": word if i == len(words) - 1 else word + " "}
+                self._event(dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}]))
+            self._event(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                             x_groq={"id": base["id"], "usage": usage}))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+        def _event(self, payload: dict):
+            self.wfile.write(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            logger.debug("fake LLM server: " + format, *args)
+
+    return Handler
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """
+    Command-line options of FakeLLMServer (shared with benchmarks/load_test.py).
+    """
+    parser.add_argument("--latency", type=float, default=0.5, help="Time to first token in seconds (median)")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--spread", type=float, default=0.5, help="Lognormal sigma, or relative +/- range of uniform")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Generation speed (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with HTTP 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests/s before HTTP 429 (0 = unlimited)")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="In-flight requests before HTTP 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds of 429 responses")
+
+
+def server_from_args(args) -> FakeLLMServer:
+    return FakeLLMServer(latency=args.latency, distribution=args.distribution, spread=args.spread,
+                         tokens_per_second=args.tokens_per_second, error_rate=args.error_rate,
+                         rate_limit=args.rate_limit, max_concurrency=args.max_concurrency,
+                         retry_after=args.retry_after)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server_from_args(args).serve(args.port, args.host)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,87 @@
+# benchmarks/import_times.py
+
+"""
+Import-time breakdown: imports each module in a fresh interpreter (so nothing is
+already cached) and reports the wall time, then optionally lists the slowest
+sub-imports of one module from `python -X importtime`.
+
+Usage:
+    python -m benchmarks.import_times
+    python -m benchmarks.import_times --detail agents.intent_agent_1 --top 20
+"""
+import argparse
+import subprocess
+import sys
+
+# What app.py imports at start-up, followed by the heavy modules that should only load on demand
+STARTUP_MODULES = [
+    "streamlit",
+    "agents.api_agent",
+    "agents.intent_agent_1",
+    "agents.knowledge_agent",
+    "utils.faiss_indexer",
+    "utils.kb_cache",
+    "utils.llm_wrapper",
+    "utils.warmup",
+]
+DEFERRED_MODULES = [
+    "groq",
+    "fitz",
+    "pdfplumber",
+    "langchain_community.vectorstores",
+    "langchain_huggingface",
+    "sentence_transformers",
+    "torch",
+]
+
+
+def time_import(module: str) -> float:
+    """
+    Wall time in ms to import 'module' in a fresh interpreter, or None if it fails.
+    """
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def import_detail(module: str, top: int):
+    """
+    Slowest imports (cumulative microseconds) triggered by importing 'module'.
+    :return: List of (cumulative_us, self_us, name), slowest first
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative_us), int(self_us), name))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure module import times")
+    parser.add_argument("modules", nargs="*", help="Modules to time (defaults to the start-up and deferred sets)")
+    parser.add_argument("--detail", help="Show the slowest sub-imports of this module")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    groups = [("custom", args.modules)] if args.modules else [("start-up", STARTUP_MODULES),
+                                                            ("deferred", DEFERRED_MODULES)]
+    for group, modules in groups:
+        print(f"\n{group} imports (fresh interpreter each):")
+        for module in modules:
+            elapsed = time_import(module)
+            print(f"  {module:<36} {'failed' if elapsed is None else f'{elapsed:10.1f} ms'}")
+
+    if args.detail:
+        print(f"\nslowest imports under {args.detail} (cumulative / self):")
+        for cumulative_us, self_us, name in import_detail(args.detail, args.top):
+            print(f"  {cumulative_us / 1000:10.1f} ms {self_us / 1000:10.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
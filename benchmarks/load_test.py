@@ -0,0 +1,213 @@
+# benchmarks/load_test.py
+
+"""
+Load test of the chat pipeline: N concurrent simulated chat sessions send questions through
+the real IntentAgent -> KnowledgeAgent / APIAgent path (real embeddings and FAISS index),
+with the LLM served by the local fake API of benchmarks/fake_llm_server.py.
+
+Concurrency is raised step by step; each step runs for a fixed duration and reports
+throughput, latency percentiles (full response and first fragment), error rates by type,
+mean time per pipeline stage, and the LLM server's counters. The saturation point is the
+first step where adding sessions stops buying proportionally more throughput (or the p95
+exceeds --slo).
+
+Usage:
+    python -m benchmarks.load_test --concurrency 1,2,4,8,16,32 --duration 20 --latency 0.8
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8089 --save load.json
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from agents.api_agent import APIAgent
+from agents.intent_agent_1 import IntentAgent
+from agents.knowledge_agent import KnowledgeAgent
+from api.card_management import set_card_store
+from api.card_store import InMemoryCardStore
+from benchmarks.fake_llm_server import add_server_arguments, server_from_args
+from benchmarks.run_benchmarks import QUERIES
+from utils.faiss_indexer import create_indexer
+from utils.intent_classifier import LocalIntentClassifier
+from utils.kb_cache import KnowledgeBaseCache, load_or_build_knowledge_base
+from utils.llm_wrapper import LLMWrapper
+from utils.single_flight import SingleFlight
+from utils.tracing import tracer
+
+
+def build_agent(args, base_url: str) -> IntentAgent:
+    """
+    The app's agent stack, with the LLM pointed at base_url and an in-memory card store.
+    """
+    indexer = create_indexer(args.backend, args.model)
+    load_or_build_knowledge_base(args.pdf, indexer, KnowledgeBaseCache(args.cache_dir))
+    llm = LLMWrapper("fake-key", base_url=base_url, model=args.llm_model, timeout=args.llm_timeout,
+                     max_retries=args.llm_retries)
+    # Card operations must not write to the app's card database
+    set_card_store(InMemoryCardStore())
+    api_agent = APIAgent()
+    knowledge_agent = KnowledgeAgent(indexer, llm, single_flight=SingleFlight() if args.coalesce else None)
+    classifier = None
+    if not args.llm_intent:
+        classifier = LocalIntentClassifier(indexer.embeddings.embed_documents, indexer.embeddings.embed_query,
+                                           card_number_fn=api_agent._extract_card_number)
+    return IntentAgent(None, api_agent, knowledge_agent, llm_wrapper=llm, intent_classifier=classifier)
+
+
+def run_session(agent: IntentAgent, session_id: int, deadline: float, args, turns: list):
+    """
+    One simulated user: ask, read the streamed reply, think, repeat until the deadline.
+    Appends (latency, first_fragment_latency, error_type_or_None) per turn to 'turns'.
+    """
+    rng = random.Random(session_id)
+    turn = 0
+    while time.monotonic() < deadline:
+        question = rng.choice(QUERIES)
+        if args.unique_questions:
+            # Defeat answer sharing between sessions, so every knowledge turn reaches the LLM
+            question = f"{question} (session {session_id}, question {turn})"
+        start = time.perf_counter()
+        first = None
+        error = None
+        try:
+            for _fragment in agent.stream_decide_and_execute(question):
+                if first is None:
+                    first = time.perf_counter() - start
+        except Exception as e:
+            error = type(e).__name__
+        turns.append((time.perf_counter() - start, first, error))
+        turn += 1
+        if args.think_time:
+            time.sleep(rng.expovariate(1 / args.think_time))
+
+
+def _stage_means(before: dict, after: dict) -> dict:
+    means = {}
+    for name, stats in after["stages"].items():
+        old = before["stages"].get(name, {"count": 0, "sum_seconds": 0.0})
+        count = stats["count"] - old["count"]
+        if count:
+            means[name] = round((stats["sum_seconds"] - old["sum_seconds"]) / count * 1000, 2)
+    return means
+
+
+def run_level(agent: IntentAgent, concurrency: int, args, fake=None) -> dict:
+    """
+    Run 'concurrency' sessions for args.duration seconds and summarize the turns.
+    """
+    turns = []
+    before = tracer.snapshot()
+    server_before = fake.stats() if fake else {}
+    deadline = time.monotonic() + args.duration
+    started = time.perf_counter()
+    sessions = [threading.Thread(target=run_session, args=(agent, i, deadline, args, turns), daemon=True)
+                for i in range(concurrency)]
+    for session in sessions:
+        session.start()
+    for session in sessions:
+        session.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = np.asarray([latency for latency, _first, error in turns if error is None]) * 1000
+    firsts = np.asarray([first for _latency, first, error in turns if error is None and first is not None]) * 1000
+    errors = Counter(error for _latency, _first, error in turns if error is not None)
+
+    def percentile(values, q):
+        return round(float(np.percentile(values, q)), 1) if len(values) else None
+
+    result = {
+        "concurrency": concurrency,
+        "turns": len(turns),
+        "throughput_per_s": round(len(latencies) / elapsed, 2),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "first_fragment_p50_ms": percentile(firsts, 50),
+        "first_fragment_p95_ms": percentile(firsts, 95),
+        "error_rate": round(sum(errors.values()) / len(turns), 4) if turns else 0.0,
+        "errors": dict(errors),
+        "stage_mean_ms": _stage_means(before, tracer.snapshot()),
+    }
+    if fake:
+        result["llm_server"] = {key: value - server_before.get(key, 0) for key, value in fake.stats().items()
+                                if key != "in_flight"}
+    return result
+
+
+def find_saturation(results: list, min_efficiency: float, slo_ms: float = None):
+    """
+    Scaling efficiency of a step: relative throughput gain over the previous step divided by the
+    relative concurrency increase (1.0 = linear scaling, 0 = no gain).
+    :return: Concurrency of the first step with efficiency below min_efficiency, or whose p95
+             exceeded slo_ms; None if no step saturated
+    """
+    for previous, current in zip(results, results[1:]):
+        if not previous["throughput_per_s"]:
+            continue
+        gain = current["throughput_per_s"] / previous["throughput_per_s"] - 1
+        added = current["concurrency"] / previous["concurrency"] - 1
+        if added > 0 and gain / added < min_efficiency:
+            return current["concurrency"]
+    for result in results:
+        if slo_ms and result["p95_ms"] is not None and result["p95_ms"] > slo_ms:
+            return result["concurrency"]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent chat-session load test with a fake LLM API")
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 2, 4, 8, 16],
+                        help="Concurrent sessions per step, e.g. 1,2,4,8,16")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per step")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between a session's turns (s)")
+    parser.add_argument("--unique-questions", action="store_true", help="Make every question distinct")
+    parser.add_argument("--coalesce", action="store_true", help="Share answers of identical in-flight questions")
+    parser.add_argument("--llm-intent", action="store_true", help="Classify intents with the LLM only")
+    parser.add_argument("--base-url", help="Use a running fake (or real) API instead of an in-process server")
+    parser.add_argument("--llm-model", default="fake-llama")
+    parser.add_argument("--llm-timeout", type=float, default=30.0)
+    parser.add_argument("--llm-retries", type=int, default=2, help="Client retries on 429/5xx, as in the app")
+    parser.add_argument("--pdf", default="global_card_access_user_guide.pdf")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Embedding model name or local path")
+    parser.add_argument("--backend", choices=["langchain", "native"], default="langchain")
+    parser.add_argument("--cache-dir", default=".kb_cache")
+    parser.add_argument("--min-efficiency", type=float, default=0.5,
+                        help="Scaling efficiency below which a step counts as saturated (1.0 = linear)")
+    parser.add_argument("--slo", type=float, help="p95 latency budget in ms")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    fake = None
+    base_url = args.base_url
+    if base_url is None:
+        fake = server_from_args(args)
+        base_url = f"http://127.0.0.1:{fake.serve().server_port}"
+    agent = build_agent(args, base_url)
+    agent.decide_and_execute(QUERIES[0])  # warm-up
+
+    results = []
+    for concurrency in args.concurrency:
+        result = run_level(agent, concurrency, args, fake)
+        results.append(result)
+        print(f"x{concurrency:<4} {result['throughput_per_s']:>8.2f} turns/s  p50 {result['p50_ms'] or 0:>8.1f} ms  "
+              f"p95 {result['p95_ms'] or 0:>8.1f} ms  p99 {result['p99_ms'] or 0:>8.1f} ms  "
+              f"first p95 {result['first_fragment_p95_ms'] or 0:>8.1f} ms  errors {result['error_rate']:.2%} "
+              f"{result['errors'] or ''}", flush=True)
+        print(f"      stage means (ms): {result['stage_mean_ms']}"
+              + (f"\n      LLM server: {result['llm_server']}" if fake else ""), flush=True)
+
+    saturation = find_saturation(results, args.min_efficiency, args.slo)
+    print(f"\nSaturation point: {f'{saturation} concurrent sessions' if saturation else 'not reached'}")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results, "saturation": saturation}, f, indent=2)
+        print(f"Results written to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# benchmarks/run_benchmarks.py
+
+"""
+Offline benchmark suite for the hot paths: PDF cleaning/ingestion, index build,
+retrieval and the agent pipeline (with FakeLLM in place of the Groq model).
+
+Reports p50/p95/p99 latency, throughput and peak RSS per stage, and can save the
+results as a JSON baseline or compare them against one.
+
+Usage:
+    python -m benchmarks.run_benchmarks --save benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --compare benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from agents.api_agent import APIAgent
+from agents.intent_agent_1 import IntentAgent
+from agents.knowledge_agent import KnowledgeAgent
+from benchmarks.fake_llm import FakeLLM
+from utils.chunking import chunk_sections
+from utils.clean_pdf import clean_pdf
+from utils.embedding_service import EmbeddingService
+from utils.extract_sections import extract_sections_by_toc
+from utils.faiss_indexer import create_indexer
+from utils.intent_classifier import LocalIntentClassifier
+from utils.pdf_ingest import ingest_pdf
+from utils.single_flight import SingleFlight
+
+QUERIES = [
+    "How do I register for Global Card Access?",
+    "How do I reset a user's password?",
+    "How can I download multiple statements?",
+    "How do I create account request keys?",
+    "What does the program administration dashboard show?",
+    "How do I deactivate a user?",
+    "How do I manage approvers?",
+    "How do I view and download transactions?",
+    "How do I resend the welcome email?",
+    "What are account request errors?",
+    "How do I customize applications?",
+    "Where is the account listing?",
+    "Activate card 123456789",
+    "Please deactivate card 987654321",
+    "How do I edit user details?",
+    "How do I sign in to Global Card Access?",
+]
+
+
+def _current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Not Linux: fall back to the lifetime peak (KB on Linux/BSD, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRSSSampler:
+    """
+    Samples the process RSS on a background thread and records the peak seen while active.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = _current_rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss_bytes())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss_bytes())
+
+
+def measure(fn, iterations: int, items_per_call: int = 1):
+    """
+    Run fn() 'iterations' times and summarize the timings.
+    :param items_per_call: Units of work per call, used for the throughput figure
+    """
+    timings = []
+    with PeakRSSSampler() as rss:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    timings_ms = np.asarray(timings) * 1000
+    total = float(np.sum(timings))
+    return {
+        "iterations": iterations,
+        "p50_ms": round(float(np.percentile(timings_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(timings_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(timings_ms, 99)), 3),
+        "mean_ms": round(float(np.mean(timings_ms)), 3),
+        "throughput_per_s": round(iterations * items_per_call / total, 2) if total else None,
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+    }
+
+
+def _cycle(items):
+    state = {"i": 0}
+
+    def next_item():
+        item = items[state["i"] % len(items)]
+        state["i"] += 1
+        return item
+    return next_item
+
+
+def run_suite(args):
+    results = {}
+
+    def report(stage, stats):
+        results[stage] = stats
+        print(f"{stage:<32} p50 {stats['p50_ms']:>10.2f} ms  p95 {stats['p95_ms']:>10.2f} ms  "
+              f"p99 {stats['p99_ms']:>10.2f} ms  {stats['throughput_per_s'] or 0:>10.1f}/s  "
+              f"peak RSS {stats['peak_rss_mb']:>8.1f} MB", flush=True)
+
+    # --- Ingestion ---
+    if not args.skip_legacy:
+        report("legacy.clean_pdf", measure(lambda: clean_pdf(args.pdf), args.ingest_iterations))
+        cleaned = clean_pdf(args.pdf)
+        report("legacy.extract_sections_by_toc",
+               measure(lambda: extract_sections_by_toc(cleaned), args.ingest_iterations))
+    report("ingest_pdf", measure(lambda: ingest_pdf(args.pdf), args.ingest_iterations))
+    chunks = chunk_sections(ingest_pdf(args.pdf))
+
+    # --- Index build ---
+    holder = {}
+    options = {"index_type": args.index_type} if args.backend == "native" else {}
+    report("load_embedding_model",
+           measure(lambda: holder.update(indexer=create_indexer(args.backend, args.model, **options)), 1))
+    indexer = holder["indexer"]
+    report("build_faiss_index", measure(lambda: indexer.build_faiss_index(chunks), args.build_iterations,
+                                        items_per_call=len(chunks)))
+    base_embeddings = indexer.document_embeddings("default")
+
+    # --- Retrieval ---
+    next_query = _cycle(QUERIES)
+    report("search_chunks", measure(lambda: indexer.search_chunks(next_query()), args.query_iterations))
+
+    # --- Concurrent query encoding (as from many chat sessions): direct model calls vs
+    # the micro-batching service. Queries are made unique so the service's cache never hits.
+    counter = {"n": 0}
+
+    def concurrent_embed(embed_query):
+        counter["n"] += 1
+        queries = [f"{QUERIES[i % len(QUERIES)]} ({counter['n']}-{i})" for i in range(args.embed_threads * 4)]
+        with ThreadPoolExecutor(args.embed_threads) as pool:
+            list(pool.map(embed_query, queries))
+
+    service = EmbeddingService(indexer.embeddings)
+    items = args.embed_threads * 4
+    report(f"embed_query.x{args.embed_threads}.direct",
+           measure(lambda: concurrent_embed(indexer.embeddings.embed_query), 5, items_per_call=items))
+    report(f"embed_query.x{args.embed_threads}.service",
+           measure(lambda: concurrent_embed(service.embed_query), 5, items_per_call=items))
+    print(f"  embedding service: {service.stats()}")
+
+    # --- Synthetically enlarged corpora: extra copies of the guide as separate documents.
+    # Embeddings are reused (with a little noise so vectors stay distinct); the copies are
+    # removed again afterwards so the agent stages run on the original corpus.
+    rng = np.random.default_rng(0)
+    for scale in args.scales:
+        if scale <= 1:
+            continue
+        copies = [f"copy-{copy}" for copy in range(1, scale)]
+
+        def assemble():
+            for doc_id in copies:
+                noisy = base_embeddings + rng.normal(0, 0.01, base_embeddings.shape).astype(np.float32)
+                indexer.add_document(doc_id, chunks, embeddings=noisy)
+            # One query so backends that build their index lazily are measured fully built
+            indexer.search_chunks(QUERIES[0])
+
+        report(f"x{scale}.assemble_index", measure(assemble, 1, items_per_call=len(copies) * len(chunks)))
+        report(f"x{scale}.search_chunks", measure(lambda: indexer.search_chunks(next_query()), args.query_iterations))
+        for doc_id in copies:
+            indexer.remove_document(doc_id)
+
+    # --- Agent pipeline with the fake LLM ---
+    llm = FakeLLM(latency=args.llm_latency, jitter=args.llm_jitter)
+    api_agent = APIAgent()
+    knowledge_agent = KnowledgeAgent(indexer, llm)
+    llm_intent_agent = IntentAgent(None, api_agent, knowledge_agent, llm_wrapper=llm)
+    report("decide_and_execute.llm_intent",
+           measure(lambda: llm_intent_agent.decide_and_execute(next_query()), args.agent_iterations))
+
+    classifier = LocalIntentClassifier(indexer.embeddings.embed_documents, indexer.embeddings.embed_query,
+                                       card_number_fn=api_agent._extract_card_number)
+    local_intent_agent = IntentAgent(None, api_agent, knowledge_agent, llm_wrapper=llm,
+                                     intent_classifier=classifier)
+    report("decide_and_execute.local_intent",
+           measure(lambda: local_intent_agent.decide_and_execute(next_query()), args.agent_iterations))
+
+    # --- Burst of identical questions (e.g. after a campaign email): every user asks one of a
+    # few questions at once. Counts the LLM calls with and without in-flight coalescing.
+    burst_questions = QUERIES[:args.burst_questions]
+    for coalesce in (False, True):
+        burst_llm = FakeLLM(latency=args.burst_llm_latency)
+        burst_agent = KnowledgeAgent(indexer, burst_llm, single_flight=SingleFlight() if coalesce else None)
+
+        def burst():
+            with ThreadPoolExecutor(args.burst_users) as pool:
+                list(pool.map(burst_agent.answer_question,
+                              [burst_questions[i % len(burst_questions)] for i in range(args.burst_users)]))
+
+        stage = f"burst.x{args.burst_users}.{'coalesced' if coalesce else 'direct'}"
+        report(stage, measure(burst, 3, items_per_call=args.burst_users))
+        print(f"  {burst_llm.calls} LLM calls for {3 * args.burst_users} questions")
+
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """
+    Print p50 ratios against a baseline.
+    :return: True if any stage regressed by more than 'tolerance' (e.g. 0.2 = 20%)
+    """
+    regressed = False
+    print(f"\nComparison with baseline {baseline.get('meta', {}).get('git_commit', '?')}:")
+    for stage, stats in results.items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old or not old.get("p50_ms"):
+            print(f"  {stage:<32} (no baseline)")
+            continue
+        ratio = stats["p50_ms"] / old["p50_ms"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"  {stage:<32} p50 {old['p50_ms']:>10.2f} -> {stats['p50_ms']:>10.2f} ms  ({ratio:5.2f}x){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline CardAssist benchmark suite")
+    parser.add_argument("--pdf", default="global_card_access_user_guide.pdf")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Embedding model name or local path")
+    parser.add_argument("--backend", choices=["langchain", "native"], default="langchain")
+    parser.add_argument("--index-type", default="flat", help="Index type of the native backend")
+    parser.add_argument("--scales", type=lambda s: [int(x) for x in s.split(",")], default=[1, 10, 100],
+                        help="Corpus multipliers for the enlarged-corpus stages, e.g. 1,10,100")
+    parser.add_argument("--ingest-iterations", type=int, default=5)
+    parser.add_argument("--build-iterations", type=int, default=3)
+    parser.add_argument("--query-iterations", type=int, default=200)
+    parser.add_argument("--agent-iterations", type=int, default=50)
+    parser.add_argument("--embed-threads", type=int, default=8, help="Concurrent callers in the embedding stages")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated LLM latency in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.0)
+    parser.add_argument("--burst-users", type=int, default=50, help="Concurrent users in the burst stages")
+    parser.add_argument("--burst-questions", type=int, default=4, help="Distinct questions in the burst stages")
+    parser.add_argument("--burst-llm-latency", type=float, default=0.2, help="Simulated LLM latency in the burst stages")
+    parser.add_argument("--skip-legacy", action="store_true", help="Skip the clean_pdf/extract_sections_by_toc stages")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare against a JSON baseline written by --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p50 slowdown before flagging")
+    args = parser.parse_args()
+
+    results = run_suite(args)
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    report = {
+        "meta": {
+            "git_commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("save", "compare")},
+        },
+        "stages": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# tests/test_answer_cache.py
+
+from utils.answer_cache import SemanticAnswerCache
+
+VECTORS = {
+    "how do i activate my card": [1.0, 0.0, 0.0],
+    "how can i activate a card": [0.95, 0.31, 0.0],
+    "what is my card limit": [0.0, 0.0, 1.0],
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(**options):
+    return SemanticAnswerCache(lambda question: VECTORS[question.lower().rstrip("?")], **options)
+
+
+def test_exact_and_semantic_hits():
+    cache = make_cache(similarity_threshold=0.9)
+    cache.store("How do I activate my card?", "Use the activation page.")
+
+    assert cache.lookup("how do I activate my card") == "Use the activation page."
+    assert cache.lookup("How can I activate a card?") == "Use the activation page."
+    assert cache.lookup("What is my card limit?") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["semantic_hits"], stats["misses"]) == (2, 1, 1)
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = make_cache(ttl_seconds=60, clock=clock)
+    cache.store("How do I activate my card?", "Use the activation page.")
+
+    clock.now = 59
+    assert cache.lookup("How do I activate my card?") == "Use the activation page."
+    clock.now = 121
+    assert cache.lookup("How do I activate my card?") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_knowledge_base_version_change_clears_the_cache():
+    cache = make_cache()
+    cache.store("How do I activate my card?", "Use the activation page.", kb_version=1)
+
+    assert cache.lookup("How do I activate my card?", kb_version=1) == "Use the activation page."
+    assert cache.lookup("How do I activate my card?", kb_version=2) is None
+    # Going back does not resurrect answers from the old version
+    assert cache.lookup("How do I activate my card?", kb_version=1) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,69 @@
+# tests/test_faq_index.py
+
+from utils.faq_index import FAQIndex, generate_faq, parse_faq_response
+
+VECTORS = {
+    "How do I activate a card?": [1.0, 0.0, 0.0],
+    "How can I activate my card?": [0.95, 0.31, 0.0],
+    "Activate card or not?": [0.8, 0.6, 0.0],
+    "What is my spending limit?": [0.0, 0.0, 1.0],
+}
+
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [VECTORS[text] for text in texts]
+
+    def embed_query(self, text):
+        return VECTORS[text]
+
+
+ENTRIES = [{"question": "How do I activate a card?", "answer": "Open Card Management and choose Activate.",
+            "section_title": "Activating Cards"}]
+
+
+def test_match_respects_the_threshold():
+    index = FAQIndex(FakeEmbeddings(), threshold=0.9)
+    index.add_document("guide", ENTRIES)
+
+    entry, similarity = index.match("How can I activate my card?")
+    assert entry["answer"] == ENTRIES[0]["answer"]
+    assert similarity >= 0.9
+    # Related but below the threshold (cosine 0.8): left to the knowledge agent
+    assert index.match("Activate card or not?") is None
+    assert index.match("What is my spending limit?") is None
+    assert (index.stats()["hits"], index.stats()["misses"]) == (1, 2)
+
+
+def test_removed_document_no_longer_matches():
+    index = FAQIndex(FakeEmbeddings())
+    index.add_document("guide", ENTRIES)
+    index.remove_document("guide")
+
+    assert len(index) == 0
+    assert index.match("How do I activate a card?") is None
+
+
+def test_parse_faq_response_skips_prose_and_malformed_entries():
+    reply = ('Here is the FAQ:\n```json\n[{"question": "How do I activate a card?", "answer": "Choose Activate."},'
+             ' {"question": "", "answer": "No question"}, "not an entry"]\n```')
+
+    assert parse_faq_response(reply) == [{"question": "How do I activate a card?", "answer": "Choose Activate."}]
+    assert parse_faq_response("Sorry, I cannot help with that.") == []
+
+
+def test_generate_faq_counts_failed_sections():
+    class FlakyLLM:
+        def generate_answer(self, prompt):
+            if "Limits" in prompt:
+                raise TimeoutError("LLM timed out")
+            if "Statements" in prompt:
+                return "Sorry, I cannot help with that."
+            return '[{"question": "How do I activate a card?", "answer": "Choose Activate."}]'
+
+    sections = [{"title": "Activating Cards", "text": "x" * 300}, {"title": "Limits", "text": "y" * 300},
+                {"title": "Statements", "text": "z" * 300}, {"title": "Heading", "text": "too short"}]
+    entries, failed = generate_faq(sections, FlakyLLM())
+
+    assert failed == 2
+    assert [entry["section_title"] for entry in entries] == ["Activating Cards"]
@@ -0,0 +1,72 @@
+# tests/test_intent_agent.py
+
+import json
+
+from agents.api_agent import APIAgent
+from agents.intent_agent_1 import IntentAgent
+from agents.knowledge_agent import KnowledgeAgent
+from utils.answer_cache import SemanticAnswerCache
+from utils.intent_classifier import may_request_card_operation
+
+
+class FakeIndexer:
+    version = 1
+
+    def search_chunks(self, question, top_k=6):
+        return [{"doc_id": "guide", "section_title": "Activating Cards", "text": "Choose Activate in Card Management.",
+                 "chunk_index": 0, "start_page": 1, "end_page": 1, "score": 0.9}]
+
+
+class FakeAPIAgent(APIAgent):
+    def __init__(self):
+        super().__init__()
+        self.activated = []
+
+    def activate_card(self, user_input):
+        self.activated.append(self._extract_card_number(user_input))
+        return "Card activated"
+
+
+class FakeLLM:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    def generate_answer(self, prompt):
+        self.calls += 1
+        return self.reply
+
+
+def make_agent(reply):
+    llm = FakeLLM(reply)
+    # Every question embeds to nearly the same vector, so any cached answer would be a hit
+    cache = SemanticAnswerCache(lambda question: [1.0, 100.0])
+    knowledge_agent = KnowledgeAgent(FakeIndexer(), llm, answer_cache=cache)
+    api_agent = FakeAPIAgent()
+    agent = IntentAgent(None, api_agent, knowledge_agent, combined_mode=True, llm_wrapper=llm)
+    return agent, api_agent, cache, llm
+
+
+def test_cached_how_to_does_not_preempt_a_card_operation():
+    agent, api_agent, cache, llm = make_agent(json.dumps({"action": "activate", "card_number": "123456789"}))
+    cache.store("How do I activate my card?", "Open Card Management and choose Activate.", 1)
+
+    assert agent.decide_and_execute("activate my card 123456789") == "Card activated"
+    assert api_agent.activated == ["123456789"]
+    assert llm.calls == 1
+
+
+def test_knowledge_questions_are_still_served_from_the_cache():
+    agent, _api_agent, cache, llm = make_agent(json.dumps({"action": "answer", "answer": "unused"}))
+    cache.store("How do I activate my card?", "Open Card Management and choose Activate.", 1)
+
+    assert agent.decide_and_execute("How can I activate a card?") == "Open Card Management and choose Activate."
+    assert llm.calls == 0
+
+
+def test_may_request_card_operation():
+    extract = APIAgent()._extract_card_number
+    assert may_request_card_operation("activate my card 123456789", extract)
+    assert may_request_card_operation("Please block my card", extract)
+    assert not may_request_card_operation("How do I activate my card?", extract)
+    assert not may_request_card_operation("Where can I find my statements", extract)
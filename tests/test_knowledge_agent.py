@@ -0,0 +1,89 @@
+# tests/test_knowledge_agent.py
+
+import threading
+
+from agents.knowledge_agent import KnowledgeAgent
+from utils.answer_cache import SemanticAnswerCache
+from utils.single_flight import SingleFlight
+
+
+class FakeIndexer:
+    version = 1
+
+    def search_chunks(self, question, top_k=6):
+        return [{"doc_id": "guide", "section_title": "Activating Cards", "text": "Choose Activate in Card Management.",
+                 "chunk_index": 0, "start_page": 1, "end_page": 1, "score": 0.9}]
+
+
+class FakeLLM:
+    def __init__(self, on_call=None):
+        self.prompts = []
+        self.on_call = on_call
+
+    def generate_answer(self, prompt):
+        self.prompts.append(prompt)
+        if self.on_call:
+            self.on_call()
+        return f"answer {len(self.prompts)}"
+
+    def stream_answer(self, prompt):
+        yield self.generate_answer(prompt)
+
+
+def make_agent(llm, **options):
+    cache = SemanticAnswerCache(lambda question: [1.0, float(len(question))])
+    return KnowledgeAgent(FakeIndexer(), llm, answer_cache=cache, **options), cache
+
+
+def test_answers_are_cached_per_knowledge_base_version():
+    llm = FakeLLM()
+    agent, _cache = make_agent(llm)
+
+    assert agent.answer_question("How do I activate a card?") == "answer 1"
+    assert agent.answer_question("How do I activate a card?") == "answer 1"
+    agent.search_simulator.version = 2
+    assert agent.answer_question("How do I activate a card?") == "answer 2"
+
+
+def test_answer_generated_across_a_reload_is_not_cached():
+    indexer = FakeIndexer()
+
+    def reload():
+        indexer.version += 1
+
+    agent = KnowledgeAgent(indexer, FakeLLM(on_call=reload),
+                           answer_cache=SemanticAnswerCache(lambda question: [1.0, float(len(question))]))
+    cache = agent.answer_cache
+
+    agent.answer_question("How do I activate a card?")
+    assert cache.stats()["entries"] == 0
+    "".join(agent.stream_answer("How do I block a card?"))
+    assert cache.stats()["entries"] == 0
+
+
+def test_answers_generated_with_a_history_are_not_shared():
+    llm = FakeLLM()
+    agent, cache = make_agent(llm, single_flight=SingleFlight())
+
+    first = agent.answer_question("How do I reset it?", history="user: my card 123456789 is blocked")
+    second = agent.answer_question("How do I reset it?", history="user: I forgot my PIN")
+    assert first != second
+    assert "123456789" in llm.prompts[0] and "123456789" not in llm.prompts[1]
+    assert "".join(agent.stream_answer("How do I reset it?", history="user: I lost my card")) == "answer 3"
+    assert cache.stats()["entries"] == 0
+
+
+def test_concurrent_callers_with_different_histories_are_not_coalesced():
+    both_started = threading.Barrier(2, timeout=5)
+    llm = FakeLLM(on_call=both_started.wait)
+    agent, _cache = make_agent(llm, single_flight=SingleFlight())
+    threads = [threading.Thread(target=agent.answer_question, args=("How do I reset it?", history))
+               for history in ("user: card 123456789", "user: card 987654321")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Each caller reached the LLM with its own conversation; a coalesced call would break the barrier
+    assert sorted("123456789" in prompt for prompt in llm.prompts) == [False, True]
+    assert agent.single_flight.stats()["coalesced"] == 0
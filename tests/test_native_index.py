@@ -0,0 +1,68 @@
+# tests/test_native_index.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from utils.kb_cache import KnowledgeBaseCache
+from utils.native_index import NativeFAISSIndexer
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return np.random.default_rng(sum(text.encode())).standard_normal(16).tolist()
+
+
+def chunks(*texts):
+    return [{"title": "Cards", "text": text, "chunk_index": i, "start_page": 1, "end_page": None}
+            for i, text in enumerate(texts)]
+
+
+def top_text(indexer, query):
+    return indexer.search_chunks(query, top_k=1)[0]["text"]
+
+
+def test_documents_are_added_and_replaced_without_rebuilding_the_index(tmp_path):
+    embeddings = FakeEmbeddings()
+    indexer = NativeFAISSIndexer(embeddings=embeddings, vector_dir=str(tmp_path))
+    indexer.add_document("guide", chunks("activate a card", "card limits"))
+    assert top_text(indexer, "card limits") == "card limits"
+    built = indexer.index
+
+    embeddings.embedded.clear()
+    indexer.add_document("guide", chunks("activate a card", "spending limits"))
+    indexer.add_document("fees", chunks("annual fee"))
+    assert top_text(indexer, "spending limits") == "spending limits"
+    assert top_text(indexer, "annual fee") == "annual fee"
+    # Only new text was embedded, and the changes were applied to the existing index
+    assert embeddings.embedded == ["spending limits", "annual fee"]
+    assert indexer.index is not built and indexer._snapshot.trained_rows == 2
+    # The replaced chunk is gone from the index
+    assert {hit["text"] for hit in indexer.search_chunks("card limits", top_k=5)} == \
+        {"activate a card", "spending limits", "annual fee"}
+
+    assert indexer.remove_document("fees")
+    assert all(hit["doc_id"] == "guide" for hit in indexer.search_chunks("annual fee", top_k=5))
+
+
+def test_cached_embeddings_stay_on_disk(tmp_path):
+    cache = KnowledgeBaseCache(str(tmp_path))
+    vectors = np.asarray(FakeEmbeddings().embed_documents(["activate a card", "card limits"]), dtype=np.float32)
+    cache.save("key", chunks("activate a card", "card limits"), vectors / np.linalg.norm(vectors, axis=1)[:, None])
+
+    embeddings = FakeEmbeddings()
+    indexer = NativeFAISSIndexer(embeddings=embeddings, index_type="sq8")
+    cached_chunks, cached_vectors = cache.load("key", mmap_mode="r")
+    indexer.add_document("guide", cached_chunks, embeddings=cached_vectors)
+
+    assert indexer.document_embeddings("guide") is cached_vectors
+    assert top_text(indexer, "card limits") == "card limits"
+    assert embeddings.embedded == []
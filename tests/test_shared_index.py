@@ -0,0 +1,81 @@
+# tests/test_shared_index.py
+
+import os
+
+import numpy as np
+import pytest
+
+from utils.shared_index import SharedIndexSearcher, current_version, publish_shared_index
+
+VECTORS = {
+    "activate": [1.0, 0.0, 0.0],
+    "limits": [0.0, 1.0, 0.0],
+    "fees": [0.0, 0.0, 1.0],
+}
+
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [VECTORS[text] for text in texts]
+
+    def embed_query(self, text):
+        return VECTORS.get(text, [0.0, 0.0, 0.0])
+
+
+def document(*topics, doc_id="guide"):
+    chunks = [{"title": topic.title(), "text": topic, "chunk_index": 0, "start_page": i + 1, "end_page": i + 1}
+              for i, topic in enumerate(topics)]
+    return doc_id, chunks, np.asarray([VECTORS[topic] for topic in topics], dtype=np.float32)
+
+
+def test_search_returns_published_chunks(tmp_path):
+    publish_shared_index(str(tmp_path), [document("activate", "limits")], "fake-model")
+    searcher = SharedIndexSearcher(str(tmp_path), "fake-model", embeddings=FakeEmbeddings())
+
+    hits = searcher.search_chunks("limits", top_k=2)
+    assert [hit["text"] for hit in hits] == ["limits", "activate"]
+    assert hits[0] == {"doc_id": "guide", "section_title": "Limits", "chunk_index": 0, "start_page": 2,
+                       "end_page": 2, "text": "limits", "score": pytest.approx(1.0)}
+
+
+def test_new_version_is_swapped_in_and_old_snapshots_stay_usable(tmp_path):
+    root = str(tmp_path)
+    first = publish_shared_index(root, [document("activate")], "fake-model")
+    searcher = SharedIndexSearcher(root, embeddings=FakeEmbeddings(), check_interval=0)
+    in_flight = searcher._snapshot
+
+    second = publish_shared_index(root, [document("activate", "fees")], "fake-model")
+    assert current_version(root) == second != first
+    assert [hit["text"] for hit in searcher.search_chunks("fees", top_k=1)] == ["fees"]
+    assert searcher.version == second
+    # A search that started on the previous version finishes on it
+    assert [hit["text"] for hit in in_flight.search(np.asarray([VECTORS["fees"]], dtype=np.float32), 5)[0]] \
+        == ["activate"]
+
+
+def test_old_versions_are_pruned(tmp_path):
+    root = str(tmp_path)
+    for topics in (["activate"], ["limits"], ["fees"]):
+        latest = publish_shared_index(root, [document(*topics)], "fake-model", keep=2)
+
+    versions = [name for name in os.listdir(root) if name.startswith("v")]
+    assert len(versions) == 2 and latest in versions
+
+
+def test_mismatched_model_or_embeddings_are_refused(tmp_path):
+    publish_shared_index(str(tmp_path), [document("activate")], "fake-model")
+
+    with pytest.raises(ValueError):
+        SharedIndexSearcher(str(tmp_path), "other-model", embeddings=FakeEmbeddings())
+
+    class WrongDimension:
+        def embed_query(self, text):
+            return [1.0, 0.0]
+
+    with pytest.raises(ValueError):
+        SharedIndexSearcher(str(tmp_path), embeddings=WrongDimension())
+
+
+def test_missing_index_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        SharedIndexSearcher(str(tmp_path), embeddings=FakeEmbeddings())
@@ -0,0 +1,87 @@
+# tests/test_single_flight.py
+
+import threading
+import time
+
+import pytest
+
+from utils.single_flight import SingleFlight, SingleFlightTimeout
+
+
+def start_followers(flight, key, count, fn=lambda: "follower computed"):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(_outcome(flight, key, fn))) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _outcome(flight, key, fn):
+    try:
+        return flight.do(key, fn)
+    except Exception as e:
+        return e
+
+
+def test_followers_share_the_leader_result():
+    flight = SingleFlight(timeout=5)
+    future, leader = flight.begin("q")
+    assert leader
+    threads, results = start_followers(flight, "q", 3)
+    wait_until(lambda: flight.stats()["coalesced"] == 3)
+    flight.finish("q", future, result="answer")
+    for thread in threads:
+        thread.join()
+
+    assert results == ["answer"] * 3
+    assert flight.stats()["in_flight"] == 0
+    # The key is released: a later call computes afresh
+    assert flight.do("q", lambda: "fresh") == "fresh"
+
+
+def test_leader_failure_reaches_followers_and_releases_the_key():
+    flight = SingleFlight(timeout=5)
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("LLM unavailable")
+
+    leader_threads, leader_results = start_followers(flight, "q", 1, failing)
+    started.wait(5)
+    threads, results = start_followers(flight, "q", 2)
+    wait_until(lambda: flight.stats()["coalesced"] == 2)
+    release.set()
+    for thread in leader_threads + threads:
+        thread.join()
+
+    assert all(isinstance(result, ValueError) for result in leader_results + results)
+    assert flight.stats()["failures"] == 1
+    assert flight.do("q", lambda: "recovered") == "recovered"
+
+
+def test_interrupted_leader_gives_followers_a_runtime_error():
+    flight = SingleFlight(timeout=5)
+    future, _leader = flight.begin("q")
+    flight.finish("q", future, error=GeneratorExit())
+
+    with pytest.raises(RuntimeError):
+        flight.wait(future)
+
+
+def test_follower_times_out_when_the_leader_hangs():
+    flight = SingleFlight(timeout=0.05)
+    future, _leader = flight.begin("q")
+
+    with pytest.raises(SingleFlightTimeout):
+        flight.do("q", lambda: "never used")
+    assert flight.stats()["timeouts"] == 1
+    flight.finish("q", future, result="late")
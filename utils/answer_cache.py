@@ -0,0 +1,152 @@
+# utils/answer_cache.py
+
+"""
+SemanticAnswerCache: Serves previously generated answers for questions that are
+near-duplicates (by embedding similarity) of ones already answered.
+"""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """
+    Canonical form of a question used for exact-match lookups.
+    """
+    return re.sub(r"\s+", " ", question).strip().strip("?!. ").lower()
+
+
+class SemanticAnswerCache:
+    """
+    Bounded LRU cache of answers keyed by question embedding.
+    A lookup first tries an exact match on the normalized question text, then the most similar
+    cached question by cosine similarity. Entries expire after 'ttl_seconds', and the whole cache
+    is cleared when the knowledge base version it was filled from changes.
+    """
+
+    def __init__(self, embed_fn, similarity_threshold: float = 0.92, max_entries: int = 512,
+                 ttl_seconds: float = 3600, clock=time.monotonic):
+        """
+        :param embed_fn: Callable mapping a question to its embedding vector (e.g. embeddings.embed_query)
+        :param similarity_threshold: Minimum cosine similarity for a semantic hit
+        :param max_entries: Maximum number of cached answers; least recently used entries are evicted
+        :param ttl_seconds: Lifetime of an entry
+        :param clock: Time source, injectable for tests
+        """
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        # normalized question -> {"vector", "answer", "created_at"}
+        self._entries = OrderedDict()
+        self._kb_version = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _embed(self, question: str):
+        vector = np.asarray(self.embed_fn(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, kb_version):
+        if kb_version != self._kb_version:
+            if self._entries:
+                logger.info("Knowledge base changed (version %s -> %s), clearing answer cache",
+                            self._kb_version, kb_version)
+                self._entries.clear()
+                self.invalidations += 1
+            self._kb_version = kb_version
+
+    def _expire(self, now):
+        expired = [key for key, entry in self._entries.items() if now - entry["created_at"] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+
+    def lookup(self, question: str, kb_version=None):
+        """
+        Return the cached answer for a question, or None on a miss.
+        :param kb_version: Version of the knowledge base the answer must come from
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._check_version(kb_version)
+            self._expire(self.clock())
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["answer"]
+            if not self._entries:
+                self.misses += 1
+                return None
+            keys = list(self._entries)
+            matrix = np.stack([self._entries[k]["vector"] for k in keys])
+
+        # Embed outside the lock; the model call dominates the lookup cost
+        similarities = matrix @ self._embed(question)
+        best = int(np.argmax(similarities))
+
+        with self._lock:
+            entry = self._entries.get(keys[best])
+            if entry is not None and similarities[best] >= self.similarity_threshold:
+                self._entries.move_to_end(keys[best])
+                self.hits += 1
+                self.semantic_hits += 1
+                logger.debug("Semantic cache hit for '%s' (similarity %.3f)", question, similarities[best])
+                return entry["answer"]
+            self.misses += 1
+            return None
+
+    def store(self, question: str, answer: str, kb_version=None):
+        """
+        Cache an answer, evicting the least recently used entry if the cache is full.
+        """
+        key = normalize_question(question)
+        vector = self._embed(question)
+        with self._lock:
+            self._check_version(kb_version)
+            self._entries[key] = {"vector": vector, "answer": answer, "created_at": self.clock()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """
+        Drop every cached answer.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        """
+        Counters for monitoring.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
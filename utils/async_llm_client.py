@@ -0,0 +1,263 @@
+# utils/async_llm_client.py
+
+"""
+AsyncLLMClient: asyncio-native client for the Groq (OpenAI-compatible) chat completions API
+with pooled keep-alive connections, per-call deadlines, retries with jittered exponential
+backoff that honours rate-limit headers, and a cap on concurrent requests.
+"""
+import asyncio
+import email.utils
+import json
+import logging
+import os
+import random
+import re
+import time
+
+import httpx
+
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.groq.com/openai/v1"
+DEFAULT_MODEL = "llama3-70b-8192"
+SYSTEM_PROMPT = "You are a helpful assistant specializing in card management services."
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMRequestError(RuntimeError):
+    """
+    Raised when a chat completion request fails permanently or runs out of retries.
+    """
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _parse_duration(value: str):
+    """
+    Parse a rate-limit reset header: plain seconds ("7.5") or Groq's "1m2.5s" / "250ms" format.
+    """
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    match = re.fullmatch(r"(?:(\d+)h)?(?:(\d+)m(?!s))?(?:([\d.]+)s)?(?:([\d.]+)ms)?", value)
+    if not match or not any(match.groups()):
+        return None
+    hours, minutes, seconds, millis = match.groups()
+    return (int(hours or 0) * 3600 + int(minutes or 0) * 60
+            + float(seconds or 0) + float(millis or 0) / 1000)
+
+
+def retry_after_seconds(headers, status_code: int = 429):
+    """
+    Delay requested by the server, from Retry-After or, for 429 responses, the
+    x-ratelimit-reset-* headers (they describe the rate limit window, not a server error).
+    :return: Seconds to wait, or None if the response does not say
+    """
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                parsed = email.utils.parsedate_to_datetime(retry_after)
+            except (TypeError, ValueError):
+                parsed = None
+            if parsed is not None:
+                return max(0.0, parsed.timestamp() - time.time())
+    if status_code != 429:
+        return None
+    resets = [_parse_duration(headers[name]) for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+              if headers.get(name)]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+
+class AsyncLLMClient:
+    """
+    Shared asyncio client for chat completions. One instance should serve the whole process
+    (see get_async_llm_client) so that the connection pool and the concurrency cap are shared.
+    """
+
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL, model: str = DEFAULT_MODEL,
+                 max_concurrency: int = 8, timeout: float = 30.0, max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_max: float = 20.0, transport: httpx.AsyncBaseTransport = None):
+        """
+        :param api_key: API key sent as a bearer token
+        :param base_url: API root; point it at a local fake server for tests and load runs
+        :param model: Model name sent with each request
+        :param max_concurrency: Maximum number of requests in flight at once
+        :param timeout: Default per-call deadline in seconds, covering all retries
+        :param max_retries: Retries after the first attempt for 408/429/5xx and transport errors
+        :param backoff_base: First backoff step in seconds (doubled on each retry, full jitter)
+        :param backoff_max: Upper bound for a single backoff
+        :param transport: Optional httpx transport (e.g. httpx.MockTransport) replacing the network
+        """
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            transport=transport,
+        )
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    def _payload(self, prompt: str, temperature: float, max_tokens: int, stream: bool = False) -> dict:
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": stream,
+        }
+
+    def _backoff(self, attempt: int, headers=None, status_code: int = None) -> float:
+        requested = retry_after_seconds(headers, status_code) if headers is not None else None
+        if requested is not None:
+            return min(requested, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _post_with_retries(self, payload: dict, stream: bool):
+        """
+        Send the request, retrying transient failures. Returns an httpx.Response whose body
+        has not been read yet when stream=True: the response then still holds its concurrency
+        slot, and the caller must close it and call self._semaphore.release().
+        """
+        attempt = 0
+        while True:
+            headers = status_code = None
+            await self._semaphore.acquire()
+            keep_slot = False
+            try:
+                self.requests += 1
+                try:
+                    request = self._client.build_request("POST", "/chat/completions", json=payload)
+                    response = await self._client.send(request, stream=stream)
+                except httpx.TransportError as e:
+                    error = LLMRequestError(f"Transport error: {e!r}")
+                else:
+                    if response.status_code < 400:
+                        # A streamed body is still to be read: the slot stays taken until it is closed
+                        keep_slot = stream
+                        return response
+                    await response.aread()
+                    await response.aclose()
+                    error = LLMRequestError(f"HTTP {response.status_code}: {response.text[:200]}",
+                                            response.status_code)
+                    headers, status_code = response.headers, response.status_code
+                    if response.status_code == 429:
+                        self.throttled += 1
+                    if response.status_code not in RETRYABLE_STATUS:
+                        self.failures += 1
+                        raise error
+            finally:
+                if not keep_slot:
+                    self._semaphore.release()
+
+            if attempt >= self.max_retries:
+                self.failures += 1
+                raise error
+            delay = self._backoff(attempt, headers, status_code)
+            attempt += 1
+            self.retries += 1
+            logger.warning("LLM request failed (%s), retry %d/%d in %.2fs", error, attempt, self.max_retries, delay)
+            # Sleep outside the semaphore so other calls can use the slot meanwhile
+            await asyncio.sleep(delay)
+
+    async def generate_answer(self, prompt: str, temperature: float = 0.2, max_tokens: int = 500,
+                              deadline: float = None) -> str:
+        """
+        Generate a complete answer.
+        :param deadline: Seconds allowed for the call including retries (defaults to the client timeout)
+        """
+        async def call():
+            response = await self._post_with_retries(self._payload(prompt, temperature, max_tokens), stream=False)
+            data = response.json()
+            usage = data.get("usage") or {}
+            tracer.record_tokens(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+            return data["choices"][0]["message"]["content"].strip()
+
+        with tracer.span("llm_call", model=self.model):
+            try:
+                return await asyncio.wait_for(call(), deadline or self.timeout)
+            except asyncio.TimeoutError:
+                self.failures += 1
+                raise LLMRequestError(f"Deadline of {deadline or self.timeout}s exceeded") from None
+
+    async def stream_answer(self, prompt: str, temperature: float = 0.2, max_tokens: int = 500,
+                            deadline: float = None):
+        """
+        Async generator yielding answer fragments from a server-sent-events stream.
+        The deadline bounds the time to the first byte; the body is bounded by the client timeout.
+        The stream counts against max_concurrency until it is finished or closed.
+        """
+        try:
+            response = await asyncio.wait_for(
+                self._post_with_retries(self._payload(prompt, temperature, max_tokens, stream=True), stream=True),
+                deadline or self.timeout,
+            )
+        except asyncio.TimeoutError:
+            self.failures += 1
+            raise LLMRequestError(f"Deadline of {deadline or self.timeout}s exceeded") from None
+
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                content = choices[0].get("delta", {}).get("content") if choices else None
+                if content:
+                    yield content
+        finally:
+            try:
+                await response.aclose()
+            finally:
+                self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failures": self.failures,
+        }
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_shared_client = None
+
+
+def get_async_llm_client(api_key: str = None, **kwargs) -> AsyncLLMClient:
+    """
+    Return the process-wide AsyncLLMClient, creating it on first use.
+    Keyword arguments are only applied when the client is created. Like any asyncio
+    resource, the client must be used from a single event loop.
+    """
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = AsyncLLMClient(api_key or os.getenv("GROQ_API_KEY"), **kwargs)
+    return _shared_client
@@ -0,0 +1,128 @@
+# utils/chunking.py
+
+"""
+Chunking: Splits TOC sections into token-bounded chunks that respect paragraph and table
+boundaries, so each chunk fits the embedding model's input window.
+"""
+import math
+import re
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English text).
+    """
+    return math.ceil(len(text) / 4)
+
+
+def _is_fragment(paragraph: str, max_chars: int = 60) -> bool:
+    """
+    Short single-line blocks are headings, list labels or table cells.
+    """
+    return "\n" not in paragraph and len(paragraph) <= max_chars
+
+
+def split_units(text: str):
+    """
+    Split section text into indivisible units: paragraphs (blank-line separated blocks),
+    with runs of short fragments (headings, table cells) kept attached to what follows
+    so a table row or a heading is never separated from its content.
+    """
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    units = []
+    pending = []
+    for paragraph in paragraphs:
+        pending.append(paragraph)
+        if not _is_fragment(paragraph):
+            units.append("\n\n".join(pending))
+            pending = []
+    if pending:
+        units.append("\n\n".join(pending))
+    return units
+
+
+def _pack(segments, chunk_size: int, sep: str):
+    """
+    Greedily join segments with 'sep' into pieces of at most ~chunk_size tokens.
+    """
+    pieces = []
+    current = []
+    current_tokens = 0
+    for segment in segments:
+        tokens = estimate_tokens(segment) + 1
+        if current and current_tokens + tokens > chunk_size:
+            pieces.append(sep.join(current))
+            current, current_tokens = [], 0
+        current.append(segment)
+        current_tokens += tokens
+    if current:
+        pieces.append(sep.join(current))
+    return pieces
+
+
+def _split_oversized(unit: str, chunk_size: int):
+    """
+    Split a unit larger than chunk_size at line boundaries, and over-long lines at word boundaries.
+    """
+    segments = []
+    for line in unit.splitlines():
+        if estimate_tokens(line) <= chunk_size:
+            segments.append(line)
+        else:
+            segments.extend(_pack(line.split(), chunk_size, " "))
+    return _pack(segments, chunk_size, "\n")
+
+
+def chunk_text(text: str, chunk_size: int = 200, overlap: int = 30):
+    """
+    Pack the units of a text into chunks of at most ~chunk_size tokens.
+    Each new chunk starts with the trailing units of the previous one, up to ~overlap tokens.
+    :return: List of chunk strings
+    """
+    units = []
+    for unit in split_units(text):
+        if estimate_tokens(unit) > chunk_size:
+            units.extend(_split_oversized(unit, chunk_size))
+        else:
+            units.append(unit)
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for unit in units:
+        tokens = estimate_tokens(unit)
+        if current and current_tokens + tokens > chunk_size:
+            chunks.append("\n\n".join(current))
+            # Carry trailing units over as overlap
+            carried = []
+            carried_tokens = 0
+            for previous in reversed(current):
+                previous_tokens = estimate_tokens(previous)
+                if carried_tokens + previous_tokens > overlap or carried_tokens + previous_tokens + tokens > chunk_size:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous_tokens
+            current, current_tokens = carried, carried_tokens
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def chunk_sections(sections, chunk_size: int = 200, overlap: int = 30):
+    """
+    Split sections into chunks, numbering them with 'chunk_index' within each section.
+    Section metadata (title, pages and any other keys) is copied onto every chunk.
+    Sections with no text produce no chunks.
+    :param sections: List of dicts with at least 'title' and 'text'
+    :return: List of chunk dicts
+    """
+    chunks = []
+    for section in sections:
+        for chunk_index, text in enumerate(chunk_text(section["text"], chunk_size, overlap)):
+            chunk = dict(section)
+            chunk["text"] = text
+            chunk["chunk_index"] = chunk_index
+            chunks.append(chunk)
+    return chunks
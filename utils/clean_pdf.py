@@ -12,7 +12,7 @@ def remove_footer_by_margin(doc, footer_margin=80) -> str:
     Removes all text blocks from the bottom 'footer_margin' of each page.
     """
     for page_num, page in enumerate(doc, start=1):
-        logger.info(f"\nProcessing Page {page_num}")
+        logger.debug("Processing page %d", page_num)
         height = page.rect.height
         footer_threshold = height - footer_margin
 
@@ -26,7 +26,7 @@ def remove_footer_by_margin(doc, footer_margin=80) -> str:
 
             # If block is in the bottom margin
             if y1 > footer_threshold:
-                logger.info(f"  Removing block in footer: \"{text}\" (Y1: {y1:.2f})")
+                logger.debug("Removing footer block on page %d: %r (y1 %.2f)", page_num, text, y1)
                 page.add_redact_annot(fitz.Rect(x0, y0, x1, y1), fill=(1, 1, 1))
 
         # Apply redactions to make removals permanent
@@ -50,7 +50,7 @@ def is_toc_page(text):
         if is_toc_line(line):
             toc_like_lines += 1
 
-    logger.info(f"  TOC-like lines found: {toc_like_lines}")
+    logger.debug("TOC-like lines found: %d", toc_like_lines)
     return toc_like_lines >= 5  # Threshold: can be adjusted
 
 def has_toc_keyword_in_top_lines(text, num_lines=5):
@@ -61,7 +61,7 @@ def has_toc_keyword_in_top_lines(text, num_lines=5):
     for line in lines:
         line_lower = line.strip().lower()
         if "table of contents" in line_lower or line_lower == "contents":
-            logger.info(f"  Found TOC keyword in line: '{line}'")
+            logger.debug("Found TOC keyword in line: %r", line)
             return True
     return False
 
@@ -75,28 +75,29 @@ def remove_toc(doc, max_pages_to_check=5) -> str:
         page = doc[i]
         text = page.get_text()
 
-        logger.info(f"\nAnalyzing Page {i + 1}...")
+        logger.debug("Analyzing page %d", i + 1)
 
         if is_toc_page(text):
-            logger.info(f"  --> Page {i + 1} likely contains TOC. Marked for removal.")
+            logger.debug("Page %d likely contains TOC, marked for removal", i + 1)
             pages_to_remove.append(i)
         else:
-            logger.info(f"  --> Page {i + 1} does not appear to be TOC.")
+            logger.debug("Page %d does not appear to be TOC", i + 1)
 
-    logger.info(f"\nPages marked for removal: {[p + 1 for p in pages_to_remove]}")
+    logger.info("Pages marked for removal: %s", [p + 1 for p in pages_to_remove])
     for i in sorted(pages_to_remove, reverse=True):
         doc.delete_page(i)
-        logger.info(f"Removed page {i + 1}")
+        logger.debug("Removed page %d", i + 1)
     return doc
 
 
-def clean_pdf(pdf_path: str) -> str:
+def clean_pdf(pdf_path: str, footer_margin: int = 80) -> str:
     """
     Cleans the PDF by removing footers and optionally TOC pages, 
     and saves the cleaned PDF to a new file. Deletes the destination file if it already exists.
 
     Args:
         pdf_path (str): Path to the input PDF file.
+        footer_margin (int): Height (in points) of the bottom band treated as footer.
 
     Returns:
         str: Path to the cleaned PDF file.
@@ -116,7 +117,7 @@ def clean_pdf(pdf_path: str) -> str:
     doc = None
     try:
         doc = fitz.open(pdf_path)
-        doc = remove_footer_by_margin(doc, footer_margin=80)
+        doc = remove_footer_by_margin(doc, footer_margin=footer_margin)
         # doc = remove_toc(doc, 5)
 
         # Save the cleaned PDF
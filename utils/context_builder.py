@@ -0,0 +1,95 @@
+# utils/context_builder.py
+
+"""
+ContextAssembler: Packs the best retrieved chunks into a fixed token budget for the LLM prompt,
+dropping duplicates and merging neighbouring chunks of the same section.
+"""
+import hashlib
+import logging
+import re
+
+from utils.chunking import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def _strip_overlap(previous: str, following: str) -> str:
+    """
+    Remove the leading paragraphs of 'following' that repeat the end of 'previous'
+    (the overlap added by the chunker).
+    """
+    paragraphs = following.split("\n\n")
+    for j in range(len(paragraphs) - 1, 0, -1):
+        if previous.endswith("\n\n".join(paragraphs[:j])):
+            return "\n\n".join(paragraphs[j:])
+    return following
+
+
+class ContextAssembler:
+    """
+    Builds the context block of the KnowledgeAgent prompt from ranked search hits.
+    """
+
+    def __init__(self, token_budget: int = 600):
+        """
+        :param token_budget: Maximum (estimated) tokens of retrieved text placed in the prompt.
+        """
+        self.token_budget = token_budget
+
+    def select(self, hits):
+        """
+        Pick hits in rank order until the budget is used, skipping duplicates.
+        :param hits: List of dicts with 'text', 'section_title' and optionally 'doc_id', 'chunk_index'
+        :return: List of (rank, hit) tuples that fit the budget
+        """
+        selected = []
+        seen = set()
+        used = 0
+        for rank, hit in enumerate(hits):
+            text = hit["text"].strip()
+            fingerprint = hashlib.sha1(re.sub(r"\s+", " ", text).lower().encode("utf-8")).hexdigest()
+            key = (hit.get("doc_id"), hit.get("section_title"), hit.get("chunk_index"))
+            if not text or fingerprint in seen or (hit.get("chunk_index") is not None and key in seen):
+                continue
+            tokens = estimate_tokens(text)
+            if used + tokens > self.token_budget:
+                if selected:
+                    continue
+                # Always include something: truncate the best hit to the budget
+                text = text[: self.token_budget * 4]
+                tokens = estimate_tokens(text)
+            seen.update((fingerprint, key))
+            selected.append((rank, dict(hit, text=text)))
+            used += tokens
+        return selected
+
+    def assemble(self, hits) -> str:
+        """
+        Build the context string from ranked hits.
+        Selected chunks of the same section are ordered by chunk_index and consecutive ones are
+        merged (without their overlap); sections appear in the order of their best-ranked chunk.
+        """
+        groups = {}
+        for rank, hit in self.select(hits):
+            group = groups.setdefault((hit.get("doc_id"), hit.get("section_title")), {"rank": rank, "hits": []})
+            group["hits"].append(hit)
+
+        blocks = []
+        for (_doc_id, title), group in sorted(groups.items(), key=lambda item: item[1]["rank"]):
+            members = sorted(group["hits"], key=lambda h: (h.get("chunk_index") is None, h.get("chunk_index") or 0))
+            parts = [members[0]["text"]]
+            for previous, hit in zip(members, members[1:]):
+                consecutive = (
+                    previous.get("chunk_index") is not None
+                    and hit.get("chunk_index") == previous["chunk_index"] + 1
+                )
+                if consecutive:
+                    parts[-1] = parts[-1] + "\n\n" + _strip_overlap(parts[-1], hit["text"])
+                else:
+                    parts.append(hit["text"])
+            blocks.append(f"{title}\n" + "\n...\n".join(parts))
+
+        context = "\n\n".join(blocks)
+        logger.debug("Assembled context: %d chunks, ~%d tokens", sum(len(g["hits"]) for g in groups.values()),
+                     estimate_tokens(context))
+        return context
@@ -0,0 +1,192 @@
+# utils/conversation_store.py
+
+"""
+Bounded chat-session history: a fixed window of recent turns in memory, the full
+transcript in an SQLite log, and a rolling summary of the turns that left the window.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteConversationLog:
+    """
+    Append-only transcript of every session's turns, shared by all sessions of the process
+    (and safe to share between processes, like SQLiteCardStore).
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS turns (
+            session_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            message TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (session_id, seq)
+        ) WITHOUT ROWID
+    """
+    # Lets prune() delete old turns without scanning the whole transcript
+    _CREATED_AT_INDEX = "CREATE INDEX IF NOT EXISTS turns_created_at ON turns (created_at)"
+    _APPEND = "INSERT INTO turns (session_id, seq, role, message, created_at) VALUES (?, ?, ?, ?, ?)"
+    _PAGE = """
+        SELECT seq, role, message FROM turns WHERE session_id = ? AND seq < ?
+        ORDER BY seq DESC LIMIT ?
+    """
+
+    def __init__(self, path: str = "conversations.db", busy_timeout: float = 30.0):
+        """
+        :param path: Database file; created if missing
+        :param busy_timeout: Seconds a writer waits for another process's write lock
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(self._SCHEMA)
+        connection.execute(self._CREATED_AT_INDEX)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads: one per thread
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def append(self, session_id: str, seq: int, role: str, message: str):
+        self._connection().execute(self._APPEND, (session_id, seq, role, message, time.time()))
+
+    def page(self, session_id: str, before_seq: int, limit: int) -> list:
+        """
+        :return: Up to 'limit' turns with seq < before_seq, oldest first, as (seq, role, message)
+        """
+        rows = self._connection().execute(self._PAGE, (session_id, before_seq, limit)).fetchall()
+        return rows[::-1]
+
+    def prune(self, max_age_seconds: float) -> int:
+        """
+        Delete turns older than max_age_seconds.
+        :return: Number of turns deleted
+        """
+        cutoff = time.time() - max_age_seconds
+        return self._connection().execute("DELETE FROM turns WHERE created_at < ?", (cutoff,)).rowcount
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def extractive_summary(summary: str, turns: list, max_chars: int = 1200) -> str:
+    """
+    Default rolling summary: one line per user request that left the window, most recent kept
+    when the summary would exceed max_chars. Needs no LLM call.
+    :param summary: The previous summary
+    :param turns: (role, message) turns that just left the window, oldest first
+    """
+    lines = summary.splitlines() if summary else []
+    for role, message in turns:
+        if role == "user":
+            text = " ".join(message.split())
+            lines.append(f"- {text[:200]}{'…' if len(text) > 200 else ''}")
+    while lines and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ConversationStore:
+    """
+    History of one chat session. Memory use is bounded by 'window' whatever the session length:
+    older turns are only in the log (paged in on demand) and in the rolling summary.
+    """
+
+    def __init__(self, session_id: str, log: SQLiteConversationLog = None, window: int = 40,
+                 summarize_fn=extractive_summary):
+        """
+        :param session_id: Key of the session's turns in the log
+        :param log: Transcript log; without one, turns leaving the window are only summarized
+        :param window: Number of recent turns kept in memory
+        :param summarize_fn: Callable (previous_summary, evicted_turns) -> new summary
+        """
+        self.session_id = session_id
+        self.log = log
+        self.window = window
+        self.summarize_fn = summarize_fn
+        self._recent = deque()
+        self._next_seq = 0
+        self.summary = ""
+
+    def __len__(self):
+        """
+        Number of turns in the whole session.
+        """
+        return self._next_seq
+
+    def append(self, role: str, message: str):
+        seq = self._next_seq
+        self._next_seq += 1
+        if self.log is not None:
+            try:
+                self.log.append(self.session_id, seq, role, message)
+            except sqlite3.Error as e:
+                # Losing the transcript must not break the chat
+                logger.warning("Could not log turn %d of session %s: %s", seq, self.session_id, e)
+        self._recent.append((seq, role, message))
+        evicted = []
+        while len(self._recent) > self.window:
+            _seq, evicted_role, evicted_message = self._recent.popleft()
+            evicted.append((evicted_role, evicted_message))
+        if evicted:
+            self.summary = self.summarize_fn(self.summary, evicted)
+
+    def recent(self, limit: int = None) -> list:
+        """
+        :return: The last 'limit' in-memory turns (all of them by default), oldest first, as (role, message)
+        """
+        turns = list(self._recent)
+        if limit is not None:
+            turns = turns[-limit:] if limit else []
+        return [(role, message) for _seq, role, message in turns]
+
+    def earlier(self, skip: int, limit: int) -> list:
+        """
+        Page backwards through the history: up to 'limit' turns preceding the last 'skip' turns,
+        oldest first, as (role, message). Read from the log where they are no longer in memory.
+        """
+        end = max(self._next_seq - skip, 0)
+        start = max(end - limit, 0)
+        first_in_memory = self._recent[0][0] if self._recent else self._next_seq
+        if self.log is None or start >= first_in_memory:
+            return [(role, message) for seq, role, message in self._recent if start <= seq < end]
+        return [(role, message) for _seq, role, message in self.log.page(self.session_id, end, end - start)]
+
+    def context(self, recent_turns: int = 6) -> str:
+        """
+        Compact conversation context for an agent prompt: the rolling summary of older turns
+        followed by the last few turns, instead of the full transcript.
+        """
+        parts = []
+        recent = self.recent(recent_turns)
+        # Turns still in the window but older than the last few are summarized with the evicted ones
+        skipped = self.recent()[:len(self._recent) - len(recent)]
+        summary = self.summarize_fn(self.summary, skipped) if skipped else self.summary
+        if summary:
+            parts.append(f"Earlier in this conversation the user asked:\n{summary}")
+        if recent:
+            parts.append("\n".join(f"{role}: {message}" for role, message in recent))
+        return "\n\n".join(parts)
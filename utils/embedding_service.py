@@ -0,0 +1,169 @@
+# utils/embedding_service.py
+
+"""
+EmbeddingService: Front for an embeddings model that caches query vectors and micro-batches
+concurrent query encodes into a single forward pass.
+"""
+import logging
+import queue
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+def configure_torch_threads(num_threads: int = None, interop_threads: int = None):
+    """
+    Set the torch intra-op / inter-op thread counts (e.g. to the pod's CPU quota rather than
+    the host's core count). Does nothing for values left as None.
+    """
+    if not num_threads and not interop_threads:
+        return
+    import torch
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            # Only allowed before torch starts any parallel work
+            logger.warning("Could not set torch inter-op threads: %s", e)
+    logger.info("torch threads: intra-op %d, inter-op %d", torch.get_num_threads(), torch.get_num_interop_threads())
+
+
+def _cache_key(text: str) -> str:
+    # The MiniLM tokenizer is uncased and ignores whitespace runs, so these variants embed identically
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class EmbeddingService:
+    """
+    Wraps an embeddings object (embed_documents / embed_query) and keeps its interface.
+    embed_query() consults an LRU cache of query vectors; misses are queued, and a worker thread
+    encodes whatever queued up within 'max_wait_ms' as one embed_documents() batch.
+    embed_documents() (bulk indexing) goes straight to the wrapped model.
+    """
+
+    def __init__(self, embeddings, cache_size: int = 2048, max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        """
+        :param embeddings: The underlying embeddings object
+        :param cache_size: Maximum cached query vectors (0 disables the cache)
+        :param max_batch_size: Maximum queries encoded in one forward pass
+        :param max_wait_ms: How long the worker waits for more queries after the first one arrives
+        """
+        self.embeddings = embeddings
+        self.cache_size = cache_size
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_queries = 0
+        self.batch_sizes = Counter()
+
+    def __call__(self, text: str):
+        # Lets vector stores that expect a plain embedding function use the service directly
+        return self.embed_query(text)
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str):
+        key = _cache_key(text)
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+        if vector is not None:
+            tracer.increment("embedding_cache_hits")
+            return vector.tolist()
+
+        with self._lock:
+            self.misses += 1
+        tracer.increment("embedding_cache_misses")
+        vector = self._submit(text).result()
+        if self.cache_size:
+            with self._lock:
+                self._cache[key] = vector
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return vector.tolist()
+
+    def _submit(self, text: str) -> Future:
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, daemon=True, name="embedding-batcher")
+                    self._worker.start()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._encode(batch)
+
+    def _encode(self, batch):
+        # Identical texts queued together are encoded once
+        unique = list(dict.fromkeys(text for text, _future in batch))
+        start = time.perf_counter()
+        try:
+            vectors = np.asarray(self.embeddings.embed_documents(unique), dtype=np.float32)
+        except Exception as e:
+            for _text, future in batch:
+                future.set_exception(e)
+            return
+        tracer.observe("embedding_batch", time.perf_counter() - start)
+        by_text = dict(zip(unique, vectors))
+        for text, future in batch:
+            future.set_result(by_text[text])
+        with self._lock:
+            self.batches += 1
+            self.batched_queries += len(batch)
+            self.batch_sizes[len(batch)] += 1
+        tracer.increment("embedding_batches")
+        tracer.increment("embedding_batched_queries", len(batch))
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        """
+        Counters for monitoring.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cached": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "batches": self.batches,
+                "mean_batch_size": self.batched_queries / self.batches if self.batches else 0.0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            }
@@ -1,4 +1,3 @@
-import pdfplumber
 import re
 
 def extract_toc_entries(pdf):
@@ -6,7 +5,6 @@ def extract_toc_entries(pdf):
     Parses the PDF's Table of Contents page to extract (title, page_number) entries.
     Returns a list of tuples.
     """
-    toc_entries = []
 #    with pdfplumber.open(pdf_path) as pdf:
         # 1. Locate the TOC page by finding "Contents"
     toc_page_index = None
@@ -19,8 +17,16 @@ def extract_toc_entries(pdf):
         raise RuntimeError("Table of Contents page not found")
 
     # 2. Parse the TOC lines for "Title ... page"
-    lines = pdf.pages[toc_page_index].extract_text().splitlines()
-    for line in lines:
+    return parse_toc_lines(pdf.pages[toc_page_index].extract_text())
+
+def parse_toc_lines(text):
+    """
+    Parses the text of a Table of Contents page into (title, page_number) entries.
+    Returns a list of tuples.
+    """
+    toc_entries = []
+    for line in text.splitlines():
+        line = line.strip()
         # Match formats like "Section Title ........ 12" or "Section Title    12"
         match = re.match(r'^(.*?)\.{2,}\s*(\d+)$', line) or re.match(r'^(.*?)\s+(\d+)$', line)
         if match:
@@ -34,6 +40,8 @@ def extract_sections_by_toc(pdf_path):
     Uses the TOC entries to slice the PDF into sections.
     Returns a list of dicts with keys: title, start_page, end_page, text.
     """
+    import pdfplumber
+
     sections = []
 
     with pdfplumber.open(pdf_path) as pdf:
@@ -58,7 +66,7 @@ def extract_sections_by_toc(pdf_path):
 
                 sections.append({
                     "title": title,
-                    "start_gpage": start_idx + 1,
+                    "start_page": start_idx + 1,
                     "end_page": end_idx + 1,
                     "text": sec_text.strip()
                 })
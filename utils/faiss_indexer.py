@@ -1,60 +1,194 @@
+import hashlib
 import os
 import logging
 
 #import faiss
 import numpy as np
-from langchain_community.vectorstores import FAISS
-#from langchain_community.embeddings import HuggingFaceEmbeddings,
-from langchain_huggingface import HuggingFaceEmbeddings
 
-from langchain.schema import Document
+from utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
 
+def embedding_model_key(embedding_model_name: str, embedding_backend: str = "torch") -> str:
+    """
+    Name identifying the vectors of a model and embedding backend (indexer.embedding_model_name).
+    Vectors differ slightly between backends, so cached knowledge bases must not be shared:
+    the optimized backends get "<model>@<backend>".
+    """
+    return embedding_model_name if embedding_backend == "torch" else f"{embedding_model_name}@{embedding_backend}"
+
+
+def split_embedding_model_key(model_key: str) -> tuple:
+    """
+    Inverse of embedding_model_key.
+    :return: (embedding_model_name, embedding_backend)
+    """
+    model, separator, backend = model_key.rpartition("@")
+    return (model, backend) if separator else (model_key, "torch")
+
+
+def create_indexer(backend: str = "langchain", embedding_model_name: str = "all-MiniLM-L6-v2",
+                   embedding_backend: str = "torch", **options):
+    """
+    Create the retrieval backend.
+    :param backend: 'langchain' (FAISSIndexer) or 'native' (NativeFAISSIndexer)
+    :param embedding_model_name: Model name or path (the exported model directory for ONNX backends)
+    :param embedding_backend: 'torch' (default) or an optimized backend from utils.fast_embeddings
+    :param options: Extra NativeFAISSIndexer options, e.g. index_type='hnsw'
+    """
+    embeddings = None
+    model_key = embedding_model_key(embedding_model_name, embedding_backend)
+    if embedding_backend != "torch":
+        from utils.fast_embeddings import create_embeddings
+
+        embeddings = create_embeddings(embedding_backend, embedding_model_name)
+    if backend == "native":
+        from utils.native_index import NativeFAISSIndexer
+
+        return NativeFAISSIndexer(model_key, embeddings=embeddings, **options)
+    if backend != "langchain":
+        raise ValueError(f"Unknown retrieval backend '{backend}'")
+    return FAISSIndexer(model_key, embeddings=embeddings)
+
+
 class FAISSIndexer:
     """
     FAISSIndexer: Index knowledge base documents using embeddings and FAISS.
     Supports structured PDFs including tables and TOC using pdfplumber.
     """
 
-    def __init__(self, embedding_model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, embedding_model_name: str = "all-MiniLM-L6-v2", embeddings=None):
         """
         Initialize the indexer with a PDF path and embedding model.
         :param pdf_path: Path to the PDF knowledge base
         :param embedding_model_name: SentenceTransformer model name for embeddings
+        :param embeddings: Embeddings object to use instead of loading the model with HuggingFaceEmbeddings
         """
         
         #self.embedding_model = SentenceTransformer(embedding_model_name)
-        self.embeddings = HuggingFaceEmbeddings(model_name=embedding_model_name)
+        if embeddings is None:
+            # Imported here: langchain_huggingface pulls in torch and sentence-transformers,
+            # which dominates startup time if done at module import
+            from langchain_huggingface import HuggingFaceEmbeddings
+
+            embeddings = HuggingFaceEmbeddings(model_name=embedding_model_name)
+        self.embedding_model_name = embedding_model_name
+        self.embeddings = embeddings
         self.vectorstore = None
         self.index = None
+        # doc_id -> {"chunks": [...], "hashes": [...], "ids": [...], "embeddings": np.ndarray}
+        self.documents = {}
+        # Incremented on every change to the indexed content; lets caches detect stale entries
+        self.version = 0
+
 
+    @staticmethod
+    def _content_hash(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
 
-    def build_faiss_index(self, chunks):
+    def build_faiss_index(self, chunks, doc_id: str = "default"):
         """
-        Build a FAISS vectorstore from structured chunks.
-        :param chunks: List of dicts with 'content', 'section_title', and 'chunk_index'
+        Build a FAISS vectorstore from structured chunks, replacing any existing documents.
+        :param chunks: List of dicts with 'text', 'title' and optionally 'chunk_index'
+        :param doc_id: Document ID the chunks are registered under
         :return: Initialized FAISS vectorstore
         """
         logger.info("Building FAISS index with %d chunks", len(chunks))
-        # Create LangChain Document objects with metadata
-        
-        docs = [
-            Document(
-                page_content=chunk['text'],
-                metadata={
-                    "section_title": chunk['title'],
-                    "chunk_index": chunk.get("chunk_index")
-                }
-            )
-            for chunk in chunks
-        ]
-        # Create FAISS vectorstore and store on self for access by other methods
-        self.vectorstore = FAISS.from_documents(docs, embedding=self.embeddings)
+        self.vectorstore = None
+        self.documents = {}
+        self.add_document(doc_id, chunks)
         logger.info("FAISS vectorstore built and saved to instance")
         return self.vectorstore
 
+    def add_document(self, doc_id: str, chunks, embeddings=None):
+        """
+        Add a document's chunks to the index, replacing the document if the ID is already indexed.
+        Only chunks whose text is not already embedded for this document are sent to the model.
+        :param doc_id: Stable document ID (e.g. the PDF file name)
+        :param chunks: List of dicts with 'text', 'title' and optionally 'chunk_index',
+                       'start_page' and 'end_page'
+        :param embeddings: Optional precomputed embeddings, one row per chunk
+        :return: The document's embedding matrix
+        """
+        previous = self.documents.get(doc_id)
+        hashes = [self._content_hash(chunk['text']) for chunk in chunks]
+
+        if embeddings is not None:
+            vectors = np.asarray(embeddings, dtype=np.float32)
+            if len(vectors) != len(chunks):
+                raise ValueError(f"Got {len(vectors)} embeddings for {len(chunks)} chunks of '{doc_id}'")
+        else:
+            # Reuse vectors of sections whose text did not change
+            known = {}
+            if previous is not None:
+                known = dict(zip(previous["hashes"], previous["embeddings"]))
+            missing = [i for i, h in enumerate(hashes) if h not in known]
+            logger.info("Document '%s': embedding %d of %d chunks", doc_id, len(missing), len(chunks))
+            new_vectors = self.embeddings.embed_documents([chunks[i]['text'] for i in missing]) if missing else []
+            known.update(zip((hashes[i] for i in missing), np.asarray(new_vectors, dtype=np.float32)))
+            vectors = np.asarray([known[h] for h in hashes], dtype=np.float32)
+
+        if previous is not None:
+            self._delete_ids(previous["ids"])
+
+        ids = [f"{doc_id}:{i}" for i in range(len(chunks))]
+        metadatas = [
+            {
+                "doc_id": doc_id,
+                "section_title": chunk['title'],
+                "chunk_index": chunk.get("chunk_index"),
+                "start_page": chunk.get("start_page"),
+                "end_page": chunk.get("end_page"),
+            }
+            for chunk in chunks
+        ]
+        if chunks:
+            text_embeddings = list(zip((chunk['text'] for chunk in chunks), vectors.tolist()))
+            if self.vectorstore is None:
+                from langchain_community.vectorstores import FAISS
+
+                from utils.fast_embeddings import as_langchain_embeddings
+
+                self.vectorstore = FAISS.from_embeddings(
+                    text_embeddings, embedding=as_langchain_embeddings(self.embeddings), metadatas=metadatas, ids=ids
+                )
+            else:
+                self.vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+        self.documents[doc_id] = {"chunks": chunks, "hashes": hashes, "ids": ids, "embeddings": vectors}
+        self.version += 1
+        return vectors
+
+    def update_document(self, doc_id: str, chunks, embeddings=None):
+        """
+        Replace a document's chunks. Alias of add_document() kept for readability at call sites.
+        """
+        return self.add_document(doc_id, chunks, embeddings)
+
+    def remove_document(self, doc_id: str):
+        """
+        Remove all chunks of a document from the index.
+        :return: True if the document was indexed
+        """
+        previous = self.documents.pop(doc_id, None)
+        if previous is None:
+            return False
+        self._delete_ids(previous["ids"])
+        self.version += 1
+        logger.info("Removed document '%s' (%d chunks)", doc_id, len(previous["ids"]))
+        return True
+
+    def document_embeddings(self, doc_id: str):
+        """
+        Return the embedding matrix of an indexed document.
+        """
+        return self.documents[doc_id]["embeddings"]
+
+    def _delete_ids(self, ids):
+        if self.vectorstore is not None and ids:
+            self.vectorstore.delete(ids)
+
     def search(self, query: str, top_k: int = 3):
         """
         Perform semantic search over the FAISS vectorstore.
@@ -67,28 +201,67 @@ class FAISSIndexer:
             logger.error("Vectorstore is not initialized. Call build_faiss_index() first.")
             raise ValueError("Index not built. Please run build_faiss_index() before searching.")
 
-        logger.info(f"Searching FAISS vectorstore for query: '{query}' (top_k={top_k})")
+        logger.debug("Searching FAISS vectorstore for query: '%s' (top_k=%d)", query, top_k)
         results = self.vectorstore.similarity_search(query, k=top_k)
-        logger.info("Search returned %d results", len(results))
-        
-        combined_result = ""
+        logger.debug("Search returned %d results", len(results))
+
+        parts = []
         for i, doc in enumerate(results):
-            logger.info(f"\n--- Result {i+1} ---")
-            logger.info(f"Section: {doc.metadata['section_title']} | Chunk: {doc.metadata['chunk_index']}")
-            combined_result += doc.metadata['section_title'] + "  " + doc.page_content + "\n"
-            print("combined_result", combined_result)
-            #logger.info(doc.page_content)
-        return combined_result
-
-    
-    
+            logger.debug("Result %d: section '%s' | chunk %s", i + 1, doc.metadata['section_title'],
+                         doc.metadata['chunk_index'])
+            parts.append(doc.metadata['section_title'] + "  " + doc.page_content + "\n")
+        return "".join(parts)
+
+    def search_chunks(self, query: str, top_k: int = 6):
+        """
+        Semantic search returning structured hits, best first.
+        :param query: Query string
+        :param top_k: Number of results to return
+        :return: List of dicts with 'text', 'score' (L2 distance, lower is closer) and the chunk metadata
+        """
+        if not self.vectorstore:
+            logger.error("Vectorstore is not initialized. Call build_faiss_index() first.")
+            raise ValueError("Index not built. Please run build_faiss_index() before searching.")
+
+        with tracer.span("embedding"):
+            query_vector = self.embeddings.embed_query(query)
+        with tracer.span("faiss_search", top_k=top_k):
+            results = self.vectorstore.similarity_search_with_score_by_vector(query_vector, k=top_k)
+        logger.debug("Search for '%s' returned %d chunks", query, len(results))
+        return [dict(doc.metadata, text=doc.page_content, score=float(score)) for doc, score in results]
+
+    def search_chunks_by_vectors(self, query_vectors, top_k: int = 6):
+        """
+        Search many queries at once with a single FAISS matrix query.
+        :param query_vectors: Array-like of shape (n_queries, dim)
+        :param top_k: Number of results per query
+        :return: One list of hits (as returned by search_chunks) per query
+        """
+        if not self.vectorstore:
+            logger.error("Vectorstore is not initialized. Call build_faiss_index() first.")
+            raise ValueError("Index not built. Please run build_faiss_index() before searching.")
+
+        matrix = np.asarray(query_vectors, dtype=np.float32)
+        distances, positions = self.vectorstore.index.search(matrix, top_k)
+        results = []
+        for row_distances, row_positions in zip(distances, positions):
+            hits = []
+            for distance, position in zip(row_distances, row_positions):
+                if position < 0:
+                    continue
+                doc = self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[int(position)])
+                hits.append(dict(doc.metadata, text=doc.page_content, score=float(distance)))
+            results.append(hits)
+        return results
+
+
+
     # ---- 2. Search Function ----
     def semantic_search(self, query,  k: int = 3):
-        results = vectorstore.similarity_search(query, k=k)
+        results = self.vectorstore.similarity_search(query, k=k)
         for i, doc in enumerate(results):
-            logger.info(f"\n--- Result {i+1} ---")
-            logger.info(f"Section: {doc.metadata['section_title']} | Chunk: {doc.metadata['chunk_index']}")
-            logger.info(doc.page_content[:400], "...")
+            logger.debug("Result %d: section '%s' | chunk %s", i + 1, doc.metadata['section_title'],
+                         doc.metadata['chunk_index'])
         return results
 
 
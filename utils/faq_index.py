@@ -0,0 +1,266 @@
+# utils/faq_index.py
+
+"""
+FAQ index: canonical question/answer pairs generated per guide section with the LLM at
+build time, and matched against user questions by embedding similarity at query time, so
+common questions are answered without retrieval or an LLM call.
+
+The pairs are cached next to the knowledge base (same PDF hash in the key) and regenerated
+only when the guide changes. Prebuild them offline with:
+
+    python -m utils.faq_index global_card_access_user_guide.pdf
+"""
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+
+from utils.kb_cache import KnowledgeBaseCache, default_doc_id
+
+logger = logging.getLogger(__name__)
+
+FAQ_PROMPT = """You are writing the FAQ for one section of a card services user guide.
+Write {count} questions that users of the guide are likely to ask and that this section fully answers,
+each with a complete, self-contained answer based only on the section text.
+Reply with a JSON array only, in the form [{{"question": "...", "answer": "..."}}].
+
+Section: {title}
+
+{text}"""
+
+# Sections shorter than this (in characters) are headings or stubs, not worth an FAQ entry
+MIN_SECTION_CHARS = 200
+# Section text beyond this is not sent to the LLM
+MAX_SECTION_CHARS = 6000
+
+
+def parse_faq_response(text: str) -> list:
+    """
+    Extract the question/answer pairs from the LLM reply (a JSON array, possibly wrapped in
+    code fences or prose). Malformed entries are skipped.
+    :return: List of {"question", "answer"} dicts (empty if nothing usable was found)
+    """
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"\[", text):
+        try:
+            payload, _end = decoder.raw_decode(text, match.start())
+        except ValueError:
+            continue
+        if not isinstance(payload, list):
+            continue
+        pairs = []
+        for item in payload:
+            if not isinstance(item, dict):
+                continue
+            question, answer = item.get("question"), item.get("answer")
+            if isinstance(question, str) and isinstance(answer, str) and question.strip() and answer.strip():
+                pairs.append({"question": question.strip(), "answer": answer.strip()})
+        if pairs:
+            return pairs
+    return []
+
+
+def generate_faq(sections, llm, questions_per_section: int = 3):
+    """
+    Ask the LLM for canonical question/answer pairs, one call per section.
+    :param sections: Sections as produced by ingest_pdf ({"title", "text", ...})
+    :param llm: Object with generate_answer(prompt) (LLMWrapper)
+    :return: (entries, failed) - entries are {"question", "answer", "section_title"} dicts,
+             failed is the number of sections whose generation raised or gave no usable pairs
+    """
+    entries = []
+    failed = 0
+    for section in sections:
+        text = section["text"].strip()
+        if len(text) < MIN_SECTION_CHARS:
+            continue
+        prompt = FAQ_PROMPT.format(count=questions_per_section, title=section["title"],
+                                   text=text[:MAX_SECTION_CHARS])
+        try:
+            pairs = parse_faq_response(llm.generate_answer(prompt))
+        except Exception as e:
+            logger.warning("FAQ generation failed for section '%s': %s", section["title"], e)
+            failed += 1
+            continue
+        if not pairs:
+            logger.warning("FAQ generation returned no usable pairs for section '%s'", section["title"])
+            failed += 1
+            continue
+        for pair in pairs[:questions_per_section]:
+            entries.append(dict(pair, section_title=section["title"]))
+    return entries, failed
+
+
+class FAQIndex:
+    """
+    Flat inner-product index over the normalized embeddings of the canonical questions.
+    A user question matches when its cosine similarity to the closest canonical question
+    reaches 'threshold'; below it the question is left to the knowledge agent.
+    """
+
+    def __init__(self, embeddings, threshold: float = 0.88):
+        """
+        :param embeddings: Embeddings object (embed_documents / embed_query), normally the indexer's
+        :param threshold: Minimum cosine similarity for a match
+        """
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self._documents = {}
+        self._entries = []
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def embed_questions(self, entries) -> np.ndarray:
+        vectors = np.asarray(self.embeddings.embed_documents([entry["question"] for entry in entries]),
+                             dtype=np.float32)
+        return _normalized(vectors)
+
+    def add_document(self, doc_id: str, entries, vectors=None) -> np.ndarray:
+        """
+        Add (or replace) the FAQ entries of a document.
+        :param vectors: Precomputed question embeddings (e.g. from the cache); computed if omitted
+        :return: The question embeddings
+        """
+        entries = list(entries)
+        if vectors is None:
+            vectors = self.embed_questions(entries) if entries else np.empty((0, 0), dtype=np.float32)
+        else:
+            vectors = _normalized(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            self._documents[doc_id] = (entries, vectors)
+            self._rebuild()
+        return vectors
+
+    def remove_document(self, doc_id: str):
+        with self._lock:
+            if self._documents.pop(doc_id, None) is not None:
+                self._rebuild()
+
+    def _rebuild(self):
+        documents = [(entries, vectors) for entries, vectors in self._documents.values() if entries]
+        self._entries = [entry for entries, _vectors in documents for entry in entries]
+        self._matrix = np.vstack([vectors for _entries, vectors in documents]) if documents \
+            else np.empty((0, 0), dtype=np.float32)
+
+    def match(self, question: str):
+        """
+        :return: (entry, similarity) of the closest canonical question if it reaches the threshold, else None
+        """
+        with self._lock:
+            entries, matrix = self._entries, self._matrix
+        if not entries:
+            return None
+        vector = _normalized(np.asarray([self.embeddings.embed_query(question)], dtype=np.float32))[0]
+        similarities = matrix @ vector
+        best = int(np.argmax(similarities))
+        with self._lock:
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+        logger.debug("FAQ match for '%s': '%s' (similarity %.3f)", question, entries[best]["question"],
+                     similarities[best])
+        return entries[best], float(similarities[best])
+
+    def stats(self) -> dict:
+        """
+        Counters for monitoring.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _normalized(matrix: np.ndarray) -> np.ndarray:
+    if matrix.size == 0:
+        return matrix
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.where(norms == 0, 1, norms)).astype(np.float32, copy=False)
+
+
+def load_or_build_faq(pdf_path: str, faq_index: FAQIndex, llm, cache: KnowledgeBaseCache = None,
+                      embedding_model_name: str = "all-MiniLM-L6-v2", footer_margin: int = 80,
+                      questions_per_section: int = 3, doc_id: str = None):
+    """
+    Add a PDF's FAQ entries to the FAQ index, generating them with the LLM only when no cache
+    entry exists for this version of the PDF. Generation holds the cache's build lock for the
+    key, so processes sharing the cache directory generate it once. A partially failed
+    generation is used but not cached, so it is retried on the next start.
+    :param llm: LLM used on a cache miss (LLMWrapper)
+    :param embedding_model_name: Embedding model of faq_index (part of the cache key)
+    :return: The FAQ entries of the document
+    """
+    cache = cache or KnowledgeBaseCache()
+    doc_id = doc_id or default_doc_id(pdf_path)
+    llm_model = getattr(llm, "model", type(llm).__name__)
+    key = cache.make_key(pdf_path, embedding_model_name, kind="faq", llm_model=llm_model,
+                         footer_margin=footer_margin, questions_per_section=questions_per_section,
+                         prompt=FAQ_PROMPT)
+
+    # Workers starting together would each pay for the LLM calls: one builds, the others
+    # wait and load its entry
+    with cache.build_lock(key):
+        cached = cache.load(key)
+        if cached is not None:
+            logger.info("FAQ cache hit for %s (key %s)", pdf_path, key)
+            entries, vectors = cached
+            faq_index.add_document(doc_id, entries, vectors=vectors)
+            return entries
+
+        logger.info("FAQ cache miss for %s (key %s), generating with %s", pdf_path, key, llm_model)
+        from utils.pdf_ingest import ingest_pdf
+
+        sections = ingest_pdf(pdf_path, footer_margin=footer_margin)
+        entries, failed = generate_faq(sections, llm, questions_per_section=questions_per_section)
+        vectors = faq_index.add_document(doc_id, entries)
+        if failed:
+            logger.warning("FAQ for %s incomplete (%d sections failed), not caching it", pdf_path, failed)
+        else:
+            cache.save(key, entries, vectors, manifest={
+                "kind": "faq",
+                "pdf_path": os.path.abspath(pdf_path),
+                "doc_id": doc_id,
+                "llm_model": llm_model,
+                "embedding_model": embedding_model_name,
+                "num_sections": len(sections),
+                "num_entries": len(entries),
+            })
+    return entries
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from dotenv import load_dotenv
+
+    from utils.llm_wrapper import LLMWrapper
+    from utils.native_index import SentenceTransformerEmbeddings
+
+    parser = argparse.ArgumentParser(description="Generate and cache the FAQ index of guide PDFs")
+    parser.add_argument("pdf_paths", nargs="+")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Embedding model name or local path")
+    parser.add_argument("--cache-dir", default=".kb_cache")
+    parser.add_argument("--questions-per-section", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+
+    llm = LLMWrapper(os.getenv("GROQ_API_KEY"))
+    index = FAQIndex(SentenceTransformerEmbeddings(args.model))
+    for path in args.pdf_paths:
+        faq = load_or_build_faq(path, index, llm, KnowledgeBaseCache(args.cache_dir), embedding_model_name=args.model,
+                                questions_per_section=args.questions_per_section)
+        print(f"{path}: {len(faq)} FAQ entries")
@@ -0,0 +1,224 @@
+# utils/fast_embeddings.py
+
+"""
+Optimized CPU embedding backends for the MiniLM sentence-transformer:
+
+- "int8":      the PyTorch model with its Linear layers dynamically quantized to int8
+- "onnx":      an exported ONNX graph run by onnxruntime, from a local model directory
+- "onnx-int8": the same graph with dynamically int8-quantized weights
+
+All backends expose embed_documents / embed_query and return L2-normalized, mean-pooled
+vectors like the PyTorch model. The ONNX backends need the optional onnxruntime package
+(and onnx to export). Export a model directory with:
+
+    python -m utils.fast_embeddings all-MiniLM-L6-v2 models/minilm-onnx --quantize
+
+and check retrieval parity / speed with benchmarks/embedding_backends.py.
+"""
+import json
+import logging
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "int8", "onnx", "onnx-int8")
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_quantized.onnx"
+
+
+def _normalized(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.where(norms == 0, 1, norms)).astype(np.float32, copy=False)
+
+
+class _EmbeddingsBase:
+    """
+    embed_documents / embed_query on top of an encode(texts) -> normalized matrix method.
+    """
+
+    def encode(self, texts) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed_documents(self, texts):
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text: str):
+        return self.encode([text])[0].tolist()
+
+
+class Int8TorchEmbeddings(_EmbeddingsBase):
+    """
+    sentence-transformers model with dynamically int8-quantized Linear layers (weights are
+    quantized once at load time, activations per batch). Needs only PyTorch.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = 64):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        model = SentenceTransformer(model_name, device="cpu")
+        self.model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def encode(self, texts) -> np.ndarray:
+        return self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                 convert_to_numpy=True, show_progress_bar=False).astype(np.float32, copy=False)
+
+
+class OnnxEmbeddings(_EmbeddingsBase):
+    """
+    Runs an exported transformer with onnxruntime and applies the sentence-transformers
+    mean pooling and normalization in numpy. Texts are sorted by length before batching
+    so each batch is padded as little as possible.
+    """
+
+    def __init__(self, model_dir: str, file_name: str = ONNX_FILE, batch_size: int = 64,
+                 max_length: int = None, num_threads: int = None):
+        """
+        :param model_dir: Directory holding the .onnx file and tokenizer.json (see export_onnx)
+        :param file_name: ONNX file to load (ONNX_INT8_FILE for the quantized graph)
+        :param max_length: Token limit; defaults to max_seq_length from sentence_bert_config.json, else 256
+        :param num_threads: onnxruntime intra-op threads (None = onnxruntime default)
+        """
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.model_name = model_dir
+        self.batch_size = batch_size
+        if max_length is None:
+            max_length = 256
+            config_path = os.path.join(model_dir, "sentence_bert_config.json")
+            if os.path.exists(config_path):
+                with open(config_path, encoding="utf-8") as f:
+                    max_length = json.load(f).get("max_seq_length", max_length)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token="[PAD]")
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(os.path.join(model_dir, file_name), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def encode(self, texts) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        pooled = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in batch])
+            input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.asarray([e.type_ids for e in encodings], dtype=np.int64)
+            hidden = self.session.run(None, feeds)[0]
+            mask = attention_mask[..., None].astype(np.float32)
+            vectors = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            for i, vector in zip(batch, vectors):
+                pooled[i] = vector
+        return _normalized(np.stack(pooled))
+
+
+class LangChainEmbeddingsAdapter(Embeddings):
+    """
+    Presents a duck-typed embeddings object (embed_documents / embed_query: these backends,
+    SentenceTransformerEmbeddings, EmbeddingService) as LangChain Embeddings, for LangChain
+    vector stores.
+    """
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str):
+        return self.embeddings.embed_query(text)
+
+
+def as_langchain_embeddings(embeddings) -> Embeddings:
+    """
+    :return: The embeddings themselves if they are LangChain Embeddings, else an adapter
+    """
+    return embeddings if isinstance(embeddings, Embeddings) else LangChainEmbeddingsAdapter(embeddings)
+
+
+def create_embeddings(backend: str, model: str = "all-MiniLM-L6-v2", **options):
+    """
+    Create an optimized embeddings backend.
+    :param backend: "int8", "onnx" or "onnx-int8" ("torch" is the indexers' default and returns None)
+    :param model: Model name or directory for "int8"; exported model directory for the ONNX backends
+    """
+    if backend == "torch":
+        return None
+    if backend == "int8":
+        return Int8TorchEmbeddings(model, **options)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbeddings(model, file_name=ONNX_INT8_FILE if backend == "onnx-int8" else ONNX_FILE, **options)
+    raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = False, opset: int = 17):
+    """
+    Export the transformer of a sentence-transformers model to output_dir/model.onnx,
+    together with its tokenizer and pooling config. With quantize=True also write
+    model_quantized.onnx with int8 weights (requires onnxruntime).
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    class Encoder(torch.nn.Module):
+        # Keyword arguments: positional order of the transformer's forward() differs across versions
+        def __init__(self, transformer):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.transformer(input_ids=input_ids, attention_mask=attention_mask,
+                                    token_type_ids=token_type_ids).last_hidden_state
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    encoder = Encoder(model[0].auto_model).eval()
+    model.tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, "sentence_bert_config.json"), "w", encoding="utf-8") as f:
+        json.dump({"max_seq_length": model.max_seq_length}, f)
+
+    sample = model.tokenizer(["An example sentence to trace the graph"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    onnx_path = os.path.join(output_dir, ONNX_FILE)
+    with torch.no_grad():
+        torch.onnx.export(encoder, tuple(sample[name] for name in names), onnx_path,
+                          input_names=names, output_names=["last_hidden_state"],
+                          dynamic_axes=dynamic_axes, opset_version=opset, dynamo=False)
+    logger.info("Exported %s to %s", model_name, onnx_path)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(onnx_path, os.path.join(output_dir, ONNX_INT8_FILE), weight_type=QuantType.QInt8)
+        logger.info("Wrote int8 model to %s", os.path.join(output_dir, ONNX_INT8_FILE))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export a sentence-transformers model to ONNX")
+    parser.add_argument("model", help="Model name or local path, e.g. all-MiniLM-L6-v2")
+    parser.add_argument("output_dir")
+    parser.add_argument("--quantize", action="store_true", help="Also write an int8-quantized model")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    export_onnx(args.model, args.output_dir, quantize=args.quantize)
@@ -0,0 +1,145 @@
+# utils/intent_classifier.py
+
+"""
+LocalIntentClassifier: Nearest-centroid intent classification over sentence embeddings,
+used by IntentAgent to avoid an LLM round trip for unambiguous messages.
+"""
+import logging
+import re
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXAMPLES = {
+    "activate": [
+        "Activate my card",
+        "Please activate card 123456789",
+        "I want to activate my new card",
+        "Can you turn on my card 987654321",
+        "Enable my card",
+        "I just received my card, please activate it",
+        "Unblock card 555555555",
+        "Start using my card 111222333",
+    ],
+    "deactivate": [
+        "Deactivate my card",
+        "Please deactivate card 123456789",
+        "I lost my card, block it",
+        "Turn off my card 987654321",
+        "Disable my card",
+        "My card was stolen, please cancel it",
+        "Freeze card 555555555",
+        "Stop my card 111222333 from working",
+    ],
+    "knowledge": [
+        "How do I activate my card?",
+        "How do I reset my PIN?",
+        "What is the process to deactivate a user?",
+        "How can I download my statements?",
+        "How do I register for Global Card Access?",
+        "What can a program administrator do?",
+        "How do I view transactions?",
+        "Where can I find my credit limit?",
+        "How do I create an account request key?",
+        "What should I do if I forget my password?",
+    ],
+}
+
+# Lexical cues for the direction of a card operation. They only apply when the message
+# carries a card number, because questions *about* activation mention these words too.
+_DEACTIVATE_CUE = re.compile(r"\b(deactivat\w*|disable|block|freeze|cancel|turn off|stop)\b", re.IGNORECASE)
+_ACTIVATE_CUE = re.compile(r"\b(activat\w*|enable|unblock|turn on)\b", re.IGNORECASE)
+_QUESTION = re.compile(r"\?\s*$|^\s*(how|what|where|when|why|which|who|can|could|is|are|do|does|should)\b",
+                       re.IGNORECASE)
+
+
+class LocalIntentClassifier:
+    """
+    Classifies a message into one of the labels of its example set by cosine similarity
+    to each label's centroid, and reports a confidence (softmax probability of the best label).
+    """
+
+    def __init__(self, embed_documents, embed_query, examples: dict = None, card_number_fn=None,
+                 card_number_boost: float = 0.1, temperature: float = 0.05):
+        """
+        :param embed_documents: Callable embedding a list of texts (e.g. embeddings.embed_documents)
+        :param embed_query: Callable embedding a single text (e.g. embeddings.embed_query)
+        :param examples: Mapping of label -> example utterances (defaults to DEFAULT_EXAMPLES)
+        :param card_number_fn: Callable returning a card number found in a text, or None
+        :param card_number_boost: Similarity bonus given to card operations when a card number is present
+        :param temperature: Softmax temperature used to turn similarities into a confidence
+        """
+        self.embed_query = embed_query
+        self.card_number_fn = card_number_fn
+        self.card_number_boost = card_number_boost
+        self.temperature = temperature
+
+        examples = examples or DEFAULT_EXAMPLES
+        self.labels = list(examples)
+        centroids = []
+        for label in self.labels:
+            vectors = self._normalize(np.asarray(embed_documents(examples[label]), dtype=np.float32))
+            centroids.append(vectors.mean(axis=0))
+        self.centroids = self._normalize(np.stack(centroids))
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def classify(self, text: str):
+        """
+        Classify a message.
+        :return: (label, confidence) with confidence in [0, 1]
+        """
+        return self.classify_vector(text, self.embed_query(text))
+
+    def classify_vector(self, text: str, vector):
+        """
+        Classify a message whose embedding has already been computed (e.g. in a batch).
+        :return: (label, confidence) with confidence in [0, 1]
+        """
+        vector = self._normalize(np.asarray(vector, dtype=np.float32))
+        scores = self.centroids @ vector
+
+        if self.card_number_fn is not None and self.card_number_fn(text):
+            for label, cue in (("activate", _ACTIVATE_CUE), ("deactivate", _DEACTIVATE_CUE)):
+                if label in self.labels:
+                    idx = self.labels.index(label)
+                    scores[idx] += self.card_number_boost
+                    if cue.search(text):
+                        scores[idx] += self.card_number_boost
+
+        logits = (scores - scores.max()) / self.temperature
+        probabilities = np.exp(logits) / np.exp(logits).sum()
+        best = int(np.argmax(probabilities))
+        logger.debug("Local intent scores for '%s': %s", text, dict(zip(self.labels, scores.round(3))))
+        return self.labels[best], float(probabilities[best])
+
+
+def card_operation_cue(text: str, card_number_fn):
+    """
+    Embedding-free intent check for unambiguous card operations, used while the
+    embedding model is still loading.
+    :return: "activate" or "deactivate" when the text carries a card number and exactly
+             one direction cue, otherwise None
+    """
+    if not card_number_fn(text):
+        return None
+    deactivate = bool(_DEACTIVATE_CUE.search(text))
+    activate = bool(_ACTIVATE_CUE.search(text))
+    if deactivate == activate:
+        return None
+    return "deactivate" if deactivate else "activate"
+
+
+def may_request_card_operation(text: str, card_number_fn) -> bool:
+    """
+    Whether the text could be asking for a card operation rather than asking about one:
+    it carries a card number, or a direction cue in a message not phrased as a question.
+    Such messages must not be answered from the FAQ or answer cache.
+    """
+    if card_number_fn(text):
+        return True
+    return bool(_DEACTIVATE_CUE.search(text) or _ACTIVATE_CUE.search(text)) and not _QUESTION.search(text)
@@ -0,0 +1,191 @@
+# utils/kb_cache.py
+
+"""
+KnowledgeBaseCache: Versioned on-disk store for the artifacts derived from each source PDF
+(cleaned section chunks and their embeddings).
+"""
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from utils.chunking import chunk_sections
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the layout of a cache entry or the ingestion logic changes
+CACHE_FORMAT_VERSION = 4
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 hex digest of a file without loading it all into memory.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def default_doc_id(pdf_path: str) -> str:
+    """
+    Stable document ID for a PDF: its file name without extension.
+    """
+    return os.path.splitext(os.path.basename(pdf_path))[0]
+
+
+class KnowledgeBaseCache:
+    """
+    Stores per-document artifacts under <cache_dir>/<key>/, where the key is derived from
+    the source PDF's content hash, the embedding model name and the ingestion parameters.
+    Any change to one of those inputs produces a new key, so stale entries are never served.
+    The FAISS index itself is assembled from the cached embeddings, which takes milliseconds.
+    """
+
+    def __init__(self, cache_dir: str = ".kb_cache"):
+        """
+        :param cache_dir: Root directory holding one sub-directory per cache entry.
+        """
+        self.cache_dir = cache_dir
+
+    def make_key(self, pdf_path: str, embedding_model_name: str, **params) -> str:
+        """
+        Derive the cache key for a PDF and the parameters used to process it.
+        :param pdf_path: Path to the source PDF
+        :param embedding_model_name: Name of the embedding model used for the index
+        :param params: Ingestion parameters (e.g. footer_margin, chunk_size)
+        :return: Hex string identifying the cache entry
+        """
+        payload = {
+            "format_version": CACHE_FORMAT_VERSION,
+            "pdf_sha256": file_sha256(pdf_path),
+            "embedding_model": embedding_model_name,
+            "params": params,
+        }
+        encoded = json.dumps(payload, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()[:32]
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    @contextlib.contextmanager
+    def build_lock(self, key: str):
+        """
+        Exclusive lock between processes building the entry for key (a no-op where fcntl is
+        missing). Holders should check load() again once they have it: another process may
+        have saved the entry meanwhile.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        with open(os.path.join(self.cache_dir, f".{key}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self, key: str, mmap_mode: str = None):
+        """
+        Load a cached entry.
+        :param key: Cache key from make_key()
+        :param mmap_mode: np.load mode for the embeddings; "r" maps the file instead of reading it
+        :return: (chunks, embeddings) tuple, or None on a cache miss
+        """
+        path = self.entry_path(key)
+        if not os.path.exists(os.path.join(path, "manifest.json")):
+            return None
+        try:
+            with open(os.path.join(path, "chunks.json"), encoding="utf-8") as f:
+                chunks = json.load(f)
+            embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode=mmap_mode)
+        except Exception as e:
+            logger.warning("Ignoring unreadable cache entry %s: %s", path, e)
+            return None
+        return chunks, embeddings
+
+    def save(self, key: str, chunks, embeddings, manifest: dict = None):
+        """
+        Write the chunks and their embeddings as a new cache entry.
+        The entry is assembled in a temporary directory and renamed into place,
+        so readers never observe a partially written entry.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix=f".{key}-", dir=self.cache_dir)
+        try:
+            with open(os.path.join(tmp_path, "chunks.json"), "w", encoding="utf-8") as f:
+                json.dump(chunks, f)
+            np.save(os.path.join(tmp_path, "embeddings.npy"), np.asarray(embeddings, dtype=np.float32))
+            # The manifest is written last: its presence marks the entry as complete
+            with open(os.path.join(tmp_path, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(dict(manifest or {}, key=key, created_at=time.time()), f, indent=2)
+
+            final_path = self.entry_path(key)
+            if os.path.exists(final_path):
+                shutil.rmtree(final_path)
+            os.replace(tmp_path, final_path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        logger.info("Knowledge base cached at %s", self.entry_path(key))
+
+
+def load_or_build_knowledge_base(pdf_path: str, indexer, cache: KnowledgeBaseCache = None,
+                                 footer_margin: int = 80, workers: int = None, doc_id: str = None,
+                                 chunk_size: int = 200, chunk_overlap: int = 30):
+    """
+    Add (or refresh) a PDF in the indexer, reusing a cached build when one exists.
+    Calling it again for a changed PDF replaces only that document; sections whose
+    text did not change keep their embeddings.
+    Sections are split into chunks (see utils.chunking) before they are embedded.
+    :param pdf_path: Path to the source PDF
+    :param indexer: FAISSIndexer to populate
+    :param cache: KnowledgeBaseCache to use (defaults to one under .kb_cache)
+    :param footer_margin: Height of the bottom band whose text blocks are dropped
+    :param workers: Worker processes used for page extraction (does not affect the cache key)
+    :param doc_id: Document ID in the index (defaults to the PDF file name without extension)
+    :param chunk_size: Maximum (estimated) tokens per chunk
+    :param chunk_overlap: Tokens of trailing context repeated at the start of the next chunk
+    :return: The list of chunks indexed for this document
+    """
+    cache = cache or KnowledgeBaseCache()
+    doc_id = doc_id or default_doc_id(pdf_path)
+    key = cache.make_key(pdf_path, indexer.embedding_model_name, footer_margin=footer_margin,
+                         chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    # Mapped rather than read: the native indexer keeps the vectors on disk
+    cached = cache.load(key, mmap_mode="r")
+    if cached is not None:
+        logger.info("Knowledge base cache hit for %s (key %s)", pdf_path, key)
+        chunks, embeddings = cached
+        indexer.add_document(doc_id, chunks, embeddings=embeddings)
+        return chunks
+
+    logger.info("Knowledge base cache miss for %s (key %s), rebuilding", pdf_path, key)
+    # PyMuPDF is only needed when the cache misses
+    from utils.pdf_ingest import ingest_pdf
+
+    sections = ingest_pdf(pdf_path, footer_margin=footer_margin, workers=workers)
+    chunks = chunk_sections(sections, chunk_size=chunk_size, overlap=chunk_overlap)
+    embeddings = indexer.add_document(doc_id, chunks)
+    cache.save(key, chunks, embeddings, manifest={
+        "pdf_path": os.path.abspath(pdf_path),
+        "doc_id": doc_id,
+        "embedding_model": indexer.embedding_model_name,
+        "footer_margin": footer_margin,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "num_sections": len(sections),
+        "num_chunks": len(chunks),
+    })
+    return chunks
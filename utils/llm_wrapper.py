@@ -1,28 +1,86 @@
-from groq import Groq
+import os
+import time
+
+from utils.chunking import estimate_tokens
+from utils.tracing import tracer
+
+DEFAULT_MODEL = "llama3-70b-8192"
+
 
 class LLMWrapper:
     """
     A wrapper around Groq-hosted LLaMA3 for generating answers.
     """
-    def __init__(self, api_key: str):
-        self.client = Groq(api_key=api_key) #
+    def __init__(self, api_key: str, timeout: float = 30.0, max_retries: int = 2,
+                 base_url: str = None, model: str = None):
+        """
+        :param timeout: Per-request timeout in seconds
+        :param max_retries: Retries (with backoff) on connection errors, 429 and 5xx responses
+        :param base_url: API root (default: LLM_BASE_URL, else Groq's), e.g. the local fake server
+                         of benchmarks/fake_llm_server.py for load tests
+        :param model: Model name (default: LLM_MODEL, else llama3-70b-8192)
+        """
+        from groq import Groq
+
+        self.model = model or os.getenv("LLM_MODEL", DEFAULT_MODEL)
+        self.client = Groq(api_key=api_key, base_url=base_url or os.getenv("LLM_BASE_URL") or None,
+                           timeout=timeout, max_retries=max_retries)
+
+    @staticmethod
+    def _messages(prompt: str):
+        return [
+            {"role": "system", "content": "You are a helpful assistant specializing in card management services."},
+            {"role": "user", "content": prompt}
+        ]
 
     def generate_answer(self, prompt: str) -> str:
         """
         Generate an answer from the LLaMA3 model.
         """
-        response = self.client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant specializing in card management services."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2,
-            max_tokens=500,
-        )
+        with tracer.span("llm_call", model=self.model):
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt),
+                temperature=0.2,
+                max_tokens=500,
+            )
+            if response.usage is not None:
+                tracer.record_tokens(response.usage.prompt_tokens, response.usage.completion_tokens)
 
         return response.choices[0].message.content.strip()
 
+    def stream_answer(self, prompt: str):
+        """
+        Generate an answer from the LLaMA3 model, yielding text fragments as they arrive.
+        The llm_call span covers the whole stream; time to the first fragment is recorded
+        separately as llm_first_token.
+        """
+        with tracer.span("llm_call", model=self.model, stream=True):
+            start = time.perf_counter()
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt),
+                temperature=0.2,
+                max_tokens=500,
+                stream=True,
+            )
+            usage = None
+            fragments = []
+            for chunk in stream:
+                # Groq reports usage on the last chunk under x_groq
+                x_groq = getattr(chunk, "x_groq", None)
+                if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                    usage = x_groq.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if not fragments:
+                        tracer.observe("llm_first_token", time.perf_counter() - start)
+                    fragments.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+            if usage is not None:
+                tracer.record_tokens(usage.prompt_tokens, usage.completion_tokens)
+            else:
+                tracer.record_tokens(estimate_tokens(prompt), estimate_tokens("".join(fragments)))
+
 
 
 
@@ -1,44 +1,178 @@
+# utils/logging_config.py
 
-import os
-from datetime import datetime
-
-# def setup_logging(log_dir='logs', level=logging.INFO):
-#     # Create timestamped log file name
-#     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-#     log_file = os.path.join(log_dir, f"app_{timestamp}.log")
-
-#     # Ensure log directory exists
-#     os.makedirs(log_dir, exist_ok=True)
-
-#     # Configure logging
-#     logging.basicConfig(
-#         level=level,
-#         format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-#         handlers=[
-#             logging.FileHandler(log_file, mode='w'),
-#             logging.StreamHandler()
-#         ]
-#     )
-    
-        
+"""
+Logging setup: records are handed to a queue on the request path and written by a
+background listener thread, as JSON lines to a size-rotated file and as text to the console.
+High-volume debug events are rate-limited per call site.
+"""
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from utils.tracing import current_request_id
+
+_listener = None
+_setup_lock = threading.Lock()
+
+# LogRecord attributes that are not user-supplied "extra" fields
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "suppressed"}
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamps records with the ID of the request being traced (utils.tracing) in the logging
+    thread, before the record crosses to the writer thread where the context is lost.
+    """
+
+    def filter(self, record):
+        record.request_id = current_request_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Token-bucket rate limit per call site (logger, level and message template) for records at
+    or below 'max_level': a call site may emit 'burst' records at once and 'rate' per second
+    on average; the rest are dropped, and the next record let through carries the number of
+    records suppressed in between.
+    """
+
+    def __init__(self, rate: float = 10.0, burst: int = 20, max_level: int = logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.suppressed_total = 0
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+        key = (record.name, record.levelno, record.msg if isinstance(record.msg, str) else type(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, suppressed = self._buckets.get(key, (self.burst, now, 0))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, suppressed + 1)
+                self.suppressed_total += 1
+                return False
+            self._buckets[key] = (tokens - 1, now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: timestamp, level, logger, message, request_id, any "extra"
+    fields passed to the logging call, and the exception text if there is one.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread. The stdlib prepare() runs the
+    handler's formatter on the calling thread and flattens the traceback into the message;
+    here only the message arguments are merged (they may change once the call returns) and
+    exc_info is kept for the listener's formatters. The queue is in-process, so nothing needs
+    to be picklable.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        return f"{text} [request {request_id}]" if request_id else text
+
+
+def setup_logging(log_dir='logs', level=None, max_bytes=10 * 2 ** 20, backup_count=5,
+                  sample_rate=None, sample_burst=20):
+    """
+    Route the root logger through a queue to a background writer thread. Safe to call on
+    every Streamlit rerun: only the first call configures anything.
+
+    :param level: Root level (default: LOG_LEVEL env var, else INFO)
+    :param max_bytes: Size at which the log file is rotated
+    :param backup_count: Rotated files kept (app.log.1 ... app.log.N)
+    :param sample_rate: Debug records per second allowed per call site (default: LOG_SAMPLE_RATE env var, else 10)
+    :return: The QueueListener
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+
+        level = level or os.getenv("LOG_LEVEL", "INFO").upper()
+        if sample_rate is None:
+            sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "10"))
+        os.makedirs(log_dir, exist_ok=True)
+        log_file = os.path.join(log_dir, "app.log")
+
+        file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                                            encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(_TextFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+        # The request path only pays for the filters, merging the message arguments and a queue
+        # put; formatting (timestamps, JSON, tracebacks) and I/O happen on the listener thread
+        queue_handler = _DeferredQueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(RequestIdFilter())
+        queue_handler.addFilter(SamplingFilter(rate=sample_rate, burst=sample_burst))
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(queue_handler)
+        _listener = logging.handlers.QueueListener(queue_handler.queue, file_handler, console_handler,
+                                                   respect_handler_level=True)
+        _listener.start()
+        # Flush what is still queued when the process exits
+        atexit.register(shutdown_logging)
+
+    logging.info("Logging to %s", log_file)
+    return _listener
+
 
-def setup_logging(log_dir='logs', level=logging.INFO):
-    # Configure the root logger
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    log_file = os.path.join(log_dir, f"app_{timestamp}.log")
-    
-    os.makedirs(log_dir, exist_ok=True)
-    
-    logging.basicConfig(level=logging.INFO, filename=log_file, filemode="a",
-                        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-
-    # Optional: Add a console handler for debugging
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
-
-    # Add the console handler to the root logger
-    logging.getLogger().addHandler(console_handler)
-
-    logging.info(f"Log file created: {log_file}")
+def shutdown_logging():
+    """
+    Write out the queued records and stop the listener thread.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
@@ -0,0 +1,507 @@
+# utils/native_index.py
+
+"""
+NativeFAISSIndexer: Retrieval backend that calls sentence-transformers and faiss directly,
+without LangChain. Vectors are L2-normalized and searched by inner product (cosine similarity),
+the faiss index type is selectable (flat, IVF, HNSW, PQ, SQ8), chunk metadata is kept in
+compact parallel arrays instead of one Document object per chunk, and the full-precision
+vectors stay on disk, so a quantized index keeps its memory savings.
+
+It is a drop-in replacement for FAISSIndexer: same document API, same search() contract.
+"""
+import contextlib
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import weakref
+from array import array
+
+import numpy as np
+
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "pq", "sq8")
+# faiss wants ~39 training points per centroid: 8-bit PQ codebooks (256 centroids) need this many
+# vectors, smaller corpora get an 'sq8' index instead (also compressed, needs no codebook training)
+MIN_PQ_TRAINING_POINTS = 39 * 256
+
+
+class SentenceTransformerEmbeddings:
+    """
+    Minimal embeddings object with the embed_documents / embed_query interface of the
+    LangChain embeddings, returning L2-normalized vectors.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", device: str = "cpu", batch_size: int = 64):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device=device)
+
+    def encode(self, texts) -> np.ndarray:
+        """
+        Encode texts into a float32 matrix, one normalized row per text.
+        """
+        return self.model.encode(list(texts), batch_size=self.batch_size, normalize_embeddings=True,
+                                 convert_to_numpy=True, show_progress_bar=False).astype(np.float32, copy=False)
+
+    def embed_documents(self, texts):
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str):
+        return self.encode([text])[0].tolist()
+
+
+def _normalized(vectors) -> np.ndarray:
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class _RowStore:
+    """
+    Text and metadata of the index rows in compact parallel arrays, indexed by row id (the faiss
+    label). Rows are only appended; a removed row's text is dropped at once and its slot is
+    reclaimed by the next full rebuild, which copies the live rows into a new store.
+    """
+
+    def __init__(self):
+        self.texts = []
+        # (doc_id, section_title) per section id
+        self.sections = []
+        self._section_lookup = {}
+        self.section_ids = array("i")
+        self.chunk_index = array("i")
+        self.start_page = array("i")
+        self.end_page = array("i")
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _append(self, section: tuple, text: str, chunk_index, start_page, end_page) -> int:
+        if section not in self._section_lookup:
+            self._section_lookup[section] = len(self.sections)
+            self.sections.append(section)
+        self.section_ids.append(self._section_lookup[section])
+        self.texts.append(text)
+        self.chunk_index.append(-1 if chunk_index is None else chunk_index)
+        self.start_page.append(-1 if start_page is None else start_page)
+        self.end_page.append(-1 if end_page is None else end_page)
+        return len(self.texts) - 1
+
+    def extend(self, doc_id: str, chunks) -> np.ndarray:
+        """
+        Append the chunks of a document.
+        :return: Their row ids
+        """
+        return np.array([self._append((doc_id, chunk['title']), chunk['text'], chunk.get("chunk_index"),
+                                      chunk.get("start_page"), chunk.get("end_page")) for chunk in chunks],
+                        dtype=np.int64)
+
+    def copy_rows(self, other: "_RowStore", rows) -> np.ndarray:
+        """
+        Append rows of another store.
+        :return: Their row ids in this store
+        """
+        return np.array([self._append(other.sections[other.section_ids[row]], other.texts[row],
+                                      other.chunk_index[row], other.start_page[row], other.end_page[row])
+                         for row in rows], dtype=np.int64)
+
+    def clear(self, rows):
+        for row in rows:
+            self.texts[row] = None
+
+    def hit(self, row: int, score: float):
+        """
+        :return: The hit for a row, or None if the row was removed meanwhile
+        """
+        text = self.texts[row]
+        if text is None:
+            return None
+        doc_id, title = self.sections[self.section_ids[row]]
+        chunk_index, start_page, end_page = self.chunk_index[row], self.start_page[row], self.end_page[row]
+        return {
+            "doc_id": doc_id,
+            "section_title": title,
+            "chunk_index": None if chunk_index < 0 else chunk_index,
+            "start_page": None if start_page < 0 else start_page,
+            "end_page": None if end_page < 0 else end_page,
+            "text": text,
+            "score": score,
+        }
+
+
+class _IndexSnapshot:
+    """
+    A built faiss index (labelled with row ids) and the row store its labels refer to.
+    The index is never modified after construction.
+    """
+
+    def __init__(self, index, version: int, store: _RowStore = None, index_type: str = None, trained_rows: int = 0):
+        self.index = index
+        self.version = version
+        self.store = store if store is not None else _RowStore()
+        self.index_type = index_type
+        # Rows the index was trained (or first built) with
+        self.trained_rows = trained_rows
+
+
+class NativeFAISSIndexer:
+    """
+    Index knowledge base chunks with faiss, using cosine similarity on normalized vectors.
+    Documents can be added, replaced and removed; the changes are applied on the first search
+    after them. Process memory holds only the faiss index and one compact store of texts and
+    metadata: each document's float32 vectors stay in a memory-mapped file (the knowledge
+    base cache entry they were loaded from, or one written to vector_dir), read again when
+    the index has to be retrained.
+    """
+
+    def __init__(self, embedding_model_name: str = "all-MiniLM-L6-v2", index_type: str = "flat",
+                 nlist: int = 256, nprobe: int = 16, hnsw_m: int = 32, ef_search: int = 64,
+                 pq_m: int = 48, embeddings=None, vector_dir: str = None):
+        """
+        :param embedding_model_name: SentenceTransformer model name or local path
+        :param index_type: One of INDEX_TYPES. 'flat' is exact; 'ivf' and 'hnsw' are approximate;
+                           'pq' (IVF + product quantization) and 'sq8' (8-bit scalar quantization)
+                           also compress the stored vectors ('pq' needs MIN_PQ_TRAINING_POINTS
+                           vectors and builds 'sq8' on smaller corpora)
+        :param nlist: Maximum number of IVF cells (capped by the corpus size)
+        :param nprobe: IVF cells visited per query
+        :param hnsw_m: HNSW graph degree
+        :param ef_search: HNSW search breadth
+        :param pq_m: PQ sub-quantizers (bytes per vector); must divide the embedding dimension
+        :param embeddings: Embeddings object to use instead of loading the model
+        :param vector_dir: Directory for the vectors of documents not added from a memory-mapped
+                           cache entry (a temporary directory, removed with the indexer, by default)
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+        self.embedding_model_name = embedding_model_name
+        self.embeddings = embeddings or SentenceTransformerEmbeddings(embedding_model_name)
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.vector_dir = vector_dir
+        # doc_id -> {"rows": row ids in the store, "vectors": memory-mapped matrix, "file": path we own or None}
+        self.documents = {}
+        # Incremented on every change to the indexed content; lets caches detect stale entries
+        self.version = 0
+        self._store = _RowStore()
+        # Changes not applied to the faiss index yet
+        self._added = set()
+        self._removed = []
+        self._snapshot = _IndexSnapshot(None, -1)
+        self._lock = threading.Lock()
+
+    @property
+    def index(self):
+        """
+        The faiss index of the last build (None if nothing is indexed).
+        """
+        return self._snapshot.index
+
+    @staticmethod
+    def _content_hash(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def build_faiss_index(self, chunks, doc_id: str = "default"):
+        """
+        Index the chunks as the only document.
+        :return: The faiss index
+        """
+        logger.info("Building %s faiss index with %d chunks", self.index_type, len(chunks))
+        for previous in list(self.documents):
+            self.remove_document(previous)
+        self.add_document(doc_id, chunks)
+        self._ensure_index()
+        return self.index
+
+    def _vector_file(self) -> str:
+        if self.vector_dir is None:
+            self.vector_dir = tempfile.mkdtemp(prefix="native-index-")
+            weakref.finalize(self, shutil.rmtree, self.vector_dir, True)
+        os.makedirs(self.vector_dir, exist_ok=True)
+        return os.path.join(self.vector_dir, f"{uuid.uuid4().hex}.npy")
+
+    def _map_vectors(self, vectors):
+        """
+        Memory-map a document's normalized vectors.
+        :return: (matrix, path of the file written for it or None)
+        """
+        if isinstance(vectors, np.memmap) and vectors.dtype == np.float32 and vectors.ndim == 2 and \
+                np.allclose(np.linalg.norm(vectors, axis=1), 1, atol=1e-3):
+            # Already normalized on disk (a knowledge base cache entry): used in place
+            return vectors, None
+        path = self._vector_file()
+        np.save(path, _normalized(vectors))
+        return np.load(path, mmap_mode="r"), path
+
+    def add_document(self, doc_id: str, chunks, embeddings=None):
+        """
+        Add a document's chunks to the index, replacing the document if the ID is already indexed.
+        Only chunks whose text is not already embedded for this document are sent to the model.
+        :param embeddings: Optional precomputed embeddings, one row per chunk; a normalized
+                           float32 np.memmap (KnowledgeBaseCache.load(key, mmap_mode="r")) is
+                           used without copying
+        :return: The document's (normalized) embedding matrix, memory-mapped
+        """
+        if embeddings is not None:
+            if len(embeddings) != len(chunks):
+                raise ValueError(f"Got {len(embeddings)} embeddings for {len(chunks)} chunks of '{doc_id}'")
+            vectors = embeddings
+        else:
+            hashes = [self._content_hash(chunk['text']) for chunk in chunks]
+            known = {}
+            with self._lock:
+                previous = self.documents.get(doc_id)
+                if previous is not None:
+                    known = {self._content_hash(self._store.texts[row]): i
+                             for i, row in enumerate(previous["rows"])}
+                    previous_vectors = previous["vectors"]
+            missing = [i for i, h in enumerate(hashes) if h not in known]
+            logger.info("Document '%s': embedding %d of %d chunks", doc_id, len(missing), len(chunks))
+            new_vectors = (_normalized(self.embeddings.embed_documents([chunks[i]['text'] for i in missing]))
+                           if missing else None)
+            if chunks:
+                vectors = np.empty((len(chunks), (new_vectors if missing else previous_vectors).shape[1]),
+                                   dtype=np.float32)
+                for i, h in enumerate(hashes):
+                    if h in known:
+                        vectors[i] = previous_vectors[known[h]]
+                if missing:
+                    vectors[missing] = new_vectors
+
+        if len(chunks):
+            vectors, path = self._map_vectors(vectors)
+        else:
+            vectors, path = np.empty((0, 0), dtype=np.float32), None
+
+        with self._lock:
+            self._drop(doc_id)
+            self.documents[doc_id] = {"rows": self._store.extend(doc_id, chunks), "vectors": vectors, "file": path}
+            self._added.add(doc_id)
+            self.version += 1
+        return vectors
+
+    def update_document(self, doc_id: str, chunks, embeddings=None):
+        """
+        Replace a document's chunks. Alias of add_document() kept for readability at call sites.
+        """
+        return self.add_document(doc_id, chunks, embeddings)
+
+    def remove_document(self, doc_id: str):
+        """
+        Remove all chunks of a document from the index.
+        :return: True if the document was indexed
+        """
+        with self._lock:
+            previous = self._drop(doc_id)
+            if previous is None:
+                return False
+            self.version += 1
+        logger.info("Removed document '%s' (%d chunks)", doc_id, len(previous["rows"]))
+        return True
+
+    def _drop(self, doc_id: str):
+        """
+        Forget a document (caller holds the lock). Its rows leave the index on the next build;
+        searches still using the current one skip them from now on.
+        :return: The removed document entry, or None
+        """
+        previous = self.documents.pop(doc_id, None)
+        if previous is None:
+            return None
+        self._store.clear(previous["rows"])
+        self._removed.append(previous["rows"])
+        self._added.discard(doc_id)
+        if previous["file"]:
+            # Where mapped files cannot be deleted (Windows), the temporary directory is cleaned up later
+            with contextlib.suppress(OSError):
+                os.remove(previous["file"])
+        return previous
+
+    def document_embeddings(self, doc_id: str):
+        """
+        Return the (memory-mapped) embedding matrix of an indexed document.
+        """
+        return self.documents[doc_id]["vectors"]
+
+    def _effective_index_type(self, count: int) -> str:
+        if self.index_type == "pq" and count < MIN_PQ_TRAINING_POINTS:
+            return "sq8"
+        return self.index_type
+
+    def _new_index(self, index_type: str, dim: int, count: int):
+        import faiss
+
+        metric = faiss.METRIC_INNER_PRODUCT
+        # Non-IVF indexes are wrapped so that rows are labelled with their row store ids
+        if index_type == "flat":
+            return faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+        if index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, self.hnsw_m, metric)
+            index.hnsw.efSearch = self.ef_search
+            return faiss.IndexIDMap(index)
+        if index_type == "sq8":
+            return faiss.IndexIDMap(faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, metric))
+
+        # IVF variants: faiss wants roughly 39 training points per cell
+        nlist = max(1, min(self.nlist, count // 39))
+        if index_type == "ivf":
+            description = f"IVF{nlist},Flat"
+        else:
+            if dim % self.pq_m:
+                raise ValueError(f"pq_m={self.pq_m} does not divide the embedding dimension {dim}")
+            description = f"IVF{nlist},PQ{self.pq_m}x8"
+        index = faiss.index_factory(dim, description, metric)
+        ivf = faiss.downcast_index(faiss.extract_index_ivf(index))
+        ivf.nprobe = min(self.nprobe, nlist)
+        if index_type == "pq":
+            # Polysemous training only speeds up Hamming-filtered search, which is not used,
+            # and makes training orders of magnitude slower
+            ivf.do_polysemous_training = False
+        return index
+
+    def _needs_rebuild(self, index_type: str, live: int) -> bool:
+        snapshot = self._snapshot
+        if snapshot.index is None or snapshot.index_type != index_type:
+            return True
+        if index_type == "hnsw" and self._removed:
+            # HNSW graphs do not support removal
+            return True
+        if index_type in ("ivf", "pq", "sq8") and live > 2 * snapshot.trained_rows:
+            # Trained on a much smaller corpus: the centroids / quantizer ranges no longer fit
+            return True
+        # Reclaim the store slots of removed rows once they outnumber the live ones
+        return len(self._store) - live > live
+
+    def _training_sample(self, documents, count: int) -> np.ndarray:
+        # faiss samples at most 256 points per centroid anyway: read no more than that from disk
+        limit = max(MIN_PQ_TRAINING_POINTS, 256 * self.nlist)
+        if count <= limit:
+            return np.concatenate([np.asarray(doc["vectors"]) for doc in documents])
+        picks = np.sort(np.random.default_rng(0).choice(count, limit, replace=False))
+        sample, offset = [], 0
+        for doc in documents:
+            size = len(doc["rows"])
+            local = picks[(picks >= offset) & (picks < offset + size)] - offset
+            sample.append(np.asarray(doc["vectors"][local]))
+            offset += size
+        return np.concatenate(sample)
+
+    def _ensure_index(self):
+        """
+        Apply the document changes since the last build to the faiss index: added rows are
+        inserted into a copy of the index and removed ones deleted from it, without retraining.
+        The index is rebuilt from the documents' vectors on disk only when _needs_rebuild says so.
+        :return: The current _IndexSnapshot
+        """
+        if self._snapshot.version == self.version:
+            return self._snapshot
+        with self._lock:
+            if self._snapshot.version == self.version:
+                return self._snapshot
+            version = self.version
+            documents = [doc for doc in self.documents.values() if len(doc["rows"])]
+            live = sum(len(doc["rows"]) for doc in documents)
+            if not documents:
+                self._store = _RowStore()
+                self._added, self._removed = set(), []
+                self._snapshot = _IndexSnapshot(None, version)
+                return self._snapshot
+
+            index_type = self._effective_index_type(live)
+            if self._needs_rebuild(index_type, live):
+                self._snapshot = self._rebuild(index_type, version, live)
+            else:
+                self._snapshot = self._apply_changes(version)
+            self._added, self._removed = set(), []
+            return self._snapshot
+
+    def _apply_changes(self, version: int) -> _IndexSnapshot:
+        import faiss
+
+        previous = self._snapshot
+        added = [self.documents[doc_id] for doc_id in self._added if len(self.documents[doc_id]["rows"])]
+        with tracer.span("index_update", index_type=previous.index_type,
+                         rows=sum(len(doc["rows"]) for doc in added)):
+            # Searches keep using the previous index while the copy is updated
+            index = faiss.clone_index(previous.index)
+            if self._removed:
+                index.remove_ids(np.concatenate(self._removed))
+            for doc in added:
+                index.add_with_ids(np.ascontiguousarray(doc["vectors"]), doc["rows"])
+        logger.info("Updated %s faiss index: %d vectors", previous.index_type, index.ntotal)
+        return _IndexSnapshot(index, version, self._store, previous.index_type, previous.trained_rows)
+
+    def _rebuild(self, index_type: str, version: int, live: int) -> _IndexSnapshot:
+        if index_type != self.index_type:
+            logger.info("Only %d vectors, fewer than the %d needed to train PQ codebooks: building 'sq8' instead",
+                        live, MIN_PQ_TRAINING_POINTS)
+        # Live rows are copied into a new store: the previous snapshot keeps the old one
+        store = _RowStore()
+        for doc_id, doc in self.documents.items():
+            doc["rows"] = store.copy_rows(self._store, doc["rows"])
+        self._store = store
+        documents = [doc for doc in self.documents.values() if len(doc["rows"])]
+
+        dim = documents[0]["vectors"].shape[1]
+        with tracer.span("index_build", index_type=index_type, rows=live):
+            index = self._new_index(index_type, dim, live)
+            if not index.is_trained:
+                index.train(self._training_sample(documents, live))
+            for doc in documents:
+                index.add_with_ids(np.ascontiguousarray(doc["vectors"]), doc["rows"])
+
+        logger.info("Built %s faiss index: %d vectors from %d documents", index_type, live, len(documents))
+        return _IndexSnapshot(index, version, store, index_type, live)
+
+    def search_chunks_by_vectors(self, query_vectors, top_k: int = 6):
+        """
+        Search many queries at once with a single faiss matrix query.
+        :param query_vectors: Array-like of shape (n_queries, dim)
+        :return: One list of hits (as returned by search_chunks) per query
+        """
+        snapshot = self._ensure_index()
+        if snapshot.index is None:
+            logger.error("Index is empty. Call build_faiss_index() or add_document() first.")
+            raise ValueError("Index not built. Please run build_faiss_index() before searching.")
+        with tracer.span("faiss_search", top_k=top_k):
+            scores, rows = snapshot.index.search(_normalized(query_vectors), top_k)
+            results = []
+            for row_scores, row_ids in zip(scores, rows):
+                hits = (snapshot.store.hit(int(row), float(score)) for score, row in zip(row_scores, row_ids)
+                        if row >= 0)
+                results.append([hit for hit in hits if hit is not None])
+            return results
+
+    def search_chunks(self, query: str, top_k: int = 6):
+        """
+        Semantic search returning structured hits, best first.
+        :return: List of dicts with 'text', 'score' (cosine similarity, higher is closer) and the chunk metadata
+        """
+        with tracer.span("embedding"):
+            vector = self.embeddings.embed_query(query)
+        hits = self.search_chunks_by_vectors([vector], top_k=top_k)[0]
+        logger.debug("Search for '%s' returned %d chunks", query, len(hits))
+        return hits
+
+    def search(self, query: str, top_k: int = 3):
+        """
+        Perform semantic search over the index.
+        :param query: Query string
+        :param top_k: Number of results to return
+        :return: The section titles and texts of the hits, one per line
+        """
+        hits = self.search_chunks(query, top_k=top_k)
+        return "".join(hit['section_title'] + "  " + hit['text'] + "\n" for hit in hits)
@@ -0,0 +1,237 @@
+# utils/pdf_ingest.py
+
+"""
+Single-pass PDF ingestion: extracts each page's text blocks once with PyMuPDF,
+drops footer blocks by their coordinates and slices the text into sections.
+Replaces the clean_pdf -> extract_sections_by_toc chain, which wrote an
+intermediate redacted PDF and parsed every page twice with pdfplumber.
+"""
+import logging
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+from utils.extract_sections import parse_toc_lines
+
+logger = logging.getLogger(__name__)
+
+
+def extract_page_text(page, footer_margin: int = 80) -> str:
+    """
+    Extract the text of a page, skipping blocks that reach into the bottom 'footer_margin'.
+    """
+    footer_threshold = page.rect.height - footer_margin
+    parts = []
+    for x0, y0, x1, y1, text, _block_no, block_type in page.get_text("blocks", sort=True):
+        text = text.strip()
+        # block_type 1 is an image block
+        if block_type != 0 or not text:
+            continue
+        if y1 > footer_threshold:
+            logger.debug("Skipping footer block: \"%s\" (Y1: %.2f)", text, y1)
+            continue
+        parts.append(text)
+    # Blank lines keep block (paragraph / table cell) boundaries visible to the chunker
+    return "\n\n".join(parts)
+
+
+def extract_page_range(pdf_path: str, start_idx: int, end_idx: int, footer_margin: int = 80):
+    """
+    Process-pool worker: open a private document handle and extract pages [start_idx, end_idx).
+    Returns the page texts in order.
+    """
+    with fitz.open(pdf_path) as doc:
+        return [extract_page_text(doc[i], footer_margin) for i in range(start_idx, end_idx)]
+
+
+def iter_page_texts_parallel(executor, pdf_path: str, first_page: int, num_pages: int,
+                             footer_margin: int = 80, pages_per_task: int = 16, max_in_flight: int = None):
+    """
+    Extract pages on an executor and yield (page_idx, text) in page order.
+    At most 'max_in_flight' page ranges are outstanding at once, so memory stays bounded
+    by the window rather than by the document size.
+    """
+    if max_in_flight is None:
+        max_in_flight = 2 * (getattr(executor, "_max_workers", None) or os.cpu_count() or 1)
+    in_flight = deque()
+
+    def drain_one():
+        start_idx, future = in_flight.popleft()
+        for offset, text in enumerate(future.result()):
+            yield start_idx + offset, text
+
+    for start_idx in range(first_page, num_pages, pages_per_task):
+        end_idx = min(start_idx + pages_per_task, num_pages)
+        in_flight.append((start_idx, executor.submit(extract_page_range, pdf_path, start_idx, end_idx, footer_margin)))
+        if len(in_flight) >= max_in_flight:
+            yield from drain_one()
+    while in_flight:
+        yield from drain_one()
+
+
+def find_toc_entries(doc, page_text):
+    """
+    Determine the (title, page_number) entries that start each section.
+    Uses the PDF outline when one exists, otherwise parses the printed "Contents" page.
+    :param doc: Open fitz document
+    :param page_text: Callable returning the extracted text for a 0-based page index
+    """
+    outline = [(title.strip(), page) for _level, title, page, *_ in doc.get_toc() if page > 0]
+    if outline:
+        logger.info("Using PDF outline with %d entries", len(outline))
+        return sorted(outline, key=lambda entry: entry[1])
+
+    for i in range(len(doc)):
+        text = page_text(i)
+        if re.search(r'\bContents\b', text):
+            logger.info("Parsing printed Table of Contents on page %d", i + 1)
+            return parse_toc_lines(text)
+    raise RuntimeError("Table of Contents page not found")
+
+
+def section_ranges(toc, num_pages):
+    """
+    Turn TOC entries into (title, start_idx, end_idx) tuples of 0-based, inclusive page indices.
+    A section ends one page before the next one starts, as in extract_sections_by_toc.
+    """
+    ranges = []
+    for idx, (title, pg) in enumerate(toc):
+        start_idx = min(pg - 1, num_pages - 1)
+        if idx + 1 < len(toc):
+            end_idx = min(toc[idx + 1][1] - 2, num_pages - 1)
+        else:
+            end_idx = num_pages - 1
+        ranges.append((title, start_idx, end_idx))
+    return ranges
+
+
+def assemble_sections(ranges, page_stream):
+    """
+    Stream section records from page texts delivered in page order.
+    Only pages still needed by a pending section are kept in memory.
+    :param ranges: Output of section_ranges()
+    :param page_stream: Iterable of (page_idx, text) in ascending page order
+    """
+    pending = deque(ranges)
+    buffer = {}
+
+    def flush(upto):
+        while pending and pending[0][2] <= upto:
+            title, start_idx, end_idx = pending.popleft()
+            sec_text = "\n\n".join(buffer[p] for p in range(start_idx, end_idx + 1) if buffer.get(p))
+            yield {
+                "title": title,
+                "start_page": start_idx + 1,
+                "end_page": end_idx + 1,
+                "text": sec_text.strip(),
+            }
+        keep_from = pending[0][1] if pending else float("inf")
+        for p in [p for p in buffer if p < keep_from]:
+            del buffer[p]
+
+    for page_idx, text in page_stream:
+        buffer[page_idx] = text
+        yield from flush(page_idx)
+    yield from flush(float("inf"))
+
+
+def iter_sections(pdf_path: str, footer_margin: int = 80, executor=None, pages_per_task: int = 16):
+    """
+    Ingest a PDF in one pass and yield section dicts with keys: title, start_page, end_page, text.
+    :param executor: Optional concurrent.futures executor; when given, page ranges of
+                     'pages_per_task' pages are extracted on it and merged back in page order
+    """
+    page_cache = {}
+    with fitz.open(pdf_path) as doc:
+        def page_text(i):
+            if i not in page_cache:
+                page_cache[i] = extract_page_text(doc[i], footer_margin)
+            return page_cache[i]
+
+        toc = find_toc_entries(doc, page_text)
+        num_pages = len(doc)
+        logger.info("Ingesting %s: %d pages, %d sections", pdf_path, num_pages, len(toc))
+        ranges = section_ranges(toc, num_pages)
+        if not ranges:
+            return
+
+        first_page = min(start_idx for _title, start_idx, _end_idx in ranges)
+        if executor is not None:
+            page_cache.clear()
+            yield from assemble_sections(ranges, iter_page_texts_parallel(
+                executor, pdf_path, first_page, num_pages, footer_margin, pages_per_task))
+            return
+
+        def page_stream():
+            for i in range(first_page, num_pages):
+                # Pages read while looking for the TOC are not extracted again
+                text = page_cache.pop(i) if i in page_cache else extract_page_text(doc[i], footer_margin)
+                yield i, text
+
+        yield from assemble_sections(ranges, page_stream())
+
+
+def ingest_pdf(pdf_path: str, footer_margin: int = 80, workers: int = None):
+    """
+    Ingest a PDF and return the list of section dicts.
+    :param workers: Number of worker processes; None or 1 extracts pages in-process
+    """
+    if not workers or workers <= 1:
+        return list(iter_sections(pdf_path, footer_margin))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(iter_sections(pdf_path, footer_margin, executor=executor))
+
+
+def ingest_corpus(pdf_paths, footer_margin: int = 80, workers: int = None, pages_per_task: int = 16):
+    """
+    Ingest several PDFs, sharing one process pool across all of them.
+    Yields (pdf_path, section) pairs in document order and, within a document, in page order,
+    so the output is identical whatever the worker count.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for pdf_path in pdf_paths:
+            for section in iter_sections(pdf_path, footer_margin, executor=executor,
+                                         pages_per_task=pages_per_task):
+                yield pdf_path, section
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from utils.clean_pdf import clean_pdf
+    from utils.extract_sections import extract_sections_by_toc
+
+    parser = argparse.ArgumentParser(description="Compare legacy and single-pass PDF ingestion")
+    parser.add_argument("pdf_path", nargs="?", default="global_card_access_user_guide.pdf")
+    parser.add_argument("--footer-margin", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    def best_of(fn):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings), result
+
+    legacy_time, legacy = best_of(
+        lambda: extract_sections_by_toc(clean_pdf(args.pdf_path, footer_margin=args.footer_margin))
+    )
+    single_time, single = best_of(lambda: ingest_pdf(args.pdf_path, args.footer_margin))
+
+    print(f"legacy clean_pdf + extract_sections_by_toc: {legacy_time * 1000:8.1f} ms, {len(legacy)} sections")
+    print(f"single-pass ingest_pdf:                     {single_time * 1000:8.1f} ms, {len(single)} sections")
+    print(f"speedup: {legacy_time / single_time:.1f}x")
+    if args.workers > 1:
+        parallel_time, parallel = best_of(lambda: ingest_pdf(args.pdf_path, args.footer_margin, args.workers))
+        print(f"parallel ingest_pdf, {args.workers} workers:      {parallel_time * 1000:8.1f} ms, "
+              f"identical output: {parallel == single}")
+    same_ranges = [(s["title"], s["start_page"], s["end_page"]) for s in legacy] == \
+        [(s["title"], s["start_page"], s["end_page"]) for s in single]
+    print(f"identical section boundaries: {same_ranges}")
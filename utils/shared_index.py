@@ -0,0 +1,366 @@
+# utils/shared_index.py
+
+"""
+Shared read-only knowledge index for multi-worker deployments. The chunk vectors, chunk texts
+and chunk metadata are published once as memory-mapped files; every worker process maps the
+same files, so their pages live once in the OS page cache instead of once per process, and a
+worker's private memory no longer grows with the corpus.
+
+Layout of <root>/:
+    CURRENT                 name of the live version (replaced atomically)
+    <version>/manifest.json embedding model and backend, dimension, row count; written last
+    <version>/vectors.npy   float32 (rows, dim), L2-normalized
+    <version>/texts.bin     UTF-8 chunk texts back to back
+    <version>/offsets.npy   int64 (rows + 1) byte offsets of each text in texts.bin
+    <version>/rows.npy      int32 (rows, 4): section id, chunk index, start page, end page (-1 = none)
+    <version>/sections.json [doc_id, section title] per section id
+
+Publish a new version (workers pick it up within their check interval, queries keep running):
+
+    python -m utils.shared_index /srv/cardassist/index global_card_access_user_guide.pdf
+"""
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from utils.faiss_indexer import embedding_model_key, split_embedding_model_key
+from utils.kb_cache import KnowledgeBaseCache, default_doc_id, load_or_build_knowledge_base
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+POINTER_FILE = "CURRENT"
+
+
+def _normalized(vectors) -> np.ndarray:
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def current_version(root_dir: str):
+    """
+    :return: Name of the live version, or None if nothing was published yet
+    """
+    try:
+        with open(os.path.join(root_dir, POINTER_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+@contextlib.contextmanager
+def publish_lock(root_dir: str):
+    """
+    Exclusive lock between processes publishing into root_dir (a no-op where fcntl is missing).
+    """
+    os.makedirs(root_dir, exist_ok=True)
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(os.path.join(root_dir, ".publish.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def publish_shared_index(root_dir: str, documents, embedding_model_name: str, embedding_backend: str = "torch",
+                         keep: int = 3) -> str:
+    """
+    Write a new index version and make it the live one.
+    The version is assembled in a temporary directory and renamed into place, then the
+    pointer file is replaced, so readers only ever see complete versions.
+    :param documents: Iterable of (doc_id, chunks, embeddings) - chunks as produced by chunk_sections
+    :param embedding_model_name: Model the vectors were computed with (name or path, recorded in the manifest)
+    :param embedding_backend: Embedding backend of the vectors ("torch" or one from utils.fast_embeddings)
+    :param keep: Versions kept on disk, including the new one (workers may still map older ones)
+    :return: The new version name
+    """
+    matrices, texts, rows, sections, section_lookup = [], [], [], [], {}
+    for doc_id, chunks, embeddings in documents:
+        if not len(chunks):
+            continue
+        matrices.append(_normalized(embeddings))
+        for chunk in chunks:
+            key = (doc_id, chunk['title'])
+            if key not in section_lookup:
+                section_lookup[key] = len(sections)
+                sections.append(key)
+            texts.append(chunk['text'])
+            rows.append((section_lookup[key],
+                         -1 if chunk.get("chunk_index") is None else chunk["chunk_index"],
+                         -1 if chunk.get("start_page") is None else chunk["start_page"],
+                         -1 if chunk.get("end_page") is None else chunk["end_page"]))
+    if not matrices:
+        raise ValueError("Nothing to publish: no document has chunks")
+    matrix = np.concatenate(matrices)
+
+    digest = hashlib.sha256(matrix.tobytes())
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+    version = f"v{time.strftime('%Y%m%d-%H%M%S')}-{digest.hexdigest()[:8]}"
+
+    os.makedirs(root_dir, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=f".{version}-", dir=root_dir)
+    try:
+        np.save(os.path.join(tmp_path, "vectors.npy"), matrix)
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        with open(os.path.join(tmp_path, "texts.bin"), "wb") as f:
+            for i, text in enumerate(texts):
+                encoded = text.encode("utf-8")
+                f.write(encoded)
+                offsets[i + 1] = offsets[i] + len(encoded)
+        np.save(os.path.join(tmp_path, "offsets.npy"), offsets)
+        np.save(os.path.join(tmp_path, "rows.npy"), np.asarray(rows, dtype=np.int32).reshape(-1, 4))
+        with open(os.path.join(tmp_path, "sections.json"), "w", encoding="utf-8") as f:
+            json.dump(sections, f)
+        # The manifest is written last: its presence marks the version as complete
+        with open(os.path.join(tmp_path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"format_version": FORMAT_VERSION, "version": version, "embedding_model": embedding_model_name,
+                       "embedding_backend": embedding_backend, "dim": int(matrix.shape[1]), "rows": int(matrix.shape[0]), "created_at": time.time()},
+                      f, indent=2)
+        final_path = os.path.join(root_dir, version)
+        if os.path.exists(final_path):
+            shutil.rmtree(final_path)
+        os.replace(tmp_path, final_path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    pointer_tmp = os.path.join(root_dir, f".{POINTER_FILE}.{os.getpid()}")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(root_dir, POINTER_FILE))
+    logger.info("Published shared index %s: %d chunks from %d sections", version, len(texts), len(sections))
+
+    # Older versions can go: on POSIX, workers still mapping them keep their pages until they swap
+    versions = []
+    for name in os.listdir(root_dir):
+        manifest_path = os.path.join(root_dir, name, "manifest.json")
+        if name != version and not name.startswith(".") and os.path.exists(manifest_path):
+            versions.append((os.path.getmtime(manifest_path), name))
+    for _mtime, name in sorted(versions)[:max(len(versions) - keep + 1, 0)]:
+        shutil.rmtree(os.path.join(root_dir, name), ignore_errors=True)
+    return version
+
+
+def publish_knowledge_base(root_dir: str, pdf_paths, indexer, cache: KnowledgeBaseCache = None, keep: int = 3,
+                           **options) -> str:
+    """
+    Build (or load from the knowledge base cache) the chunks and embeddings of the PDFs with
+    the given indexer, and publish them as a new shared index version.
+    :param keep: Versions kept on disk (see publish_shared_index)
+    :param options: Ingestion options of load_or_build_knowledge_base
+    """
+    documents = []
+    for pdf_path in pdf_paths:
+        doc_id = default_doc_id(pdf_path)
+        chunks = load_or_build_knowledge_base(pdf_path, indexer, cache, doc_id=doc_id, **options)
+        documents.append((doc_id, chunks, indexer.document_embeddings(doc_id)))
+    model, backend = split_embedding_model_key(indexer.embedding_model_name)
+    return publish_shared_index(root_dir, documents, model, embedding_backend=backend, keep=keep)
+
+
+class _Snapshot:
+    """
+    One mapped index version. Nothing is copied into process memory: the arrays are read-only
+    memmaps, and texts are decoded from the mapped blob per hit.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported shared index format in {path}: {self.manifest.get('format_version')}")
+        self.version = self.manifest["version"]
+        self.model_key = embedding_model_key(self.manifest["embedding_model"], self.manifest["embedding_backend"])
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.rows = np.load(os.path.join(path, "rows.npy"), mmap_mode="r")
+        texts_path = os.path.join(path, "texts.bin")
+        # numpy cannot map an empty file
+        self.texts = (np.memmap(texts_path, dtype=np.uint8, mode="r") if os.path.getsize(texts_path)
+                      else np.empty(0, dtype=np.uint8))
+        with open(os.path.join(path, "sections.json"), encoding="utf-8") as f:
+            self.sections = json.load(f)
+
+    def hit(self, row: int, score: float) -> dict:
+        section_id, chunk_index, start_page, end_page = (int(value) for value in self.rows[row])
+        doc_id, title = self.sections[section_id]
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return {
+            "doc_id": doc_id,
+            "section_title": title,
+            "chunk_index": None if chunk_index < 0 else chunk_index,
+            "start_page": None if start_page < 0 else start_page,
+            "end_page": None if end_page < 0 else end_page,
+            "text": self.texts[start:end].tobytes().decode("utf-8"),
+            "score": score,
+        }
+
+    def search(self, queries: np.ndarray, top_k: int):
+        # Exact inner-product scan over the mapped vectors (cosine similarity: rows are normalized)
+        scores = queries @ self.vectors.T
+        top_k = min(top_k, scores.shape[1])
+        if top_k <= 0:
+            return [[] for _ in range(len(queries))]
+        best = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        results = []
+        for query_scores, rows in zip(scores, best):
+            rows = rows[np.argsort(-query_scores[rows])]
+            results.append([self.hit(int(row), float(query_scores[row])) for row in rows])
+        return results
+
+
+def _create_embeddings(model: str, backend: str):
+    if backend == "torch":
+        from utils.native_index import SentenceTransformerEmbeddings
+
+        return SentenceTransformerEmbeddings(model)
+    from utils.fast_embeddings import create_embeddings
+
+    return create_embeddings(backend, model)
+
+
+class SharedIndexSearcher:
+    """
+    Read-only retrieval backend over a published shared index, with the search API of
+    FAISSIndexer / NativeFAISSIndexer. The pointer file is re-read at most every
+    'check_interval' seconds; a new version is mapped and swapped in with one reference
+    assignment, so searches in flight finish on the version they started with.
+    'version' changes with every swap, which invalidates the answer cache.
+    """
+
+    def __init__(self, root_dir: str, embedding_model_name: str = None, embeddings=None,
+                 check_interval: float = 5.0):
+        """
+        :param root_dir: Directory the index is published into
+        :param embedding_model_name: Expected model key (as indexer.embedding_model_name); the index
+                                     is refused if it was published with another model or backend
+        :param embeddings: Query embeddings of the published model; created from the manifest's
+                           model and backend when omitted
+        :param check_interval: Seconds between checks for a newly published version
+        """
+        self.root_dir = root_dir
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._rejected = None
+        self._lock = threading.Lock()
+        if not self.refresh():
+            raise FileNotFoundError(f"No shared index published in {root_dir}")
+        manifest = self._snapshot.manifest
+        self.embedding_model_name = self._snapshot.model_key
+        if embedding_model_name is not None and embedding_model_name != self.embedding_model_name:
+            raise ValueError(f"Shared index in {root_dir} was published with '{self.embedding_model_name}', "
+                             f"not '{embedding_model_name}'")
+        if embeddings is None:
+            embeddings = _create_embeddings(manifest["embedding_model"], manifest["embedding_backend"])
+        else:
+            dim = len(embeddings.embed_query("dimension check"))
+            if dim != manifest["dim"]:
+                raise ValueError(f"Query embeddings have {dim} dimensions, the shared index in {root_dir} "
+                                 f"has {manifest['dim']} ('{self.embedding_model_name}')")
+        self.embeddings = embeddings
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def refresh(self) -> bool:
+        """
+        Map the live version if it differs from the one in use.
+        :return: True if a version is mapped
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            version = current_version(self.root_dir)
+            if version is None or version == self._rejected or \
+                    (self._snapshot is not None and self._snapshot.version == version):
+                return self._snapshot is not None
+            try:
+                snapshot = _Snapshot(os.path.join(self.root_dir, version))
+            except (OSError, ValueError) as e:
+                logger.error("Could not open shared index version %s, keeping %s: %s", version,
+                             self._snapshot.version if self._snapshot else None, e)
+                self._rejected = version
+                return self._snapshot is not None
+            if self._snapshot is not None and snapshot.model_key != self._snapshot.model_key:
+                # Queries would be embedded with the wrong model: needs a restart, not a swap
+                logger.error("Shared index version %s uses embedding model '%s', not swapping", version,
+                             snapshot.model_key)
+                self._rejected = version
+                return True
+            previous, self._snapshot = self._snapshot, snapshot
+        logger.info("Shared index version %s mapped (%d chunks, was %s)", version, snapshot.manifest["rows"],
+                    previous.version if previous else None)
+        return True
+
+    def _current(self) -> _Snapshot:
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.refresh()
+        return self._snapshot
+
+    def search_chunks_by_vectors(self, query_vectors, top_k: int = 6):
+        """
+        Search many queries at once.
+        :return: One list of hits (as returned by search_chunks) per query
+        """
+        snapshot = self._current()
+        with tracer.span("faiss_search", top_k=top_k):
+            return snapshot.search(_normalized(query_vectors), top_k)
+
+    def search_chunks(self, query: str, top_k: int = 6):
+        """
+        Semantic search returning structured hits, best first.
+        :return: List of dicts with 'text', 'score' (cosine similarity, higher is closer) and the chunk metadata
+        """
+        with tracer.span("embedding"):
+            vector = self.embeddings.embed_query(query)
+        hits = self.search_chunks_by_vectors([vector], top_k=top_k)[0]
+        logger.debug("Search for '%s' returned %d chunks", query, len(hits))
+        return hits
+
+    def search(self, query: str, top_k: int = 3):
+        """
+        :return: The section titles and texts of the hits, one per line
+        """
+        hits = self.search_chunks(query, top_k=top_k)
+        return "".join(hit['section_title'] + "  " + hit['text'] + "\n" for hit in hits)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from utils.faiss_indexer import create_indexer
+
+    parser = argparse.ArgumentParser(description="Publish the knowledge base as a new shared index version")
+    parser.add_argument("root_dir")
+    parser.add_argument("pdf_paths", nargs="+")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Embedding model name or path")
+    parser.add_argument("--embedding-backend", default="torch")
+    parser.add_argument("--cache-dir", default=".kb_cache")
+    parser.add_argument("--keep", type=int, default=3, help="Versions kept on disk")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    indexer = create_indexer("native", args.model, embedding_backend=args.embedding_backend)
+    with publish_lock(args.root_dir):
+        published = publish_knowledge_base(args.root_dir, args.pdf_paths, indexer, KnowledgeBaseCache(args.cache_dir),
+                                           keep=args.keep)
+    print(f"Published {published}")
@@ -0,0 +1,126 @@
+# utils/single_flight.py
+
+"""
+SingleFlight: Coalesces concurrent calls for the same key into one in-flight computation
+whose result (or exception) is shared by every caller.
+"""
+import logging
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlightTimeout(TimeoutError):
+    """
+    Raised to a caller that gave up waiting for another caller's in-flight computation.
+    """
+
+
+class SingleFlight:
+    """
+    The first caller for a key (the leader) runs the computation; callers arriving with the
+    same key while it runs (followers) wait for its result instead of starting their own.
+    An exception raised by the leader is re-raised to its followers. The key is released as
+    soon as the computation finishes, so a later call computes afresh: completed results
+    are the answer cache's job, not this class's.
+    """
+
+    def __init__(self, timeout: float = 60.0, name: str = "single_flight"):
+        """
+        :param timeout: Seconds a follower waits for the leader before raising SingleFlightTimeout
+        :param name: Prefix of the counters reported to the tracer
+        """
+        self.timeout = timeout
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def begin(self, key):
+        """
+        Join the in-flight computation for a key, or become its leader.
+        A leader must call finish() exactly once, whatever the outcome.
+        :return: (future, is_leader)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = self._calls[key] = Future()
+                self.leaders += 1
+                leader = True
+        tracer.increment(f"{self.name}_leaders" if leader else f"{self.name}_coalesced")
+        return future, leader
+
+    def finish(self, key, future: Future, result=None, error: BaseException = None):
+        """
+        Publish the leader's outcome to its followers and release the key.
+        """
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+            if error is not None:
+                self.failures += 1
+        if error is not None:
+            tracer.increment(f"{self.name}_failures")
+            if not isinstance(error, Exception):
+                # KeyboardInterrupt / GeneratorExit (a streaming leader's consumer went away) belong
+                # to the leader's thread; followers only learn that there will be no result
+                error = RuntimeError(f"The in-flight computation was interrupted ({type(error).__name__})")
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def wait(self, future: Future, timeout: float = None):
+        """
+        Wait for a leader's result as a follower.
+        :raises SingleFlightTimeout: If the leader does not finish in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            tracer.increment(f"{self.name}_timeouts")
+            logger.warning("Gave up waiting %.1fs for an in-flight computation", timeout)
+            raise SingleFlightTimeout(f"No result from the in-flight computation after {timeout:.0f}s") from None
+
+    def do(self, key, fn, timeout: float = None):
+        """
+        Return fn(), running it only if no call with the same key is already in flight.
+        """
+        future, leader = self.begin(key)
+        if not leader:
+            return self.wait(future, timeout)
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, result=result)
+        return result
+
+    def stats(self) -> dict:
+        """
+        Counters for monitoring.
+        """
+        with self._lock:
+            calls = self.leaders + self.coalesced
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesce_rate": self.coalesced / calls if calls else 0.0,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+            }
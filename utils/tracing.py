@@ -0,0 +1,208 @@
+# utils/tracing.py
+
+"""
+Tracing: Per-request stage timing (intent, retrieval, prompt build, LLM call, tool execution)
+aggregated into latency histograms and token counters, exportable in Prometheus text
+format or as JSON.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def current_request_id():
+    """
+    Request ID of the trace active in this context, or None.
+    """
+    trace = _current_trace.get()
+    return trace["request_id"] if trace else None
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Tracer:
+    """
+    Records timed spans. Spans opened inside request() are also attached to that request's trace.
+    Recording a span costs two perf_counter() calls and a short locked histogram update.
+    """
+
+    def __init__(self, namespace: str = "cardassist", buckets=DEFAULT_BUCKETS, keep_traces: int = 100):
+        """
+        :param namespace: Prefix of the exported metric names
+        :param buckets: Histogram bucket upper bounds in seconds
+        :param keep_traces: Number of completed request traces kept for inspection
+        """
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.recent_traces = deque(maxlen=keep_traces)
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = _Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def increment(self, counter: str, value: float = 1):
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + value
+
+    @contextmanager
+    def request(self, request_id: str = None):
+        """
+        Trace one request (e.g. a chat turn). Yields the trace dict.
+        """
+        trace = {"request_id": request_id or uuid.uuid4().hex[:12], "spans": [], "start": time.time()}
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            trace["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            _current_trace.reset(token)
+            self.observe("request", trace["duration_ms"] / 1000)
+            self.recent_traces.append(trace)
+            logger.debug("Request %s finished in %.1f ms: %s", trace["request_id"], trace["duration_ms"],
+                         [(s["name"], s["duration_ms"]) for s in trace["spans"]])
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Time a stage. Yields the span dict, whose 'attributes' may be extended inside the block.
+        """
+        span = {"name": name, "attributes": attributes}
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            elapsed = time.perf_counter() - start
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # A streaming generator closed from another context (e.g. garbage-collected)
+                pass
+            span["duration_ms"] = round(elapsed * 1000, 3)
+            self.observe(name, elapsed)
+            trace = _current_trace.get()
+            if trace is not None:
+                trace["spans"].append(span)
+
+    def record_tokens(self, prompt_tokens: int = 0, completion_tokens: int = 0):
+        """
+        Attach LLM token counts to the current span and add them to the running totals.
+        """
+        span = _current_span.get()
+        if span is not None:
+            span["attributes"]["prompt_tokens"] = prompt_tokens
+            span["attributes"]["completion_tokens"] = completion_tokens
+        self.increment("llm_prompt_tokens", prompt_tokens)
+        self.increment("llm_completion_tokens", completion_tokens)
+
+    def snapshot(self) -> dict:
+        """
+        Aggregated metrics as plain data.
+        """
+        with self._lock:
+            stages = {
+                name: {
+                    "count": h.count,
+                    "sum_seconds": round(h.sum, 6),
+                    "buckets": {str(le): c for le, c in zip(self.buckets + ("+Inf",), h.counts)},
+                }
+                for name, h in self._histograms.items()
+            }
+            return {"stages": stages, "counters": dict(self._counters)}
+
+    def to_json(self, include_traces: bool = False) -> str:
+        data = self.snapshot()
+        if include_traces:
+            data["recent_traces"] = list(self.recent_traces)
+        return json.dumps(data, indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        Metrics in the Prometheus text exposition format.
+        """
+        metric = f"{self.namespace}_stage_latency_seconds"
+        lines = [f"# HELP {metric} Latency of each request stage.", f"# TYPE {metric} histogram"]
+        with self._lock:
+            for name, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for le, count in zip(self.buckets + ("+Inf",), h.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{stage="{name}"}} {h.sum}')
+                lines.append(f'{metric}_count{{stage="{name}"}} {h.count}')
+            for name, value in sorted(self._counters.items()):
+                counter = f"{self.namespace}_{name}_total"
+                lines.append(f"# TYPE {counter} counter")
+                lines.append(f"{counter} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide tracer used by the agents
+tracer = Tracer()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0", source: Tracer = None):
+    """
+    Serve /metrics (Prometheus text) and /metrics.json from a daemon thread.
+    :return: The running ThreadingHTTPServer
+    """
+    source = source or tracer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = source.to_prometheus(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = source.to_json(include_traces=True), "application/json"
+            else:
+                self.send_error(404)
+                return
+            payload = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            logger.debug("metrics server: " + format, *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    logger.info("Metrics available on http://%s:%d/metrics", host, port)
+    return server
@@ -10,3 +10,11 @@ class Validators:
         Validates that the card number is exactly 9 digits (numeric).
         """
         return card_number.isdigit() and len(card_number) == 9
+
+    @staticmethod
+    def validate_card_numbers(card_numbers) -> list:
+        """
+        Validates many card numbers at once.
+        Returns a list of booleans, one per card number, in the same order.
+        """
+        return [Validators.is_valid_card_number(card_number) for card_number in card_numbers]
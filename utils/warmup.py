@@ -0,0 +1,87 @@
+# utils/warmup.py
+
+"""
+BackgroundLoader: Runs slow start-up work (embedding model, knowledge base) on a daemon thread
+and exposes its readiness, so the UI can render and serve requests that do not need it.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class BackgroundLoader:
+    """
+    Calls a loader function once on a background thread and keeps its result.
+    """
+
+    def __init__(self, load_fn, name: str = "warmup"):
+        """
+        :param load_fn: Zero-argument callable doing the work; its return value becomes 'result'
+        :param name: Thread name, also used in log messages
+        """
+        self.load_fn = load_fn
+        self.name = name
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Start loading (no-op if already started).
+        :return: self
+        """
+        if self._thread is None:
+            self.started_at = time.monotonic()
+            self.state = LOADING
+            self._thread = threading.Thread(target=self._run, daemon=True, name=self.name)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.result = self.load_fn()
+            self.state = READY
+            logger.info("%s ready after %.1fs", self.name, time.monotonic() - self.started_at)
+        except Exception as e:
+            self.error = e
+            self.state = FAILED
+            logger.exception("%s failed", self.name)
+        finally:
+            self.finished_at = time.monotonic()
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def elapsed(self) -> float:
+        """
+        Seconds spent loading so far (or in total, once finished).
+        """
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def wait(self, timeout: float = None):
+        """
+        Block until loading finishes.
+        :return: The loader's result
+        :raises TimeoutError: If it does not finish within 'timeout' seconds
+        :raises RuntimeError: If loading failed
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} still loading after {timeout}s")
+        if self.state == FAILED:
+            raise RuntimeError(f"{self.name} failed: {self.error}") from self.error
+        return self.result